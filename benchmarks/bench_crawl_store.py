@@ -0,0 +1,147 @@
+"""
+Benchmark: repeated crawls through the content-addressed crawl store.
+
+Serves synthetic pages from a local http.server (with ETag / 304 support), then
+crawls the same URLs several times and compares latency and disk usage with
+the old behaviour of re-downloading and writing crawled_<timestamp>.json:
+
+    python -m benchmarks.bench_crawl_store --pages 50 --rounds 5 --latency 0.05
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from benchmarks.bench_html_extraction import legacy_extract
+from rag_app.services.crawl_store import CrawlStore
+from rag_app.services.crawler import WebCrawler
+
+
+def make_handler(pages, latency, counts):
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            time.sleep(latency)
+            body = pages.get(self.path)
+            if body is None:
+                self.send_error(404)
+                return
+            etag = '"%s"' % hashlib.md5(body).hexdigest()
+            if self.headers.get("If-None-Match") == etag:
+                counts["304"] += 1
+                self.send_response(304)
+                self.send_header("ETag", etag)
+                self.end_headers()
+                return
+            counts["200"] += 1
+            self.send_response(200)
+            self.send_header("Content-Type", "text/html; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            self.send_header("ETag", etag)
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    return Handler
+
+
+def synthetic_page(i, mirrors):
+    # Every `mirrors` URLs share a body, like syndicated articles
+    n = i // mirrors
+    paragraphs = "".join(
+        f"<p>Article {n} paragraph {p}: demand for data skills keeps growing.</p>"
+        for p in range(60)
+    )
+    return (
+        f"<html><head><title>Article {n}</title><script>var x = {n};</script></head>"
+        f"<body><nav>menu</nav>{paragraphs}<footer>footer</footer></body></html>"
+    ).encode()
+
+
+def legacy_crawl(crawler, url, max_length=5000):
+    """What WebCrawler.crawl did before the store: always a full download"""
+    response = crawler.session.get(url, timeout=10)
+    title, text_content = legacy_extract(response.content, max_length)
+    return {
+        "url": url,
+        "title": title,
+        "content": text_content,
+        "content_length": len(text_content),
+    }
+
+
+def dir_size(path):
+    return sum(
+        os.path.getsize(os.path.join(root, name))
+        for root, _, names in os.walk(path)
+        for name in names
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--pages", type=int, default=50)
+    parser.add_argument("--rounds", type=int, default=5)
+    parser.add_argument("--mirrors", type=int, default=2, help="URLs per distinct body")
+    parser.add_argument("--latency", type=float, default=0.05, help="server delay (s)")
+    args = parser.parse_args()
+
+    pages = {f"/page/{i}": synthetic_page(i, args.mirrors) for i in range(args.pages)}
+    counts = {"200": 0, "304": 0}
+    server = ThreadingHTTPServer(
+        ("127.0.0.1", 0), make_handler(pages, args.latency, counts)
+    )
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    urls = [f"http://127.0.0.1:{server.server_port}{path}" for path in pages]
+
+    with tempfile.TemporaryDirectory() as tmp:
+        # Old behaviour: always download, one JSON file per request
+        legacy_dir = os.path.join(tmp, "legacy")
+        os.makedirs(legacy_dir)
+        crawler = WebCrawler(CrawlStore(legacy_dir, os.path.join(legacy_dir, "db")))
+        start = time.perf_counter()
+        for r in range(args.rounds):
+            crawled = [legacy_crawl(crawler, url) for url in urls]
+            with open(os.path.join(legacy_dir, f"crawled_{r}.json"), "w") as f:
+                json.dump(crawled, f, indent=2)
+        legacy_seconds = time.perf_counter() - start
+        legacy_bytes = sum(
+            os.path.getsize(os.path.join(legacy_dir, name))
+            for name in os.listdir(legacy_dir)
+            if name.startswith("crawled_")
+        )
+
+        for label, fresh_seconds in (("store, fresh", 3600), ("store, revalidate", 0)):
+            root = os.path.join(tmp, label.replace(", ", "-"))
+            store = CrawlStore(root, os.path.join(root, "pages.sqlite3"), fresh_seconds)
+            crawler = WebCrawler(store)
+            counts.update({"200": 0, "304": 0})
+            round_times = []
+            for _ in range(args.rounds):
+                start = time.perf_counter()
+                for url in urls:
+                    crawler.crawl(url)
+                round_times.append(time.perf_counter() - start)
+            print(
+                f"{label:<18} first round {round_times[0]:6.2f}s, "
+                f"later rounds {sum(round_times[1:]) / max(1, args.rounds - 1):6.2f}s, "
+                f"objects {dir_size(os.path.join(root, 'objects')) / 1024:8.1f} KiB, "
+                f"{counts['200']} full fetches, {counts['304']} not-modified"
+            )
+
+        print(
+            f"{'legacy':<18} {args.rounds} rounds {legacy_seconds:6.2f}s, "
+            f"crawled_*.json {legacy_bytes / 1024:8.1f} KiB"
+        )
+
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,192 @@
+"""
+Benchmark: per-request WebCrawler (old behaviour) vs. the shared crawler.
+
+Runs a local HTTP/1.1 stand-in for a few web hosts: keep-alive, a robots.txt
+that disallows /private/, and a few slow pages. It then fires simulated chat
+requests that crawl three result URLs each, and reports latency, TCP
+connections opened, peak concurrency per host and pages returned:
+
+    python -m benchmarks.bench_crawler_pool --requests 40 --concurrency 8
+"""
+
+import argparse
+import random
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from benchmarks.load_test_process_request import percentile
+from rag_app.services.crawl_store import CrawlStore
+from rag_app.services.crawler import WebCrawler
+
+ROBOTS = b"User-agent: *\nDisallow: /private/\n"
+
+
+class HostStats:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.connections = 0
+        self.robots = 0
+        self.active = 0
+        self.peak_active = 0
+
+    def reset(self):
+        with self.lock:
+            self.connections = self.robots = self.active = self.peak_active = 0
+
+
+def make_handler(stats, latency, slow_latency):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def setup(self):
+            super().setup()
+            with stats.lock:
+                stats.connections += 1
+
+        def do_GET(self):
+            if self.path == "/robots.txt":
+                with stats.lock:
+                    stats.robots += 1
+                self._send(ROBOTS, "text/plain")
+                return
+            with stats.lock:
+                stats.active += 1
+                stats.peak_active = max(stats.peak_active, stats.active)
+            try:
+                time.sleep(slow_latency if self.path.startswith("/slow/") else latency)
+            finally:
+                with stats.lock:
+                    stats.active -= 1
+            body = (
+                f"<html><head><title>{self.path}</title></head><body>"
+                + "<p>Hiring for data roles keeps growing.</p>" * 50
+                + "</body></html>"
+            ).encode()
+            self._send(body, "text/html; charset=utf-8")
+
+        def _send(self, body, content_type):
+            self.send_response(200)
+            self.send_header("Content-Type", content_type)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    return Handler
+
+
+def request_urls(hosts, rng, slow_fraction):
+    urls = []
+    for _ in range(3):
+        host = rng.choice(hosts)
+        kind = rng.random()
+        if kind < slow_fraction:
+            path = f"/slow/{rng.randrange(1000)}"
+        elif kind < slow_fraction + 0.1:
+            path = f"/private/{rng.randrange(1000)}"
+        else:
+            path = f"/article/{rng.randrange(1000)}"
+        urls.append(host + path)
+    return urls
+
+
+def run(mode, url_sets, args, tmp):
+    store = CrawlStore(tmp, f"{tmp}/pages-{mode}.sqlite3", fresh_seconds=0)
+    shared = None
+    if mode == "shared":
+        shared = WebCrawler(
+            store, per_host_concurrency=args.per_host, host_delay=args.host_delay
+        )
+    latencies = []
+    pages = 0
+    lock = threading.Lock()
+
+    def one(urls):
+        nonlocal pages
+        start = time.perf_counter()
+        if shared is not None:
+            crawled = shared.crawl_multiple_urls(urls, deadline=args.deadline)
+        else:
+            # New session and pool per request, no limits, wait for every page
+            crawler = WebCrawler(
+                store,
+                max_workers=5,
+                per_host_concurrency=1000,
+                host_delay=0,
+                respect_robots=False,
+            )
+            crawled = crawler.crawl_multiple_urls(urls, deadline=None)
+            crawler.close()
+        with lock:
+            latencies.append(time.perf_counter() - start)
+            pages += len(crawled)
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+        list(pool.map(one, url_sets))
+    wall = time.perf_counter() - start
+    if shared is not None:
+        # Let pages that missed their deadline finish before the next run
+        shared.executor.shutdown(wait=True)
+        shared.close()
+    return wall, latencies, pages
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--requests", type=int, default=40)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--hosts", type=int, default=3)
+    parser.add_argument("--latency", type=float, default=0.05)
+    parser.add_argument("--slow-latency", type=float, default=3.0)
+    parser.add_argument("--slow-fraction", type=float, default=0.05)
+    parser.add_argument("--deadline", type=float, default=2.0)
+    parser.add_argument("--per-host", type=int, default=4)
+    parser.add_argument("--host-delay", type=float, default=0.0)
+    args = parser.parse_args()
+
+    servers, stats = [], []
+    for _ in range(args.hosts):
+        host_stats = HostStats()
+        server = ThreadingHTTPServer(
+            ("127.0.0.1", 0), make_handler(host_stats, args.latency, args.slow_latency)
+        )
+        server.daemon_threads = True
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        servers.append(server)
+        stats.append(host_stats)
+    hosts = [f"http://127.0.0.1:{server.server_port}" for server in servers]
+
+    rng = random.Random(0)
+    url_sets = [
+        request_urls(hosts, rng, args.slow_fraction) for _ in range(args.requests)
+    ]
+
+    print(
+        f"{'mode':<12} {'wall (s)':>9} {'p50 (s)':>8} {'p95 (s)':>8} {'pages':>6} "
+        f"{'TCP conns':>10} {'peak/host':>10} {'robots':>7}"
+    )
+    with tempfile.TemporaryDirectory() as tmp:
+        for mode in ("per-request", "shared"):
+            for host_stats in stats:
+                host_stats.reset()
+            wall, latencies, pages = run(mode, url_sets, args, tmp)
+            print(
+                f"{mode:<12} {wall:>9.2f} {percentile(latencies, 50):>8.2f} "
+                f"{percentile(latencies, 95):>8.2f} {pages:>6} "
+                f"{sum(s.connections for s in stats):>10} "
+                f"{max(s.peak_active for s in stats):>10} "
+                f"{sum(s.robots for s in stats):>7}"
+            )
+
+    for server in servers:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,164 @@
+"""
+Benchmark: embedding backends (fp32 torch, int8 torch, ONNX, int8 ONNX) on CPU.
+
+Embeds the chunks of data/doc_mapping.json and a sample of queries (the first
+sentence of random chunks) with every backend, and reports against fp32
+torch: single-query latency, batch throughput, the cosine between each
+chunk's vectors (drift) and recall@k of brute-force retrieval over the
+corpus (the fp32 top-k is the truth):
+
+    python -m benchmarks.bench_embedding_backends --threads 4 --output embed.json
+    python -m benchmarks.bench_embedding_backends --encoder stand-in
+
+Backends that cannot load (e.g. ONNX without optimum[onnxruntime]) are
+reported as skipped. `--encoder stand-in` compares torch and torch-int8 on a
+random-weight model of the same shape, for machines that cannot download it.
+"""
+
+import argparse
+import json
+import random
+import time
+
+import numpy as np
+
+from benchmarks.load_test_process_request import percentile
+from rag_app.services.embedding_backends import (
+    EMBEDDING_BACKENDS,
+    load_encoder,
+    quantize_int8,
+)
+from rag_app.config.settings_loader import DOC_MAPPING_PATH, EMBEDDING_MODEL_NAME
+
+
+def load_corpus(path, n_queries, seed):
+    with open(path, encoding="utf-8") as f:
+        mapping = json.load(f)
+    chunks = [mapping[key] for key in sorted(mapping, key=int)]
+    picks = random.Random(seed).sample(range(len(chunks)), min(n_queries, len(chunks)))
+    queries = [chunks[i].split(". ")[0] for i in picks]
+    return chunks, queries
+
+
+def load(backend, encoder, model_name):
+    if encoder == "stand-in":
+        from benchmarks.bench_startup import StandInEncoder
+
+        if backend not in ("torch", "torch-int8"):
+            raise RuntimeError("the stand-in model only runs on the torch backends")
+        model = StandInEncoder()
+        if backend == "torch-int8":
+            model.model = quantize_int8(model.model)
+        return model
+    return load_encoder(model_name, backend)
+
+
+def embed(model, texts, batch_size):
+    vectors = np.asarray(model.encode(texts, batch_size=batch_size), dtype="float32")
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+def top_k(corpus, queries, k):
+    scores = queries @ corpus.T
+    return np.argsort(-scores, axis=1)[:, :k]
+
+
+def measure(model, chunks, queries, batch_size):
+    embed(model, queries[:4], batch_size)  # first-call setup
+    latencies = []
+    query_vectors = []
+    for query in queries:
+        start = time.perf_counter()
+        query_vectors.append(embed(model, [query], batch_size)[0])
+        latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    chunk_vectors = embed(model, chunks, batch_size)
+    seconds = time.perf_counter() - start
+    return {
+        "query_p50_ms": percentile(latencies, 50) * 1000,
+        "query_p95_ms": percentile(latencies, 95) * 1000,
+        "chunks_per_second": len(chunks) / seconds,
+    }, np.stack(query_vectors), chunk_vectors
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--mapping", default=DOC_MAPPING_PATH)
+    parser.add_argument("--model", default=EMBEDDING_MODEL_NAME)
+    parser.add_argument("--backends", nargs="+", default=list(EMBEDDING_BACKENDS))
+    parser.add_argument(
+        "--encoder",
+        choices=["sentence-transformers", "stand-in"],
+        default="sentence-transformers",
+    )
+    parser.add_argument("--queries", type=int, default=100)
+    parser.add_argument("--k", type=int, default=5)
+    parser.add_argument("--batch-size", type=int, default=32)
+    parser.add_argument("--threads", type=int, help="torch intra-op threads")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="also write the results as JSON here")
+    args = parser.parse_args()
+
+    if args.threads:
+        import torch
+
+        torch.set_num_threads(args.threads)
+
+    chunks, queries = load_corpus(args.mapping, args.queries, args.seed)
+    print(f"{len(chunks)} chunks, {len(queries)} queries, k={args.k}\n")
+
+    backends = ["torch"] + [b for b in args.backends if b != "torch"]
+    rows, reference = [], None
+    for backend in backends:
+        try:
+            start = time.perf_counter()
+            model = load(backend, args.encoder, args.model)
+            load_seconds = time.perf_counter() - start
+        except Exception as e:
+            if reference is None:
+                raise SystemExit(f"The fp32 reference failed to load: {e}")
+            print(f"{backend}: skipped ({e})")
+            rows.append({"backend": backend, "skipped": str(e)})
+            continue
+        row, query_vectors, chunk_vectors = measure(model, chunks, queries, args.batch_size)
+        row = {"backend": backend, "load_seconds": load_seconds, **row}
+        if reference is None:
+            truth = top_k(chunk_vectors, query_vectors, args.k)
+            reference = row, query_vectors, chunk_vectors, truth
+        base, _, base_chunks, truth = reference
+        drift = np.sum(chunk_vectors * base_chunks, axis=1)
+        found = top_k(chunk_vectors, query_vectors, args.k)
+        recall = np.mean([len(set(f) & set(t)) / args.k for f, t in zip(found, truth)])
+        row.update(
+            {
+                "query_speedup": base["query_p50_ms"] / row["query_p50_ms"],
+                "throughput_speedup": row["chunks_per_second"] / base["chunks_per_second"],
+                "cosine_mean": float(drift.mean()),
+                "cosine_min": float(drift.min()),
+                f"recall_at_{args.k}": float(recall),
+            }
+        )
+        rows.append(row)
+        del model
+
+    print(
+        f"{'backend':<11} {'p50 ms':>7} {'p95 ms':>7} {'chunks/s':>9} {'query x':>8} "
+        f"{'batch x':>8} {'cos mean':>9} {'cos min':>8} {f'recall@{args.k}':>9}"
+    )
+    for row in rows:
+        if "skipped" in row:
+            continue
+        print(
+            f"{row['backend']:<11} {row['query_p50_ms']:>7.2f} {row['query_p95_ms']:>7.2f} "
+            f"{row['chunks_per_second']:>9.1f} {row['query_speedup']:>8.2f} "
+            f"{row['throughput_speedup']:>8.2f} {row['cosine_mean']:>9.4f} "
+            f"{row['cosine_min']:>8.4f} {row[f'recall_at_{args.k}']:>9.3f}"
+        )
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({"args": vars(args), "results": rows}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,108 @@
+"""
+Benchmark: query embedding under concurrent requests, with and without the
+cross-request micro-batcher.
+
+Simulated requests (threads) each embed distinct questions through
+EmbeddingService, once calling the model per request and once through the
+micro-batcher with each `--windows` value (milliseconds). Reports throughput,
+per-query latency and the batch sizes the model actually saw:
+
+    python -m benchmarks.bench_embedding_batcher --concurrency 16 --windows 1 3 10
+    python -m benchmarks.bench_embedding_batcher --encoder stand-in
+
+`--encoder stand-in` uses a random-weight model of all-MiniLM-L6-v2's shape
+for machines that cannot download it.
+"""
+
+import argparse
+import statistics
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from benchmarks.load_test_process_request import QUESTIONS, percentile
+from rag_app.services.embedding_service import EmbeddingService, EmbeddingBatcher
+from rag_app.services.embedding_backends import load_encoder
+from rag_app.config.settings_loader import EMBEDDING_MODEL_NAME, EMBEDDING_BACKEND
+
+
+class CountingEncoder:
+    """Records the size of every batch handed to the model"""
+
+    def __init__(self, model):
+        self.model = model
+        self.batches = []
+        self._lock = threading.Lock()
+
+    def encode(self, texts, **kwargs):
+        with self._lock:
+            self.batches.append(len(texts))
+        return self.model.encode(texts, **kwargs)
+
+
+def run(model, window_ms, concurrency, per_thread):
+    encoder = CountingEncoder(model)
+    service = EmbeddingService(micro_batching=window_ms is not None)
+    service._model = encoder
+    if window_ms is not None:
+        service.batcher = EmbeddingBatcher(service._encode, window_seconds=window_ms / 1000)
+
+    def user(u):
+        latencies = []
+        for i in range(per_thread):
+            # Distinct texts, so the query cache never answers
+            text = f"{QUESTIONS[(u + i) % len(QUESTIONS)]} (user {u}, turn {i})"
+            start = time.perf_counter()
+            service.encode(text)
+            latencies.append(time.perf_counter() - start)
+        return latencies
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        latencies = [t for ts in pool.map(user, range(concurrency)) for t in ts]
+    seconds = time.perf_counter() - start
+    return {
+        "mode": "per request" if window_ms is None else f"batched {window_ms} ms",
+        "queries_per_second": len(latencies) / seconds,
+        "p50_ms": percentile(latencies, 50) * 1000,
+        "p95_ms": percentile(latencies, 95) * 1000,
+        "model_calls": len(encoder.batches),
+        "mean_batch": statistics.mean(encoder.batches),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--queries-per-thread", type=int, default=20)
+    parser.add_argument("--windows", type=float, nargs="+", default=[1, 3, 10])
+    parser.add_argument(
+        "--encoder",
+        choices=["sentence-transformers", "stand-in"],
+        default="sentence-transformers",
+    )
+    args = parser.parse_args()
+
+    if args.encoder == "stand-in":
+        from benchmarks.bench_startup import StandInEncoder
+
+        model = StandInEncoder()
+    else:
+        model = load_encoder(EMBEDDING_MODEL_NAME, EMBEDDING_BACKEND)
+    model.encode(["warm up"])
+
+    print(f"{args.concurrency} concurrent requests, {args.queries_per_thread} queries each\n")
+    print(
+        f"{'mode':<16} {'queries/s':>10} {'p50 ms':>8} {'p95 ms':>8} "
+        f"{'model calls':>11} {'mean batch':>10}"
+    )
+    for window_ms in [None] + args.windows:
+        row = run(model, window_ms, args.concurrency, args.queries_per_thread)
+        print(
+            f"{row['mode']:<16} {row['queries_per_second']:>10.1f} {row['p50_ms']:>8.1f} "
+            f"{row['p95_ms']:>8.1f} {row['model_calls']:>11} {row['mean_batch']:>10.1f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,115 @@
+"""
+Benchmark: HTML title + text extraction, old two-pass BeautifulSoup extractor
+vs. the single-pass, size-bounded PageExtractor.
+
+Point it at a directory of saved pages (*.html), or let it generate a
+synthetic corpus:
+
+    python -m benchmarks.bench_html_extraction --corpus saved_pages/
+    python -m benchmarks.bench_html_extraction --pages 200 --paragraphs 2000
+"""
+
+import argparse
+import glob
+import os
+import time
+import tracemalloc
+
+from bs4 import BeautifulSoup
+
+from rag_app.utils.html_text import PageExtractor, etree
+
+
+def legacy_extract(html_content, max_length=5000):
+    """What WebCrawler did before: two full html.parser parses, then truncate"""
+    soup = BeautifulSoup(html_content, "html.parser")
+    for script in soup(["script", "style", "nav", "footer", "header"]):
+        script.decompose()
+    text = soup.get_text()
+    lines = (line.strip() for line in text.splitlines())
+    chunks = (phrase.strip() for line in lines for phrase in line.split("  "))
+    text = "\n".join(chunk for chunk in chunks if chunk)
+
+    soup = BeautifulSoup(html_content, "html.parser")
+    title_tag = soup.find("title")
+    title = title_tag.get_text().strip() if title_tag else "No title"
+    return title, text[:max_length]
+
+
+def streaming_extract(html_content, max_length=5000, backend="stdlib", chunk_size=16384):
+    """What WebCrawler does now with a streamed response body"""
+    extractor = PageExtractor(max_length, backend)
+    for start in range(0, len(html_content), chunk_size):
+        extractor.feed(html_content[start : start + chunk_size])
+        if extractor.done:
+            break
+    extractor.close()
+    return extractor.title, extractor.text()[:max_length]
+
+
+def synthetic_corpus(n_pages, n_paragraphs):
+    pages = []
+    for i in range(n_pages):
+        body = "".join(
+            f"<div class='c'><p>Page {i}, paragraph {p}: hiring for <a href='#'>data "
+            f"roles</a> rose &amp; AI skills are in demand.</p></div>"
+            for p in range(n_paragraphs)
+        )
+        pages.append(
+            f"<!doctype html><html><head><title>Page {i}</title>"
+            f"<style>.c {{ margin: 0 }}</style><script>var tracking = {i};</script></head>"
+            f"<body><header>Site</header><nav><ul><li>Home</li></ul></nav>"
+            f"{body}<footer>Copyright</footer></body></html>"
+        )
+    return pages
+
+
+def measure(fn, corpus, max_length):
+    tracemalloc.start()
+    start = time.perf_counter()
+    for html in corpus:
+        fn(html, max_length)
+    seconds = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return len(corpus) / seconds, peak
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--corpus", help="directory of saved *.html pages")
+    parser.add_argument("--pages", type=int, default=100)
+    parser.add_argument("--paragraphs", type=int, default=1000)
+    parser.add_argument("--max-length", type=int, default=5000)
+    args = parser.parse_args()
+
+    if args.corpus:
+        corpus = []
+        for path in sorted(glob.glob(os.path.join(args.corpus, "*.htm*"))):
+            with open(path, encoding="utf-8", errors="replace") as f:
+                corpus.append(f.read())
+    else:
+        corpus = synthetic_corpus(args.pages, args.paragraphs)
+    mean_kib = sum(len(html) for html in corpus) / len(corpus) / 1024
+    print(f"{len(corpus)} pages, {mean_kib:.0f} KiB on average, max_length={args.max_length}\n")
+
+    # The bounded extractors must agree with the old output
+    for html in corpus[:20]:
+        expected = legacy_extract(html, args.max_length)
+        assert streaming_extract(html, args.max_length) == expected
+
+    extractors = {
+        "bs4 html.parser x2": legacy_extract,
+        "single pass, stdlib": streaming_extract,
+    }
+    if etree is not None:
+        extractors["single pass, lxml"] = lambda html, n: streaming_extract(html, n, "lxml")
+
+    print(f"{'extractor':<22} {'pages/s':>9} {'peak MiB':>9}")
+    for name, fn in extractors.items():
+        pages_per_second, peak = measure(fn, corpus, args.max_length)
+        print(f"{name:<22} {pages_per_second:>9.1f} {peak / 2**20:>9.2f}")
+
+
+if __name__ == "__main__":
+    main()
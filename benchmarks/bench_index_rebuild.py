@@ -0,0 +1,125 @@
+"""
+Benchmark: index rebuild time after one upload vs. corpus size.
+
+Ingests a synthetic corpus of text files, then times ingesting one more file
+twice: with the stored embeddings reused (only the new file is encoded) and
+under a new encoder id, so nothing is stored yet and every chunk is encoded
+(the old behaviour).
+
+    python -m benchmarks.bench_index_rebuild --sizes 10 50 200
+    python -m benchmarks.bench_index_rebuild --encoder sentence-transformers
+
+The default `fake` encoder costs a fixed time per chunk so the scaling is visible
+without downloading the model.
+"""
+
+import argparse
+import hashlib
+import os
+import random
+import tempfile
+import time
+import numpy as np
+
+from rag_app.services.update_knowledge import process_and_update_index
+from rag_app.services.chunk_store import get_chunk_store
+
+WORDS = (
+    "labour market jobs skills demand growth decline analyst engineer data "
+    "automation region salary hiring report survey industry workforce ai"
+).split()
+
+
+class FakeEncoder:
+    """Deterministic stand-in for SentenceTransformer with a fixed per-chunk cost"""
+
+    def __init__(self, dim=384, seconds_per_chunk=0.002):
+        self.dim = dim
+        self.seconds_per_chunk = seconds_per_chunk
+
+    def encode(self, sentences, normalize_embeddings=True, **kwargs):
+        time.sleep(self.seconds_per_chunk * len(sentences))
+        vectors = np.empty((len(sentences), self.dim), dtype="float32")
+        for i, s in enumerate(sentences):
+            seed = int.from_bytes(hashlib.md5(s.encode()).digest()[:4], "little")
+            vectors[i] = np.random.default_rng(seed).standard_normal(self.dim)
+        if normalize_embeddings:
+            vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+        return vectors
+
+
+def write_text_file(path, n_lines, rng):
+    with open(path, "w", encoding="utf-8") as f:
+        for _ in range(n_lines):
+            f.write(" ".join(rng.choice(WORDS) for _ in range(12)) + "\n")
+
+
+def ingest(path, dirs, encoder, model_name="all-MiniLM-L6-v2"):
+    start = time.perf_counter()
+    process_and_update_index(path, llm=None, model=encoder, model_name=model_name, **dirs)
+    return time.perf_counter() - start
+
+
+def run(size, encoder, lines_per_file, seed):
+    rng = random.Random(seed)
+    with tempfile.TemporaryDirectory() as root:
+        dirs = {
+            "knowledge_dir": os.path.join(root, "knowledge_source"),
+            "pickle_dir": os.path.join(root, "PickleFiles"),
+            "generations_dir": os.path.join(root, "generations"),
+            "current_path": os.path.join(root, "CURRENT"),
+            "chunk_db_path": os.path.join(root, "chunks.sqlite3"),
+        }
+        os.makedirs(dirs["knowledge_dir"])
+        os.makedirs(dirs["pickle_dir"])
+        src = os.path.join(root, "src")
+        os.makedirs(src)
+
+        for i in range(size):
+            path = os.path.join(src, f"doc_{i}.txt")
+            write_text_file(path, lines_per_file, rng)
+            ingest(path, dirs, encoder)
+
+        new_file = os.path.join(src, "upload.txt")
+        write_text_file(new_file, lines_per_file, rng)
+        cached = ingest(new_file, dirs, encoder)
+        uncached = ingest(new_file, dirs, encoder, model_name="uncached")
+
+        stats = get_chunk_store(dirs["chunk_db_path"]).stats()
+    return cached, uncached, stats["chunks"] // stats["sources"]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10, 50, 200])
+    parser.add_argument("--lines-per-file", type=int, default=400)
+    parser.add_argument(
+        "--encoder", choices=["fake", "sentence-transformers"], default="fake"
+    )
+    parser.add_argument("--fake-ms-per-chunk", type=float, default=2.0)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    if args.encoder == "fake":
+        encoder = FakeEncoder(seconds_per_chunk=args.fake_ms_per_chunk / 1000)
+    else:
+        from sentence_transformers import SentenceTransformer
+
+        encoder = SentenceTransformer("all-MiniLM-L6-v2")
+
+    rows = []
+    for size in args.sizes:
+        cached, uncached, chunks_per_file = run(
+            size, encoder, args.lines_per_file, args.seed
+        )
+        rows.append((size + 1, (size + 1) * chunks_per_file, cached, uncached))
+
+    print(f"\n{'files':>6} {'~chunks':>8} {'cached (s)':>11} {'full (s)':>9} {'speed-up':>9}")
+    for files, chunks, cached, uncached in rows:
+        print(
+            f"{files:>6} {chunks:>8} {cached:>11.2f} {uncached:>9.2f} {uncached / cached:>8.1f}x"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,132 @@
+"""
+Benchmark: PDF page summarization, old sequential loop vs. PageSummarizer.
+
+Uses a local fake LLM with configurable latency and rate-limit error rate, so
+it runs offline and exercises the retry and checkpoint/resume paths:
+
+    python -m benchmarks.bench_pdf_summarization --pages 40 --latency 2.0
+    python -m benchmarks.bench_pdf_summarization --pages 40 --error-rate 0.1 --workers 8 --rate 4
+"""
+
+import argparse
+import os
+import random
+import tempfile
+import threading
+import time
+
+from rag_app.services.summarizer import PageSummarizer
+
+
+class ResourceExhausted(Exception):
+    """Same class name as google.api_core's 429 error"""
+
+
+class FakeSummaryModel:
+    """Stand-in for GenerativeModel: sleeps `latency` seconds, sometimes returns 429"""
+
+    def __init__(self, latency=2.0, error_rate=0.0, fail_after=None, seed=0):
+        self.latency = latency
+        self.error_rate = error_rate
+        self.fail_after = fail_after
+        self.calls = 0
+        self.errors = 0
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def generate_content(self, contents):
+        prompt, image = contents
+        with self._lock:
+            self.calls += 1
+            if self.fail_after is not None and self.calls > self.fail_after:
+                raise RuntimeError("simulated crash")
+            rate_limited = self._rng.random() < self.error_rate
+            if rate_limited:
+                self.errors += 1
+        time.sleep(self.latency)
+        if rate_limited:
+            raise ResourceExhausted("429 Resource has been exhausted")
+        return type("Response", (), {"text": f"Summary of {image}"})()
+
+
+def legacy(llm, images, sleep_per_page, final_sleep):
+    """The loop process_and_update_index used to run"""
+    pages = []
+    for image in images:
+        pages.append(llm.generate_content(["Summarise the image.", image]).text)
+        time.sleep(sleep_per_page)
+    time.sleep(final_sleep)
+    return pages
+
+
+def timed(fn):
+    start = time.perf_counter()
+    result = fn()
+    return time.perf_counter() - start, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--pages", type=int, default=40)
+    parser.add_argument("--latency", type=float, default=2.0, help="seconds per LLM call")
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--rate", type=float, default=2.0, help="LLM calls per second")
+    parser.add_argument("--burst", type=int, default=4)
+    parser.add_argument("--skip-legacy", action="store_true")
+    args = parser.parse_args()
+
+    images = [f"page-{i}" for i in range(args.pages)]
+
+    if not args.skip_legacy:
+        seconds, _ = timed(
+            lambda: legacy(FakeSummaryModel(args.latency), images, 1.0, 10.0)
+        )
+        print(f"legacy sequential:   {seconds:7.1f}s  ({args.pages / seconds:.2f} pages/s)")
+
+    llm = FakeSummaryModel(args.latency, args.error_rate)
+    summarizer = PageSummarizer(
+        llm,
+        max_workers=args.workers,
+        rate_per_second=args.rate,
+        burst=args.burst,
+        backoff_seconds=0.5,
+    )
+    seconds, pages = timed(lambda: summarizer.summarize(images))
+    assert pages == [f"Summary of {image}" for image in images]
+    print(
+        f"PageSummarizer:      {seconds:7.1f}s  ({args.pages / seconds:.2f} pages/s, "
+        f"{llm.calls} calls, {llm.errors} rate-limited)"
+    )
+
+    # Crash halfway through, then resume from the checkpoint
+    with tempfile.TemporaryDirectory() as tmp:
+        checkpoint = os.path.join(tmp, "report.pdf.progress.json")
+        crashing = PageSummarizer(
+            FakeSummaryModel(args.latency, fail_after=args.pages // 2),
+            max_workers=args.workers,
+            rate_per_second=args.rate,
+            burst=args.burst,
+        )
+        try:
+            crashing.summarize(images, checkpoint_path=checkpoint, source_hash="x")
+        except RuntimeError:
+            pass
+        resumed_llm = FakeSummaryModel(args.latency)
+        seconds, pages = timed(
+            lambda: PageSummarizer(
+                resumed_llm,
+                max_workers=args.workers,
+                rate_per_second=args.rate,
+                burst=args.burst,
+            ).summarize(images, checkpoint_path=checkpoint, source_hash="x")
+        )
+        assert pages == [f"Summary of {image}" for image in images]
+        print(
+            f"resume after crash:  {seconds:7.1f}s  "
+            f"({resumed_llm.calls} of {args.pages} pages re-requested)"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,266 @@
+"""
+Benchmark: recall@k and query latency of the vector backends across corpus sizes.
+
+Seeds from the real index (vector_store/annoy_st_index.ann, one vector per
+chunk in data/doc_mapping.json) and synthesizes larger corpora by adding
+jittered copies around every real chunk, so the cluster structure of the
+corpus is kept. For every backend configuration it reports recall@k against
+exact brute-force search, p50/p95/p99 single-query latency, build time, index
+size on disk and the resident memory of a process serving it, and writes
+everything to a JSON report so runs can be compared over time:
+
+    python -m benchmarks.bench_retrieval --scales 1 10 100 --output retrieval.json
+    python -m benchmarks.bench_retrieval --backends annoy faiss-hnsw --k 5
+
+Queries are real chunk vectors plus noise (a paraphrase stand-in); with
+`--encoder sentence-transformers` they are the first sentences of the chunks
+encoded by the embedding model instead. Each configuration is served from a
+fresh process so its memory and latency are not skewed by the others.
+"""
+
+import argparse
+import json
+import os
+import platform
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_context
+
+import numpy as np
+from annoy import AnnoyIndex
+
+from benchmarks.load_test_process_request import percentile
+from rag_app.services.vector_store import create_vector_store
+from rag_app.config.settings_loader import (
+    ANNOY_INDEX_PATH,
+    DOC_MAPPING_PATH,
+    VECTOR_DIM,
+    EMBEDDING_MODEL_NAME,
+)
+
+# Each entry is built once; its "search" variants reopen the same file
+CONFIGS = [
+    {
+        "backend": "annoy",
+        "build": {"n_trees": 10},
+        "search": [{"search_k": -1}, {"search_k": 20000}],
+    },
+    {
+        "backend": "annoy",
+        "build": {"n_trees": 50},
+        "search": [{"search_k": -1}, {"search_k": 20000}],
+    },
+    {"backend": "faiss-flat", "build": {}, "search": [{}]},
+    {
+        "backend": "faiss-hnsw",
+        "build": {"M": 16, "ef_construction": 100},
+        "search": [{"ef_search": 16}, {"ef_search": 64}, {"ef_search": 128}],
+    },
+    {
+        "backend": "faiss-hnsw",
+        "build": {"M": 32, "ef_construction": 200},
+        "search": [{"ef_search": 16}, {"ef_search": 64}, {"ef_search": 128}],
+    },
+    {
+        "backend": "faiss-ivfpq",
+        "build": {"m": 48},
+        "search": [{"nprobe": 4}, {"nprobe": 16}, {"nprobe": 64}],
+    },
+    {
+        "backend": "faiss-ivfpq",
+        "build": {"m": 96},
+        "search": [{"nprobe": 4}, {"nprobe": 16}, {"nprobe": 64}],
+    },
+]
+
+
+def unit(vectors):
+    return vectors / np.linalg.norm(vectors, axis=-1, keepdims=True)
+
+
+def load_seed(index_path, mapping_path):
+    """Real chunk vectors and texts, in chunk id order"""
+    with open(mapping_path, encoding="utf-8") as f:
+        mapping = json.load(f)
+    index = AnnoyIndex(VECTOR_DIM, "angular")
+    index.load(index_path)
+    n = index.get_n_items()
+    vectors = np.array([index.get_item_vector(i) for i in range(n)], dtype="float32")
+    index.unload()
+    texts = [mapping.get(str(i), "") for i in range(n)]
+    return unit(vectors), texts
+
+
+def synthesize(seed, scale, spread, rng):
+    """`scale` x the seed corpus: the real vectors plus jittered copies of each"""
+    if scale <= 1:
+        return seed
+    copies = np.repeat(seed, scale - 1, axis=0)
+    noise = rng.standard_normal(copies.shape).astype("float32")
+    copies = unit(copies + spread * noise / np.sqrt(seed.shape[1]))
+    return np.vstack([seed, copies])
+
+
+def make_queries(seed, texts, n_queries, noise, encoder, rng):
+    picks = rng.choice(len(seed), size=min(n_queries, len(seed)), replace=False)
+    if encoder == "sentence-transformers":
+        from sentence_transformers import SentenceTransformer
+
+        model = SentenceTransformer(EMBEDDING_MODEL_NAME)
+        sentences = [texts[i].split(". ")[0] or texts[i] for i in picks]
+        return model.encode(sentences, normalize_embeddings=True).astype("float32")
+    jitter = rng.standard_normal((len(picks), seed.shape[1])).astype("float32")
+    return unit(seed[picks] + noise * jitter / np.sqrt(seed.shape[1]))
+
+
+def exact_neighbours(corpus, queries, k):
+    scores = queries @ corpus.T
+    top = np.argpartition(-scores, k, axis=1)[:, :k]
+    order = np.argsort(-np.take_along_axis(scores, top, axis=1), axis=1)
+    return np.take_along_axis(top, order, axis=1)
+
+
+def rss_bytes():
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    import resource
+
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+def serve(backend, path, params, queries_path, truth_path, k):
+    """Runs in a fresh process: load the index, time every query, score recall"""
+    queries = np.load(queries_path)
+    truth = np.load(truth_path)
+    store = create_vector_store(backend, queries.shape[1], params)  # imports the library
+    baseline = rss_bytes()
+
+    start = time.perf_counter()
+    store.load(path)
+    load_seconds = time.perf_counter() - start
+    for query in queries[:10]:
+        store.search(query, k)
+
+    latencies, hits = [], 0
+    for query, expected in zip(queries, truth):
+        start = time.perf_counter()
+        found = store.search(query, k)
+        latencies.append(time.perf_counter() - start)
+        hits += len(set(found[:k]) & set(expected.tolist()))
+
+    return {
+        "load_seconds": load_seconds,
+        f"recall_at_{k}": hits / (len(queries) * k),
+        "p50_ms": percentile(latencies, 50) * 1000,
+        "p95_ms": percentile(latencies, 95) * 1000,
+        "p99_ms": percentile(latencies, 99) * 1000,
+        "rss_mib": (rss_bytes() - baseline) / 2**20,
+    }
+
+
+def run_scale(scale, corpus, queries, configs, k, workdir):
+    truth = exact_neighbours(corpus, queries, k)
+    queries_path = os.path.join(workdir, "queries.npy")
+    truth_path = os.path.join(workdir, "truth.npy")
+    np.save(queries_path, queries)
+    np.save(truth_path, truth)
+
+    rows = []
+    for config in configs:
+        store = create_vector_store(config["backend"], corpus.shape[1], config["build"])
+        start = time.perf_counter()
+        store.build(corpus)
+        build_seconds = time.perf_counter() - start
+        path = os.path.join(workdir, store.file_name)
+        store.save(path)
+        built_params = store.params  # IVF-PQ may shrink nlist/nbits on small corpora
+        store.unload()
+
+        for search in config["search"]:
+            params = {**built_params, **search}
+            with ProcessPoolExecutor(1, mp_context=get_context("spawn")) as pool:
+                served = pool.submit(
+                    serve, config["backend"], path, params, queries_path, truth_path, k
+                ).result()
+            row = {
+                "scale": scale,
+                "n_items": len(corpus),
+                "backend": config["backend"],
+                "params": params,
+                "build_seconds": build_seconds,
+                "disk_mib": os.path.getsize(path) / 2**20,
+                **served,
+            }
+            rows.append(row)
+            print_row(row, k)
+        os.remove(path)
+    return rows
+
+
+def print_row(row, k):
+    params = ",".join(f"{key}={value}" for key, value in row["params"].items())
+    print(
+        f"{row['n_items']:>8} {row['backend']:<12} {params:<48} "
+        f"{row[f'recall_at_{k}']:>7.3f} {row['p50_ms']:>7.3f} {row['p95_ms']:>7.3f} "
+        f"{row['p99_ms']:>7.3f} {row['build_seconds']:>8.2f} {row['disk_mib']:>8.2f} "
+        f"{row['rss_mib']:>8.2f}"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--index", default=ANNOY_INDEX_PATH)
+    parser.add_argument("--mapping", default=DOC_MAPPING_PATH)
+    parser.add_argument("--scales", type=int, nargs="+", default=[1, 10, 100])
+    parser.add_argument("--backends", nargs="+", help="only these backends")
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--query-noise", type=float, default=0.6)
+    parser.add_argument("--spread", type=float, default=0.4, help="jitter of synthetic chunks")
+    parser.add_argument(
+        "--encoder", choices=["perturbed", "sentence-transformers"], default="perturbed"
+    )
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", default="bench_retrieval.json")
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(args.seed)
+    seed, texts = load_seed(args.index, args.mapping)
+    queries = make_queries(seed, texts, args.queries, args.query_noise, args.encoder, rng)
+    configs = [c for c in CONFIGS if not args.backends or c["backend"] in args.backends]
+    print(f"{len(seed)} seed chunks, {len(queries)} {args.encoder} queries, k={args.k}\n")
+
+    print(
+        f"{'items':>8} {'backend':<12} {'params':<48} {'recall':>7} {'p50 ms':>7} "
+        f"{'p95 ms':>7} {'p99 ms':>7} {'build s':>8} {'disk MiB':>8} {'RSS MiB':>8}"
+    )
+    rows = []
+    for scale in args.scales:
+        corpus = synthesize(seed, scale, args.spread, rng)
+        with tempfile.TemporaryDirectory() as workdir:
+            rows.extend(run_scale(scale, corpus, queries, configs, args.k, workdir))
+
+    report = {
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "host": {
+            "python": platform.python_version(),
+            "machine": platform.machine(),
+            "cpus": os.cpu_count(),
+        },
+        "args": vars(args),
+        "seed_items": len(seed),
+        "results": rows,
+    }
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    print(f"\nReport written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,212 @@
+"""
+Benchmark: worker startup time and memory, loading per worker vs. preloaded.
+
+Forks N workers the way gunicorn does, in two modes:
+
+    per-worker  every worker imports the app and loads the model and indexes
+    preload     the master imports the app, runs warmup() and gc.freeze(),
+                then forks; workers share what it loaded copy-on-write
+
+Each worker answers one retrieval query (embedding + index search) before it
+reports ready. The report has the time until every worker is ready and the
+memory of master + workers: PSS (shared pages split between processes, so it
+adds up to real usage) and the private memory of each worker.
+
+    python -m benchmarks.bench_startup --workers 4
+    python -m benchmarks.bench_startup --encoder stand-in
+
+`--encoder stand-in` builds all-MiniLM-L6-v2's architecture with random
+weights (same size) for machines that cannot download the model.
+"""
+
+import argparse
+import gc
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import zlib
+
+import django
+
+
+class StandInEncoder:
+    """BERT with all-MiniLM-L6-v2's shape (~22M parameters) and random weights"""
+
+    def __init__(self):
+        import torch
+        from transformers import BertConfig, BertModel
+
+        torch.manual_seed(0)
+        config = BertConfig(
+            vocab_size=30522,
+            hidden_size=384,
+            num_hidden_layers=6,
+            num_attention_heads=12,
+            intermediate_size=1536,
+        )
+        self.torch = torch
+        self.model = BertModel(config).eval()
+        self.vocab_size = config.vocab_size
+
+    def encode(self, sentences, batch_size=32, **kwargs):
+        """Padded batches and masked mean pooling, like sentence-transformers"""
+        torch = self.torch
+        vectors = []
+        with torch.no_grad():
+            for i in range(0, len(sentences), batch_size):
+                ids = [
+                    [zlib.crc32(w.encode()) % self.vocab_size for w in s.split()[:128]] or [0]
+                    for s in sentences[i : i + batch_size]
+                ]
+                width = max(len(row) for row in ids)
+                mask = torch.tensor([[1] * len(row) + [0] * (width - len(row)) for row in ids])
+                padded = torch.tensor([row + [0] * (width - len(row)) for row in ids])
+                hidden = self.model(padded, attention_mask=mask).last_hidden_state
+                pooled = (hidden * mask.unsqueeze(-1)).sum(1) / mask.sum(1, keepdim=True)
+                vectors.extend(torch.nn.functional.normalize(pooled, dim=1).numpy())
+        return vectors
+
+
+def load_app(encoder):
+    """Import the app and load everything a worker needs; returns the load time"""
+    start = time.perf_counter()
+    import rag_app.urls  # its import cost is part of startup
+
+    from rag_app.services.embedding_service import get_embedding_service
+    from rag_app.services.model_registry import warmup
+
+    if encoder == "stand-in":
+        get_embedding_service()._model = StandInEncoder()
+    warmup()
+    return time.perf_counter() - start
+
+
+def worker(mode, encoder, ready_fd, exit_fd, forked_at):
+    result = {"pid": os.getpid()}
+    if mode == "per-worker":
+        result["load_seconds"] = load_app(encoder)
+    from rag_app.services.chat_pipeline import retrieve_local_context
+
+    retrieve_local_context("How is AI changing demand for data analysts?")
+    result["ready_seconds"] = time.perf_counter() - forked_at
+    os.write(ready_fd, (json.dumps(result) + "\n").encode())
+    os.read(exit_fd, 1)  # stay alive until the parent has measured memory
+    os._exit(0)
+
+
+def memory(pid):
+    """PSS and private (unshared) bytes of a process"""
+    values = {}
+    with open(f"/proc/{pid}/smaps_rollup") as f:
+        for line in f:
+            parts = line.split()
+            if len(parts) >= 3 and parts[2] == "kB":
+                values[parts[0].rstrip(":")] = int(parts[1]) * 1024
+    return values["Pss"], values["Private_Clean"] + values["Private_Dirty"]
+
+
+def run(mode, n_workers, encoder):
+    start = time.perf_counter()
+    master_seconds = 0.0
+    if mode == "preload":
+        master_seconds = load_app(encoder)
+        gc.freeze()
+
+    ready_r, ready_w = os.pipe()
+    exit_r, exit_w = os.pipe()
+    forked_at = time.perf_counter()
+    pids = []
+    for _ in range(n_workers):
+        pid = os.fork()
+        if pid == 0:
+            os.close(ready_r)
+            os.close(exit_w)
+            worker(mode, encoder, ready_w, exit_r, forked_at)
+        pids.append(pid)
+    os.close(ready_w)
+    os.close(exit_r)
+
+    results = []
+    with os.fdopen(ready_r) as ready:
+        for _ in range(n_workers):
+            results.append(json.loads(ready.readline()))
+    all_ready = time.perf_counter() - start
+
+    master_pss, _ = memory(os.getpid())
+    workers = [memory(pid) for pid in pids]
+    os.close(exit_w)
+    for pid in pids:
+        os.waitpid(pid, 0)
+
+    ready_seconds = [r["ready_seconds"] for r in results]
+    return {
+        "mode": mode,
+        "workers": n_workers,
+        "master_load_seconds": master_seconds,
+        "all_ready_seconds": all_ready,
+        "worker_ready_p50_seconds": statistics.median(ready_seconds),
+        "worker_ready_max_seconds": max(ready_seconds),
+        "total_pss_mib": (master_pss + sum(pss for pss, _ in workers)) / 2**20,
+        "worker_private_mib": statistics.mean(private for _, private in workers) / 2**20,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--mode", choices=["per-worker", "preload"], help="only this mode")
+    parser.add_argument(
+        "--encoder",
+        choices=["sentence-transformers", "stand-in"],
+        default="sentence-transformers",
+    )
+    parser.add_argument("--output", help="also write the results as JSON here")
+    args = parser.parse_args()
+
+    if args.mode is None:
+        # Each mode needs a fresh parent that has not imported the app yet
+        rows = []
+        with tempfile.TemporaryDirectory() as tmp:
+            for mode in ("per-worker", "preload"):
+                path = os.path.join(tmp, f"{mode}.json")
+                command = [sys.executable, "-m", "benchmarks.bench_startup"]
+                command += ["--mode", mode, "--workers", str(args.workers)]
+                command += ["--encoder", args.encoder, "--output", path]
+                subprocess.run(command, check=True)
+                with open(path) as f:
+                    rows.extend(json.load(f))
+        print_rows(rows)
+        if args.output:
+            with open(args.output, "w") as f:
+                json.dump(rows, f, indent=2)
+        return
+
+    os.environ.setdefault("DJANGO_SETTINGS_MODULE", "job_trends_agent.settings")
+    django.setup()
+    rows = [run(args.mode, args.workers, args.encoder)]
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(rows, f, indent=2)
+    else:
+        print_rows(rows)
+
+
+def print_rows(rows):
+    print(
+        f"\n{'mode':<11} {'workers':>7} {'master s':>9} {'all ready s':>11} "
+        f"{'worker p50 s':>12} {'total PSS MiB':>13} {'private/worker MiB':>18}"
+    )
+    for row in rows:
+        print(
+            f"{row['mode']:<11} {row['workers']:>7} {row['master_load_seconds']:>9.2f} "
+            f"{row['all_ready_seconds']:>11.2f} {row['worker_ready_p50_seconds']:>12.2f} "
+            f"{row['total_pss_mib']:>13.0f} {row['worker_private_mib']:>18.0f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
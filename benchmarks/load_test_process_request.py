@@ -0,0 +1,119 @@
+"""
+Load test: throughput and latency of the WSGI vs. ASGI chat pipelines.
+
+Start the two servers with the same number of worker processes, e.g.
+
+    gunicorn job_trends_agent.wsgi -w 1 --threads 8 -b 127.0.0.1:8000
+    uvicorn job_trends_agent.asgi:application --workers 1 --port 8001
+
+then fire the same question mix at both:
+
+    python -m benchmarks.load_test_process_request \\
+        --target wsgi=http://127.0.0.1:8000/process_request/ \\
+        --target asgi=http://127.0.0.1:8001/process_request_async/ \\
+        --concurrency 32 --requests 256 --web-search
+
+Each virtual user keeps its own cookie jar, like a browser session.
+"""
+
+import argparse
+import statistics
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+import requests
+
+QUESTIONS = [
+    "How is AI changing demand for data analysts?",
+    "Which skills are growing fastest in the labour market?",
+    "What are the latest trends in software engineering hiring?",
+    "How will automation affect administrative jobs?",
+    "Which industries are adopting AI the fastest?",
+    "What is the outlook for business analyst roles?",
+]
+
+
+def percentile(values, pct):
+    values = sorted(values)
+    if not values:
+        return 0.0
+    index = min(len(values) - 1, int(round(pct / 100 * (len(values) - 1))))
+    return values[index]
+
+
+def run_target(url, n_requests, concurrency, web_search, timeout):
+    latencies = []
+    errors = 0
+    lock = threading.Lock()
+    local = threading.local()
+
+    def one(i):
+        nonlocal errors
+        if not hasattr(local, "session"):
+            local.session = requests.Session()
+        data = {"text": QUESTIONS[i % len(QUESTIONS)]}
+        if web_search:
+            data["web_search"] = "true"
+        start = time.perf_counter()
+        try:
+            response = local.session.post(url, data=data, timeout=timeout)
+            ok = response.status_code == 200
+        except requests.RequestException:
+            ok = False
+        elapsed = time.perf_counter() - start
+        with lock:
+            if ok:
+                latencies.append(elapsed)
+            else:
+                errors += 1
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        list(pool.map(one, range(n_requests)))
+    wall = time.perf_counter() - start
+
+    return {
+        "requests": n_requests,
+        "errors": errors,
+        "wall_s": wall,
+        "throughput_rps": len(latencies) / wall if wall else 0.0,
+        "p50_s": percentile(latencies, 50),
+        "p95_s": percentile(latencies, 95),
+        "mean_s": statistics.fmean(latencies) if latencies else 0.0,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument(
+        "--target",
+        action="append",
+        required=True,
+        help="name=url of a process_request endpoint; repeat to compare",
+    )
+    parser.add_argument("--requests", type=int, default=128)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--web-search", action="store_true")
+    parser.add_argument("--timeout", type=float, default=120)
+    args = parser.parse_args()
+
+    results = {}
+    for target in args.target:
+        name, url = target.split("=", 1)
+        print(f"Running {args.requests} requests against {name} ({url})...")
+        results[name] = run_target(
+            url, args.requests, args.concurrency, args.web_search, args.timeout
+        )
+
+    print(
+        f"\n{'target':<10} {'req/s':>8} {'p50 (s)':>8} {'p95 (s)':>8} {'mean (s)':>9} {'errors':>7}"
+    )
+    for name, r in results.items():
+        print(
+            f"{name:<10} {r['throughput_rps']:>8.2f} {r['p50_s']:>8.2f} "
+            f"{r['p95_s']:>8.2f} {r['mean_s']:>9.2f} {r['errors']:>7}"
+        )
+
+
+if __name__ == "__main__":
+    main()
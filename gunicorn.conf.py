@@ -0,0 +1,26 @@
+"""
+gunicorn settings: `gunicorn job_trends_agent.wsgi` picks this file up.
+
+The app is imported once in the master (preload_app) and warmed up before
+the workers are forked, so they share the embedding model weights and the
+mmapped indexes copy-on-write instead of each loading its own copy.
+"""
+
+import gc
+import os
+
+bind = os.getenv("GUNICORN_BIND", "0.0.0.0:8000")
+workers = int(os.getenv("WEB_CONCURRENCY", "2"))
+threads = int(os.getenv("GUNICORN_THREADS", "8"))
+timeout = 120  # LLM calls plus crawling can take a while
+preload_app = True
+
+
+def when_ready(server):
+    """Runs in the master after the app is loaded and before any worker forks"""
+    from rag_app.services.model_registry import warmup
+
+    warmup()
+    # Keep the garbage collector from writing to (and so un-sharing) the
+    # pages of everything loaded so far
+    gc.freeze()
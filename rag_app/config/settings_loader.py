@@ -6,10 +6,120 @@ load_dotenv()
 
 GOOGLE_API_KEY = os.getenv("GEMINI_API_KEY")
 SERPAPI_KEY = os.getenv("SERPAPI_KEY")
+GEMINI_MODEL_NAME = "gemini-2.0-flash"
 MAX_CONTEXT_HISTORY = 5
+RETRIEVAL_TOP_K = 5
+# Hybrid retrieval: fuse this many Annoy and BM25 candidates by reciprocal rank
+HYBRID_RETRIEVAL = True
+HYBRID_CANDIDATES = 20
+RRF_K = 60
+
+# Async pipeline (/process_request_async/): executor sizes for blocking calls
+ASYNC_CPU_WORKERS = 4
+ASYNC_IO_WORKERS = 32
+ASYNC_LLM_CONCURRENCY = 16
 
 # Load Annoy index + embeddings
 VECTOR_DIM = 384
+EMBEDDING_MODEL_NAME = "all-MiniLM-L6-v2"
+# How the embedding model runs: "torch" (fp32), "torch-int8" (dynamically
+# quantized), "onnx" or "onnx-int8" (ONNX Runtime, needs optimum[onnxruntime]).
+# Compare them with benchmarks/bench_embedding_backends.py before switching.
+EMBEDDING_BACKEND = "torch"
+# Quantized graph shipped in the model repo; *_avx512_vnni / *_arm64 variants
+# are faster on CPUs that support them
+EMBEDDING_ONNX_INT8_FILE = "onnx/model_quint8_avx2.onnx"
+QUERY_EMBEDDING_CACHE_SIZE = 1024
+# Query embeddings of concurrent requests are encoded together: a batch closes
+# after this many milliseconds or EMBEDDING_MAX_BATCH queries, whichever first
+EMBEDDING_MICRO_BATCHING = True
+EMBEDDING_BATCH_WINDOW_MS = 3
+EMBEDDING_MAX_BATCH = 32
 ANNOY_INDEX_PATH = "vector_store/annoy_st_index.ann"
+# Vector index used for new builds: "annoy", "faiss-flat", "faiss-hnsw" or
+# "faiss-ivfpq" (quantized, ~m bytes per vector). Served generations use
+# whatever backend they were built with (recorded in meta.json).
+VECTOR_BACKEND = "annoy"
+VECTOR_BACKEND_PARAMS = {
+    "annoy": {"n_trees": 10, "search_k": -1},
+    "faiss-flat": {},
+    "faiss-hnsw": {"M": 32, "ef_construction": 200, "ef_search": 64},
+    "faiss-ivfpq": {"nlist": 256, "m": 48, "nbits": 8, "nprobe": 16},
+}
+
+# Versioned index builds; CURRENT holds the name of the generation being served
+INDEX_GENERATIONS_DIR = "vector_store/generations"
+INDEX_CURRENT_PATH = "vector_store/CURRENT"
+INDEX_GENERATIONS_TO_KEEP = 3
 DOC_MAPPING_PATH = "data/doc_mapping.json"
+# Memory-mapped chunk store converted from DOC_MAPPING_PATH on first use
+DOC_STORE_PATH = "data/doc_store.bin"
 FEEDBACK_LOG_PATH = "data/rlhf_feedback_log.jsonl"
+FEEDBACK_SIMILARITY_THRESHOLD = 0.8
+# Above this many logged queries, similarity search goes through an Annoy index
+FEEDBACK_ANN_MIN_ROWS = 20000
+
+# Web search cache (SQLite, shared by all workers); the JSON file is imported once
+WEB_CACHE_DB_PATH = "data/web_search_cache.sqlite3"
+WEB_CACHE_LEGACY_PATH = "data/web_search_cache.json"
+WEB_CACHE_TTL_SECONDS = 24 * 60 * 60
+WEB_CACHE_MAX_ENTRIES = 10000
+
+# Crawled pages: URL index in SQLite, extracted content stored once per hash;
+# pages younger than CRAWL_FRESH_SECONDS are served without a request
+CRAWLED_DATA_PATH = "data/crawled_data"
+CRAWL_STORE_DB_PATH = "data/crawled_data/pages.sqlite3"
+CRAWL_FRESH_SECONDS = 6 * 60 * 60
+# Pages are streamed and parsed in one pass; "lxml" is used if installed
+CRAWL_HTML_BACKEND = "stdlib"
+CRAWL_CHUNK_BYTES = 16 * 1024
+CRAWL_MAX_BYTES = 2 * 1024 * 1024
+# One crawler per process: pooled connections, per-host limits, and a deadline
+# after which a request goes ahead with the pages that have arrived
+CRAWL_MAX_WORKERS = 16
+CRAWL_POOL_SIZE = 32
+CRAWL_PER_HOST_CONCURRENCY = 2
+CRAWL_HOST_DELAY_SECONDS = 0.5
+CRAWL_ROBOTS_TTL_SECONDS = 60 * 60
+CRAWL_REQUEST_TIMEOUT = 10
+CRAWL_DEADLINE_SECONDS = 8.0
+
+# Answer cache: reuse a reply when a near-duplicate question retrieved the same
+# chunks; the previous generation's entries are dropped once answers from a
+# newly published one come in
+ANSWER_CACHE_MAX_ENTRIES = 2048
+ANSWER_CACHE_SIMILARITY = 0.92
+ANSWER_CACHE_WEB_TTL_SECONDS = 60 * 60
+
+# Batch question answering (/process_batch/ and `manage.py answer_batch`)
+BATCH_MAX_QUESTIONS = 1000
+BATCH_LLM_CONCURRENCY = 8
+BATCH_SEARCH_CONCURRENCY = 8
+
+# Ingestion: PDF/PNG page summarization with the LLM
+SUMMARY_MAX_WORKERS = 4
+SUMMARY_RATE_PER_SECOND = 1.0  # shared by all workers; match the Gemini quota
+SUMMARY_BURST = 4
+SUMMARY_MAX_RETRIES = 5
+SUMMARY_BACKOFF_SECONDS = 2.0
+# Ingested chunks and their embeddings, append-only (replaces data/PickleFiles,
+# whose pickles are imported by `manage.py migrate_chunk_store` or the next upload)
+CHUNK_STORE_DB_PATH = "data/chunks.sqlite3"
+# Ingestion: TXT/CSV files are chunked as a stream and stored and embedded
+# this many chunks at a time, so memory does not grow with the file
+CHUNK_SIZE = 1000
+CHUNK_OVERLAP = 200
+INGEST_EMBED_BATCH = 256
+# Uploaded CSVs are also aggregated (counts, medians, growth per period) by
+# their title / region / other category columns; questions naming one of
+# those values get the exact figures in the prompt
+AGGREGATES_DIR = "data/aggregates"
+AGGREGATE_MAX_DIMENSIONS = 4
+AGGREGATE_MAX_MEASURES = 4
+AGGREGATE_PERIOD = "Q"  # pandas period frequency for date columns
+AGGREGATE_MAX_FACTS = 5
+
+# Background evaluation: bounded queue, drained in batches (one MLflow run each)
+EVAL_QUEUE_MAX_SIZE = 100
+EVAL_BATCH_SIZE = 16
+EVAL_FLUSH_SECONDS = 5.0
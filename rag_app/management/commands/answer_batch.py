@@ -0,0 +1,52 @@
+import sys
+import json
+from django.core.management.base import BaseCommand, CommandError
+
+from rag_app.services.batch_qa import parse_question, answer_batch
+from rag_app.config.settings_loader import BATCH_LLM_CONCURRENCY
+
+
+class Command(BaseCommand):
+    help = "Answer a JSONL file of questions (one per line) and write JSONL answers"
+
+    def add_arguments(self, parser):
+        parser.add_argument("input", help="JSONL questions, or - for stdin")
+        parser.add_argument("-o", "--output", default="-", help="JSONL answers, or - for stdout")
+        parser.add_argument(
+            "--concurrency", type=int, default=BATCH_LLM_CONCURRENCY, help="parallel LLM calls"
+        )
+        web = parser.add_mutually_exclusive_group()
+        web.add_argument("--web-search", dest="web_search", action="store_true", default=None)
+        web.add_argument("--no-web-search", dest="web_search", action="store_false")
+
+    def handle(self, *args, **options):
+        source = sys.stdin if options["input"] == "-" else open(options["input"])
+        try:
+            lines = [line for line in source if line.strip()]
+        finally:
+            if source is not sys.stdin:
+                source.close()
+        try:
+            items = [parse_question(json.loads(line), i) for i, line in enumerate(lines)]
+        except ValueError as e:
+            raise CommandError(f"Invalid JSONL: {e}")
+
+        results, stats = answer_batch(
+            items, web_search=options["web_search"], llm_concurrency=options["concurrency"]
+        )
+
+        target = sys.stdout if options["output"] == "-" else open(options["output"], "w")
+        try:
+            for result in results:
+                target.write(json.dumps(result) + "\n")
+        finally:
+            if target is not sys.stdout:
+                target.close()
+
+        self.stderr.write(
+            f"Answered {stats['questions']} questions in {stats['seconds']:.1f}s "
+            f"({stats['questions_per_second']:.2f} questions/s): "
+            f"{stats['llm_calls']} LLM calls, {stats['cache_hits']} cache hits, "
+            f"{stats['web_searches']} web searches, {stats['crawled_pages']} pages crawled, "
+            f"{stats['errors']} errors"
+        )
@@ -0,0 +1,26 @@
+from django.core.management.base import BaseCommand
+
+from rag_app.services.chunk_store import get_chunk_store
+from rag_app.services.index_store import build_lock
+from rag_app.config.settings_loader import CHUNK_STORE_DB_PATH, INDEX_GENERATIONS_DIR
+
+
+class Command(BaseCommand):
+    help = "Import the pickles of files processed before the chunk store existed (run once after deploy)"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--pickle-dir", default="data/PickleFiles", help="folder with the old .pkl files"
+        )
+        parser.add_argument("--db", default=CHUNK_STORE_DB_PATH, help="chunk store database")
+
+    def handle(self, *args, **options):
+        store = get_chunk_store(options["db"])
+        # Same lock as uploads, so an ingest in progress is not overwritten
+        with build_lock(INDEX_GENERATIONS_DIR):
+            imported = store.migrate_pickles(options["pickle_dir"])
+        stats = store.stats()
+        self.stdout.write(
+            f"Imported {imported} files; the chunk store has {stats['sources']} files, "
+            f"{stats['chunks']} chunks and {stats['embeddings']} embeddings"
+        )
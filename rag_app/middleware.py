@@ -0,0 +1,56 @@
+import time
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+
+from rag_app.services.metrics import (
+    REQUESTS,
+    REQUEST_SECONDS,
+    RequestTimings,
+    current_timings,
+)
+
+
+class ServerTimingMiddleware:
+    """
+    Collects the stage spans of each request into a Server-Timing header and
+    the request latency histograms. Streamed responses only report the stages
+    that ran before the first byte; their later stages still reach /metrics.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.is_async = iscoroutinefunction(get_response)
+        if self.is_async:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+        timings = RequestTimings()
+        token = current_timings.set(timings)
+        try:
+            response = self.get_response(request)
+        finally:
+            current_timings.reset(token)
+        return self._finish(request, response, timings)
+
+    async def __acall__(self, request):
+        timings = RequestTimings()
+        token = current_timings.set(timings)
+        try:
+            response = await self.get_response(request)
+        finally:
+            current_timings.reset(token)
+        return self._finish(request, response, timings)
+
+    def _finish(self, request, response, timings):
+        total = time.perf_counter() - timings.start
+        # The URL pattern, not the path, keeps the number of series bounded
+        match = getattr(request, "resolver_match", None)
+        route = match.route if match else "unmatched"
+        REQUEST_SECONDS.observe(total, route=route)
+        REQUESTS.inc(route=route, status=response.status_code)
+        response["Server-Timing"] = timings.header(total)
+        return response
@@ -1,5 +1,9 @@
 WEB_CONTEXT_NOTE = """The following are web search results (if any) related to the user's question. Use this information to provide a more accurate and up-to-date answer."""
 
+STRUCTURED_FACTS_NOTE = """
+[Exact Figures from Uploaded Data]
+These were computed over every row of the uploaded CSV files. Use them for counts, medians, averages and growth rather than estimating from individual rows above, and say which file they come from."""
+
 KNOWLEDGE_BASE_CONTEXT_PROMPT = """You are a helpful analyst chatbot that answers user questions based on labor market data, web search results, and prior context.
 
 [Conversation History]
@@ -7,6 +11,7 @@ KNOWLEDGE_BASE_CONTEXT_PROMPT = """You are a helpful analyst chatbot that answer
 
 [Retrieved Context from Knowledge Base]
 {context_docs}
+{structured_facts}
 
 {web_context_note}
 {web_results}
@@ -0,0 +1,149 @@
+import time
+import hashlib
+import threading
+from collections import OrderedDict
+import numpy as np
+
+from rag_app.services.embedding_service import get_embedding_service
+from rag_app.config.settings_loader import (
+    ANSWER_CACHE_MAX_ENTRIES,
+    ANSWER_CACHE_SIMILARITY,
+    ANSWER_CACHE_WEB_TTL_SECONDS,
+)
+
+
+def _digest(texts):
+    """Hash of the prompt text an answer was given; None when there was none"""
+    if not texts:
+        return None
+    if isinstance(texts, str):
+        texts = [texts]
+    digest = hashlib.sha256()
+    for text in texts:
+        digest.update(text.encode("utf-8"))
+        digest.update(b"\0")
+    return digest.hexdigest()
+
+
+class AnswerKey:
+    """
+    What an answer depends on: the question's meaning and the context it was
+    given (index generation, chunk ids, CSV figures, web results, chat history)
+    """
+
+    def __init__(self, embedding, generation, doc_ids, web_results=(), facts=(), history=""):
+        embedding = np.asarray(embedding, dtype="float32")
+        self.embedding = embedding / (np.linalg.norm(embedding) or 1.0)
+        self.generation = generation
+        self.web = bool(web_results)
+        self.bucket = (
+            generation,
+            tuple(int(i) for i in doc_ids),
+            _digest(web_results),
+            tuple(facts),
+            _digest(history),
+        )
+
+
+class AnswerCache:
+    """
+    Replies to earlier questions, reused for near-duplicates: a hit needs the
+    same index generation, retrieved chunk ids, CSV figures, web results and
+    chat history, and a query embedding within `similarity` (cosine). The first
+    answer from a newly published generation drops the entries of the previous
+    one; answers that used web results also expire after `web_ttl_seconds`.
+    """
+
+    def __init__(
+        self,
+        max_entries=ANSWER_CACHE_MAX_ENTRIES,
+        similarity=ANSWER_CACHE_SIMILARITY,
+        web_ttl_seconds=ANSWER_CACHE_WEB_TTL_SECONDS,
+    ):
+        self.max_entries = max_entries
+        self.similarity = similarity
+        self.web_ttl_seconds = web_ttl_seconds
+        # AnswerKey.bucket -> [(unit embedding, reply, created, generation latency)]
+        self._buckets = OrderedDict()
+        self._entries = 0
+        self._generation = None  # newest generation answers were cached for
+        self._retired = set()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.saved_seconds = 0.0
+
+    def key(self, text, generation, doc_ids, web_results=(), facts=(), history=""):
+        return AnswerKey(
+            get_embedding_service().encode(text), generation, doc_ids, web_results, facts, history
+        )
+
+    def get(self, key):
+        """Cached reply for `key`, or None"""
+        now = time.time()
+        with self._lock:
+            entries = self._buckets.get(key.bucket, [])
+            if key.web:
+                live = [e for e in entries if now - e[2] < self.web_ttl_seconds]
+                self._entries -= len(entries) - len(live)
+                entries[:] = live
+            best = None
+            for entry in entries:
+                score = float(np.dot(entry[0], key.embedding))
+                if score >= self.similarity and (best is None or score > best[0]):
+                    best = (score, entry)
+            if best is None:
+                self.misses += 1
+                return None
+            self._buckets.move_to_end(key.bucket)
+            self.hits += 1
+            self.saved_seconds += best[1][3]
+            return best[1][1]
+
+    def put(self, key, reply_text, latency):
+        """Remember `reply_text`, which took `latency` seconds to generate"""
+        with self._lock:
+            if key.generation != self._generation:
+                if key.generation in self._retired:
+                    return  # a request that finished on the old generation
+                self._retire(self._generation)
+                self._generation = key.generation
+            entries = self._buckets.setdefault(key.bucket, [])
+            entries.append((key.embedding, reply_text, time.time(), latency))
+            self._buckets.move_to_end(key.bucket)
+            self._entries += 1
+            while self._entries > self.max_entries:
+                _, evicted = self._buckets.popitem(last=False)
+                self._entries -= len(evicted)
+
+    def _retire(self, generation):
+        """Drop every bucket of `generation` (call with the lock held)"""
+        if generation is None:
+            return
+        self._retired.add(generation)
+        for bucket in [b for b in self._buckets if b[0] == generation]:
+            self._entries -= len(self._buckets.pop(bucket))
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "saved_seconds": self.saved_seconds,
+                "entries": self._entries,
+            }
+
+
+_answer_cache = None
+_answer_cache_lock = threading.Lock()
+
+
+def get_answer_cache(create=True):
+    """Process-wide answer cache (None if not created yet and `create` is False)"""
+    global _answer_cache
+    with _answer_cache_lock:
+        if _answer_cache is None and create:
+            _answer_cache = AnswerCache()
+        return _answer_cache
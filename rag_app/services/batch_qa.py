@@ -0,0 +1,180 @@
+"""
+Answer many independent questions in one run (the nightly report job). Each
+stage is done once for the whole batch: one embedding batch, one pass over the
+index, one web search per distinct query, one crawl of the distinct result
+URLs, then the LLM calls with bounded concurrency.
+"""
+
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import google.ai.generativelanguage as glm
+
+from rag_app.services.crawler import get_crawler
+from rag_app.services.web_searcher import WebSearcher
+from rag_app.services.evaluation import get_evaluation_queue
+from rag_app.services.answer_cache import get_answer_cache, AnswerKey
+from rag_app.services.metrics import span
+from rag_app.services.embedding_service import get_embedding_service, normalize_query
+from rag_app.services.chat_pipeline import (
+    gemini_model,
+    index_manager,
+    search_generation,
+    lookup_structured_facts,
+    urls_to_crawl,
+    format_web_results,
+    build_system_prompt,
+)
+from rag_app.utils.is_web_search import should_use_web_search
+from rag_app.config.settings_loader import (
+    RETRIEVAL_TOP_K,
+    BATCH_LLM_CONCURRENCY,
+    BATCH_SEARCH_CONCURRENCY,
+)
+
+
+def parse_question(item, index):
+    """A JSONL input line: a string, or {"text" | "question", "id", "web_search"}"""
+    if isinstance(item, str):
+        item = {"text": item}
+    if not isinstance(item, dict):
+        raise ValueError(f"line {index + 1}: expected a string or an object")
+    text = item.get("text") or item.get("question")
+    if not isinstance(text, str) or not text.strip():
+        raise ValueError(f"line {index + 1}: expected a non-empty 'text'")
+    return {
+        "id": item.get("id", index),
+        "text": text,
+        "web_search": item.get("web_search"),
+    }
+
+
+def _retrieve_all(texts, top_k):
+    """Chunk ids and texts for every question, under one index generation"""
+    embeddings = get_embedding_service().encode_many(texts, cache=False)
+    with index_manager.acquire() as generation:
+        nearest = [
+            search_generation(generation, text, embedding, top_k)
+            for text, embedding in zip(texts, embeddings)
+        ]
+        unique_ids = sorted({i for ids in nearest for i in ids})
+        texts_by_id = {
+            chunk["id"]: chunk["text"]
+            for chunk in generation.doc_store.get_many(unique_ids)
+        }
+        generation_name = generation.name
+    context = [[texts_by_id[i] for i in ids] for ids in nearest]
+    return generation_name, embeddings, nearest, context
+
+
+def _search_all(queries, search_concurrency):
+    """Search results per distinct query, plus the crawled pages of all of them"""
+    searcher = WebSearcher()
+    with ThreadPoolExecutor(max_workers=search_concurrency) as pool:
+        results = dict(
+            zip(queries, pool.map(lambda q: searcher.search(q, num_results=5), queries))
+        )
+    urls = list(
+        dict.fromkeys(url for found in results.values() for url in urls_to_crawl(found))
+    )
+    # A batch job can wait for slow pages
+    crawled = get_crawler().crawl_multiple_urls(urls, deadline=None) if urls else []
+    return results, crawled
+
+
+def answer_batch(
+    items,
+    top_k=RETRIEVAL_TOP_K,
+    web_search=None,
+    llm_concurrency=BATCH_LLM_CONCURRENCY,
+    search_concurrency=BATCH_SEARCH_CONCURRENCY,
+):
+    """
+    Answers for parsed `items` (see parse_question), in input order, and run
+    stats. `web_search` forces web search on or off for every question;
+    by default each item's flag or the usual keyword heuristic decides.
+    """
+    start = time.perf_counter()
+    texts = [item["text"] for item in items]
+    stats = {
+        "questions": len(items),
+        "llm_calls": 0,
+        "cache_hits": 0,
+        "errors": 0,
+        "web_searches": 0,
+        "crawled_pages": 0,
+        "seconds": 0.0,
+        "questions_per_second": 0.0,
+    }
+    if not texts:
+        return [], stats
+
+    # 3. Retrieval for the whole batch
+    generation, embeddings, nearest, context = _retrieve_all(texts, top_k)
+
+    # 4. One web search per distinct query, one crawl for all result URLs
+    wants_web = []
+    for item in items:
+        flag = item["web_search"] if web_search is None else web_search
+        wants_web.append(should_use_web_search(item["text"]) if flag is None else flag)
+    queries = list(dict.fromkeys(normalize_query(t) for t, w in zip(texts, wants_web) if w))
+    search_results, crawled = _search_all(queries, search_concurrency) if queries else ({}, [])
+
+    # 8. LLM calls, bounded; near-duplicates of earlier answers come from the cache
+    answer_cache = get_answer_cache()
+    stats_lock = threading.Lock()
+
+    def count(name):
+        with stats_lock:
+            stats[name] += 1
+
+    def answer(i):
+        found = search_results.get(normalize_query(texts[i]), []) if wants_web[i] else []
+        web_results = format_web_results(found, crawled) if found else []
+        facts = lookup_structured_facts(texts[i])
+        key = AnswerKey(embeddings[i], generation, nearest[i], web_results, facts)
+        result = {
+            "id": items[i]["id"],
+            "question": texts[i],
+            "context_docs": context[i],
+            "web_search_performed": bool(web_results),
+            "search_sources": [
+                {"title": r.get("title", ""), "url": r.get("url", "")} for r in found[:3]
+            ],
+        }
+        reply_text = answer_cache.get(key)
+        if reply_text is not None:
+            count("cache_hits")
+        else:
+            system_prompt = build_system_prompt("", context[i], web_results, facts)
+            parts = [glm.Part(text=system_prompt), glm.Part(text=texts[i])]
+            llm_start = time.perf_counter()
+            try:
+                with span("llm"):
+                    response = gemini_model.generate_content(glm.Content(parts=parts))
+                reply_text = str(response.parts[0].text)
+            except Exception as e:
+                print(f"Error answering question {items[i]['id']}: {e}")
+                count("errors")
+                result["error"] = str(e)
+                return result
+            count("llm_calls")
+            answer_cache.put(key, reply_text, time.perf_counter() - llm_start)
+            get_evaluation_queue().submit(texts[i], context[i] + web_results, reply_text)
+        result["answer"] = reply_text
+        return result
+
+    with ThreadPoolExecutor(max_workers=llm_concurrency) as pool:
+        results = list(pool.map(answer, range(len(items))))
+
+    seconds = time.perf_counter() - start
+    stats.update(
+        {
+            "web_searches": len(queries),
+            "crawled_pages": len(crawled),
+            "seconds": seconds,
+            "questions_per_second": len(items) / seconds if seconds else 0.0,
+        }
+    )
+    return results, stats
@@ -0,0 +1,142 @@
+"""
+Stages of the /process_request/ pipeline, shared by the sync and async views.
+Each stage is a plain function so views can run them inline or hand them to
+an executor.
+"""
+
+import markdown
+
+from rag_app.prompt import (
+    WEB_CONTEXT_NOTE,
+    STRUCTURED_FACTS_NOTE,
+    KNOWLEDGE_BASE_CONTEXT_PROMPT,
+)
+from rag_app.services.embedding_service import get_embedding_service
+from rag_app.services.answer_cache import get_answer_cache
+from rag_app.services.csv_aggregates import get_aggregate_store
+from rag_app.services.model_registry import get_gemini_model, get_index_manager
+from rag_app.services.lexical_index import reciprocal_rank_fusion
+from rag_app.services.metrics import span
+from rag_app.config.settings_loader import (
+    RETRIEVAL_TOP_K,
+    HYBRID_RETRIEVAL,
+    HYBRID_CANDIDATES,
+    RRF_K,
+)
+
+# Gemini client (configured once per process)
+gemini_model = get_gemini_model()
+
+# Vector index + index -> text chunk mapping, loaded on first use and
+# hot-reloaded when a new generation is published by process_and_update_index
+index_manager = get_index_manager()
+
+
+def search_generation(generation, text, query_embedding, top_k=RETRIEVAL_TOP_K):
+    """
+    Chunk ids for a query: vector neighbours fused with BM25 keyword matches by
+    reciprocal rank, so exact job titles, skills and codes are not missed
+    """
+    if not HYBRID_RETRIEVAL:
+        with span("vector_search"):
+            return generation.index.search(query_embedding, top_k)
+    candidates = max(top_k, HYBRID_CANDIDATES)
+    with span("vector_search"):
+        vector_ids = generation.index.search(query_embedding, candidates)
+    with span("keyword_search"):
+        keyword_ids = generation.lexical.search(text, candidates)
+    return reciprocal_rank_fusion([vector_ids, keyword_ids], top_k, k=RRF_K)
+
+
+def retrieve_local_context(text, top_k=RETRIEVAL_TOP_K):
+    """Hybrid retrieval from the knowledge base: (generation name, chunk ids, chunk texts)"""
+    with span("embedding"):
+        query_embedding = get_embedding_service().encode(text)
+    with index_manager.acquire() as generation:
+        nearest_ids = search_generation(generation, text, query_embedding, top_k)
+        with span("doc_store"):
+            context_docs = [
+                chunk["text"] for chunk in generation.doc_store.get_many(nearest_ids)
+            ]
+    return generation.name, nearest_ids, context_docs
+
+
+def lookup_structured_facts(text):
+    """Exact CSV aggregates for the titles, regions etc. the question names"""
+    with span("aggregates"):
+        return get_aggregate_store().lookup(text)
+
+
+def answer_cache_key(
+    text, generation, nearest_ids, web_results, file_data, facts=(), history_prompt=""
+):
+    """Answer cache key for this turn, or None if the answer depends on an attached image"""
+    if file_data is not None:
+        return None
+    return get_answer_cache().key(
+        text, generation, nearest_ids, web_results, facts, history_prompt
+    )
+
+
+def urls_to_crawl(search_results, limit=3):
+    """Crawl the top search results"""
+    return [result["url"] for result in search_results[:limit]]
+
+
+def format_web_results(search_results, crawled_content):
+    """Search results as prompt blocks, with crawled page content where we have it"""
+    crawled_by_url = {page["url"]: page for page in crawled_content if page}
+    web_results = []
+    for result in search_results:
+        web_result_text = f"Title: {result['title']}\nSnippet: {result['snippet']}\nURL: {result['url']}"
+
+        # Add crawled content if available
+        page = crawled_by_url.get(result["url"])
+        if page:
+            web_result_text += f"\nContent: {page['content'][:1000]}..."
+
+        web_results.append(web_result_text)
+    return web_results
+
+
+def build_history_prompt(chat_history):
+    """Recent history from the session buffer"""
+    history_blocks = []
+    for turn in chat_history:
+        history_blocks.append(f"User: {turn['user']}\nAssistant: {turn['bot']}")
+    return "\n\n".join(history_blocks)
+
+
+def build_system_prompt(history_prompt, context_docs, web_results, facts=()):
+    """System prompt with local and web context and any exact CSV figures"""
+    return KNOWLEDGE_BASE_CONTEXT_PROMPT.format(
+        history_prompt=history_prompt,
+        context_docs=(
+            "\n---\n".join(context_docs) if context_docs else "No local context found."
+        ),
+        structured_facts=(
+            STRUCTURED_FACTS_NOTE + "\n" + "\n".join(f"- {fact}" for fact in facts)
+            if facts
+            else ""
+        ),
+        web_context_note=WEB_CONTEXT_NOTE if web_results else "",
+        web_results="\n---\n".join(web_results) if web_results else "",
+    )
+
+
+def build_response_data(reply_text, context_docs, web_results, crawled_content, search_results):
+    """JSON payload returned to the chat UI"""
+    response_data = {
+        "response": markdown.markdown(reply_text),
+        "context_docs": context_docs,
+        "web_search_performed": bool(web_results),
+        "web_results_count": len(web_results),
+        "crawled_pages": len(crawled_content),
+    }
+
+    if web_results:
+        response_data["search_sources"] = [
+            {"title": result.get("title", ""), "url": result.get("url", "")}
+            for result in search_results[:3]
+        ]
+    return response_data
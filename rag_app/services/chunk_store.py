@@ -0,0 +1,345 @@
+"""
+The knowledge base's chunks in one append-only SQLite database, replacing the
+per-file pickles (and their .emb.npz embedding caches) in data/PickleFiles.
+
+    sources     one row per ingested version of a file; uploading a file again
+                appends a new version and marks the previous one superseded
+    chunks      text, position (page / chunk number), line or row range and
+                content hash of every chunk, in source order; the row id is a
+                stable chunk id for point lookups
+    embeddings  one vector per (content hash, encoder), shared by every chunk
+                and source version with that text
+
+Rebuilds scan the chunks of live sources in batches; nothing is unpickled.
+Serving reads the mmapped chunk store written into each index generation,
+which is a snapshot of this database at build time.
+"""
+
+import os
+import json
+import time
+import pickle
+import hashlib
+import sqlite3
+import threading
+import numpy as np
+
+from rag_app.config.settings_loader import CHUNK_STORE_DB_PATH, INGEST_EMBED_BATCH
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS sources (
+    id INTEGER PRIMARY KEY,
+    file_name TEXT NOT NULL,
+    type TEXT NOT NULL,
+    columns TEXT,
+    n_chunks INTEGER,
+    committed_at REAL,
+    superseded_at REAL
+);
+CREATE INDEX IF NOT EXISTS sources_file_name ON sources (file_name);
+CREATE TABLE IF NOT EXISTS chunks (
+    id INTEGER PRIMARY KEY,
+    source_id INTEGER NOT NULL REFERENCES sources (id),
+    position INTEGER NOT NULL,
+    range_start INTEGER,
+    range_end INTEGER,
+    content_hash TEXT NOT NULL,
+    text TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS chunks_source ON chunks (source_id, position);
+CREATE TABLE IF NOT EXISTS embeddings (
+    id INTEGER PRIMARY KEY,
+    content_hash TEXT NOT NULL,
+    encoder TEXT NOT NULL,
+    vector BLOB NOT NULL,
+    UNIQUE (content_hash, encoder)
+);
+CREATE TABLE IF NOT EXISTS migrated_pickles (
+    file_name TEXT PRIMARY KEY,
+    migrated_at REAL NOT NULL
+);
+"""
+LIVE = "committed_at IS NOT NULL AND superseded_at IS NULL"
+# Stay well under SQLite's limit on bound parameters per statement
+MAX_PARAMS = 500
+
+
+def content_hash(text):
+    """Stable hash of a chunk's text, the key of its embedding"""
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def _chunk(row):
+    chunk = {
+        "id": row["id"],
+        "file_name": row["file_name"],
+        "page_no": row["position"],
+        "start": row["range_start"],
+        "end": row["range_end"],
+        "content_hash": row["content_hash"],
+        "text": row["text"],
+    }
+    if "vector" in row.keys():
+        vector = row["vector"]
+        chunk["vector"] = None if vector is None else np.frombuffer(vector, dtype="float32")
+    return chunk
+
+
+class ChunkStore:
+    """Append-only chunks, source versions and embeddings of the knowledge base"""
+
+    def __init__(self, db_path=CHUNK_STORE_DB_PATH):
+        self.db_path = db_path
+        self._local = threading.local()
+        os.makedirs(os.path.dirname(db_path) or ".", exist_ok=True)
+
+    def _conn(self):
+        # One connection per thread, never reused across a fork
+        conn = getattr(self._local, "conn", None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.executescript(SCHEMA)
+            self._local.conn, self._local.pid = conn, os.getpid()
+        return conn
+
+    def append_source(self, file_name, type, chunks, columns=None, on_batch=None):
+        """
+        Append a new version of `file_name` from `chunks` (texts, or dicts with
+        "text" and optionally "start" / "end"), written INGEST_EMBED_BATCH at a
+        time so a streamed file is never held in memory. `on_batch(texts)` runs
+        after each batch, e.g. to embed it. The version replaces the previous
+        one only once all of it is written; returns its number of chunks.
+        """
+        conn = self._conn()
+        source_id = conn.execute(
+            "INSERT INTO sources (file_name, type, columns) VALUES (?, ?, ?)",
+            (file_name, type, None if columns is None else json.dumps(columns)),
+        ).lastrowid
+
+        position = 0
+        batch = []
+
+        def flush():
+            conn.execute("BEGIN")
+            conn.executemany(
+                "INSERT INTO chunks (source_id, position, range_start, range_end, "
+                "content_hash, text) VALUES (?, ?, ?, ?, ?, ?)",
+                [
+                    (source_id, position - len(batch) + i, start, end, content_hash(text), text)
+                    for i, (text, start, end) in enumerate(batch)
+                ],
+            )
+            conn.execute("COMMIT")
+            if on_batch:
+                on_batch([text for text, _, _ in batch])
+            batch.clear()
+
+        for chunk in chunks:
+            if isinstance(chunk, str):
+                chunk = {"text": chunk}
+            batch.append((chunk["text"], chunk.get("start"), chunk.get("end")))
+            position += 1
+            if len(batch) >= INGEST_EMBED_BATCH:
+                flush()
+        if batch:
+            flush()
+
+        now = time.time()
+        conn.execute("BEGIN IMMEDIATE")
+        conn.execute(
+            f"UPDATE sources SET superseded_at = ? WHERE file_name = ? AND {LIVE}",
+            (now, file_name),
+        )
+        conn.execute(
+            "UPDATE sources SET n_chunks = ?, committed_at = ? WHERE id = ?",
+            (position, now, source_id),
+        )
+        conn.execute("COMMIT")
+        return position
+
+    def sources(self):
+        """The live version of every file, by file name"""
+        rows = self._conn().execute(
+            f"SELECT * FROM sources WHERE {LIVE} ORDER BY file_name"
+        ).fetchall()
+        return [
+            dict(row, columns=json.loads(row["columns"]) if row["columns"] else None)
+            for row in rows
+        ]
+
+    def scan(self, batch_size=1000, encoder=None, sources=None):
+        """
+        Batches (lists) of the chunks of every live source (or of `sources`, a
+        snapshot from sources()), by file name then position; with `encoder`,
+        each chunk also has its stored "vector" (or None)
+        """
+        conn = self._conn()
+        if encoder is None:
+            query = "SELECT chunks.*, ? AS file_name FROM chunks"
+            params = ()
+        else:
+            query = (
+                "SELECT chunks.*, ? AS file_name, embeddings.vector FROM chunks "
+                "LEFT JOIN embeddings ON embeddings.content_hash = chunks.content_hash "
+                "AND embeddings.encoder = ?"
+            )
+            params = (encoder,)
+        for source in self.sources() if sources is None else sources:
+            position = -1
+            while True:
+                rows = conn.execute(
+                    f"{query} WHERE source_id = ? AND position > ? ORDER BY position LIMIT ?",
+                    (source["file_name"], *params, source["id"], position, batch_size),
+                ).fetchall()
+                if not rows:
+                    break
+                yield [_chunk(row) for row in rows]
+                position = rows[-1]["position"]
+
+    def get_many(self, ids):
+        """Chunks by id, in the order asked (None for unknown ids)"""
+        found = {}
+        conn = self._conn()
+        ids = [int(i) for i in ids]
+        for i in range(0, len(ids), MAX_PARAMS):
+            part = ids[i : i + MAX_PARAMS]
+            rows = conn.execute(
+                "SELECT chunks.*, sources.file_name FROM chunks "
+                "JOIN sources ON sources.id = chunks.source_id "
+                f"WHERE chunks.id IN ({','.join('?' * len(part))})",
+                part,
+            ).fetchall()
+            found.update((row["id"], _chunk(row)) for row in rows)
+        return [found.get(i) for i in ids]
+
+    def vectors(self, hashes, encoder):
+        """{content hash: vector} of the `hashes` that have an embedding from `encoder`"""
+        found = {}
+        conn = self._conn()
+        hashes = list(hashes)
+        for i in range(0, len(hashes), MAX_PARAMS):
+            part = hashes[i : i + MAX_PARAMS]
+            rows = conn.execute(
+                "SELECT content_hash, vector FROM embeddings WHERE encoder = ? "
+                f"AND content_hash IN ({','.join('?' * len(part))})",
+                [encoder, *part],
+            )
+            found.update((h, np.frombuffer(v, dtype="float32")) for h, v in rows)
+        return found
+
+    def add_vectors(self, encoder, hashes, vectors):
+        conn = self._conn()
+        conn.execute("BEGIN")
+        conn.executemany(
+            "INSERT OR IGNORE INTO embeddings (content_hash, encoder, vector) VALUES (?, ?, ?)",
+            [
+                (h, encoder, np.asarray(v, dtype="float32").tobytes())
+                for h, v in zip(hashes, vectors)
+            ],
+        )
+        conn.execute("COMMIT")
+
+    def encode(self, texts, encoder, load_model, batch_size=32):
+        """
+        (vectors, n_encoded) for `texts`: stored embeddings are reused, the rest
+        are encoded and stored. `load_model` is only called when something
+        actually needs encoding.
+        """
+        hashes = [content_hash(text) for text in texts]
+        found = self.vectors(set(hashes), encoder)
+        missing = {}
+        for h, text in zip(hashes, texts):
+            if h not in found and h not in missing:
+                missing[h] = text
+        if missing:
+            vectors = load_model().encode(
+                list(missing.values()),
+                batch_size=batch_size,
+                show_progress_bar=len(missing) > 8 * batch_size,
+                convert_to_numpy=True,
+                normalize_embeddings=True,
+            ).astype("float32")
+            self.add_vectors(encoder, missing.keys(), vectors)
+            found.update(zip(missing.keys(), vectors))
+        if not hashes:
+            return np.zeros((0, 0), dtype="float32"), 0
+        return np.stack([found[h] for h in hashes]).astype("float32"), len(missing)
+
+    def migrate_pickles(self, pickle_dir):
+        """
+        One-time import of the processed files in `pickle_dir` (foo.pdf.pkl)
+        and their embedding caches (foo.pdf.emb.npz). Each pickle is imported
+        once; a file that is already in the store is not overwritten by its
+        older pickle. The pickles are left in place. Returns files imported.
+        """
+        if not os.path.isdir(pickle_dir):
+            return 0
+        conn = self._conn()
+        done = {row[0] for row in conn.execute("SELECT file_name FROM migrated_pickles")}
+        names = sorted(
+            name
+            for name in os.listdir(pickle_dir)
+            if name.endswith((".pkl", ".pickle")) and name not in done
+        )
+        live = {source["file_name"] for source in self.sources()}
+        imported = 0
+        for name in names:
+            path = os.path.join(pickle_dir, name)
+            file_name = name[: -len(".pkl")] if name.endswith(".pkl") else name
+            if file_name not in live:
+                # Written by this app's ingestion before the chunk store existed
+                with open(path, "rb") as f:
+                    content = pickle.load(f)
+                pages = content.get("pages", [])
+                ranges = content.get("chunks") or [{}] * len(pages)
+                if pages:
+                    self.append_source(
+                        file_name,
+                        content.get("type", file_name.split(".")[-1].lower()),
+                        [{"text": str(page), **r} for page, r in zip(pages, ranges)],
+                        columns=content.get("columns"),
+                    )
+                    imported += 1
+                self._migrate_embedding_cache(os.path.splitext(path)[0] + ".emb.npz")
+            conn.execute(
+                "INSERT OR IGNORE INTO migrated_pickles VALUES (?, ?)", (name, time.time())
+            )
+        if imported:
+            print(f"Migrated {imported} pickled files from {pickle_dir} into {self.db_path}")
+        return imported
+
+    def _migrate_embedding_cache(self, cache_path):
+        if not os.path.exists(cache_path):
+            return
+        try:
+            with np.load(cache_path, allow_pickle=False) as data:
+                if len(data["hashes"]):
+                    encoder = str(data["model_name"])
+                    self.add_vectors(encoder, data["hashes"].tolist(), data["vectors"])
+        except Exception as e:
+            print(f"Ignoring unreadable embedding cache {cache_path}: {e}")
+
+    def stats(self):
+        conn = self._conn()
+        return {
+            "sources": conn.execute(f"SELECT COUNT(*) FROM sources WHERE {LIVE}").fetchone()[0],
+            "chunks": conn.execute(
+                f"SELECT COALESCE(SUM(n_chunks), 0) FROM sources WHERE {LIVE}"
+            ).fetchone()[0],
+            "embeddings": conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0],
+        }
+
+
+_chunk_stores = {}
+_chunk_stores_lock = threading.Lock()
+
+
+def get_chunk_store(db_path=CHUNK_STORE_DB_PATH):
+    """Process-wide chunk store for `db_path`"""
+    with _chunk_stores_lock:
+        if db_path not in _chunk_stores:
+            _chunk_stores[db_path] = ChunkStore(db_path)
+        return _chunk_stores[db_path]
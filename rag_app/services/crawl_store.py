@@ -0,0 +1,157 @@
+import os
+import json
+import time
+import hashlib
+import sqlite3
+import threading
+
+from rag_app.config.settings_loader import (
+    CRAWLED_DATA_PATH,
+    CRAWL_STORE_DB_PATH,
+    CRAWL_FRESH_SECONDS,
+)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS pages (
+    url TEXT PRIMARY KEY,
+    content_hash TEXT NOT NULL,
+    etag TEXT,
+    last_modified TEXT,
+    fetched_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS pages_content_hash ON pages (content_hash);
+"""
+
+
+class CrawlStore:
+    """
+    Crawled pages keyed by URL. Each row records the content hash, the
+    validators (ETag / Last-Modified) and when the page was last fetched; the
+    extracted title and text are stored once per distinct content under
+    objects/<hash[:2]>/<hash>.json, so mirrors and unchanged re-fetches cost
+    no extra disk.
+    """
+
+    def __init__(
+        self,
+        root=CRAWLED_DATA_PATH,
+        db_path=CRAWL_STORE_DB_PATH,
+        fresh_seconds=CRAWL_FRESH_SECONDS,
+    ):
+        self.objects_dir = os.path.join(root, "objects")
+        self.db_path = db_path
+        self.fresh_seconds = fresh_seconds
+        self._local = threading.local()
+        os.makedirs(self.objects_dir, exist_ok=True)
+        os.makedirs(os.path.dirname(db_path) or ".", exist_ok=True)
+
+    def _conn(self):
+        # One connection per thread, never reused across a fork
+        conn = getattr(self._local, "conn", None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.executescript(SCHEMA)
+            self._local.conn, self._local.pid = conn, os.getpid()
+        return conn
+
+    def _object_path(self, content_hash):
+        return os.path.join(self.objects_dir, content_hash[:2], content_hash + ".json")
+
+    def lookup(self, url):
+        """Stored row for `url` as a dict, or None"""
+        row = self._conn().execute("SELECT * FROM pages WHERE url = ?", (url,)).fetchone()
+        return dict(row) if row else None
+
+    def is_fresh(self, entry):
+        return time.time() - entry["fetched_at"] < self.fresh_seconds
+
+    def load(self, entry):
+        """The stored {title, content} for a row, or None if the object is gone"""
+        try:
+            with open(self._object_path(entry["content_hash"])) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def put(self, url, page, etag=None, last_modified=None):
+        """
+        Store extracted `page` ({title, content}) for `url`; returns its content
+        hash. The object the URL pointed at before is deleted once no URL
+        references it, so changed pages do not leave orphans behind.
+        """
+        data = json.dumps(page, sort_keys=True, ensure_ascii=False).encode("utf-8")
+        content_hash = hashlib.sha256(data).hexdigest()
+        path = self._object_path(content_hash)
+        conn = self._conn()
+        # Under the write lock, so no other put can drop an object this one
+        # is about to reference (or the other way round)
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            if not os.path.exists(path):
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+                with open(tmp_path, "wb") as f:
+                    f.write(data)
+                os.replace(tmp_path, path)
+            row = conn.execute(
+                "SELECT content_hash FROM pages WHERE url = ?", (url,)
+            ).fetchone()
+            conn.execute(
+                "INSERT OR REPLACE INTO pages VALUES (?, ?, ?, ?, ?)",
+                (url, content_hash, etag, last_modified, time.time()),
+            )
+            if row is not None and row[0] != content_hash:
+                still_used = conn.execute(
+                    "SELECT 1 FROM pages WHERE content_hash = ? LIMIT 1", (row[0],)
+                ).fetchone()
+                if still_used is None:
+                    try:
+                        os.remove(self._object_path(row[0]))
+                    except FileNotFoundError:
+                        pass
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        return content_hash
+
+    def touch(self, url, etag=None, last_modified=None):
+        """Mark `url` as revalidated (HTTP 304) without rewriting its content"""
+        self._conn().execute(
+            "UPDATE pages SET fetched_at = ?, etag = COALESCE(?, etag), "
+            "last_modified = COALESCE(?, last_modified) WHERE url = ?",
+            (time.time(), etag, last_modified, url),
+        )
+
+    def collect_garbage(self):
+        """
+        Delete objects no longer referenced by any URL, e.g. left by a crash
+        between writing an object and recording it (put drops the rest)
+        """
+        referenced = {
+            row[0] for row in self._conn().execute("SELECT DISTINCT content_hash FROM pages")
+        }
+        removed = 0
+        for shard in os.listdir(self.objects_dir):
+            shard_dir = os.path.join(self.objects_dir, shard)
+            for name in os.listdir(shard_dir):
+                if name.endswith(".json") and name[:-5] not in referenced:
+                    os.remove(os.path.join(shard_dir, name))
+                    removed += 1
+        return removed
+
+
+_crawl_store = None
+_crawl_store_lock = threading.Lock()
+
+
+def get_crawl_store():
+    """Process-wide crawl store"""
+    global _crawl_store
+    with _crawl_store_lock:
+        if _crawl_store is None:
+            _crawl_store = CrawlStore()
+        return _crawl_store
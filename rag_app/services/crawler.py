@@ -1,28 +1,203 @@
 import os
-import json
+import re
+import time
+import codecs
+import threading
 import requests
-from bs4 import BeautifulSoup
+from itertools import chain
+from requests.adapters import HTTPAdapter
+from requests.compat import chardet
 from urllib.parse import urlparse
-from concurrent.futures import ThreadPoolExecutor, as_completed
+from urllib.robotparser import RobotFileParser
+from concurrent.futures import ThreadPoolExecutor, wait
 from datetime import datetime
 
-CRAWLED_DATA_PATH = "data/crawled_data"
+from rag_app.services.crawl_store import get_crawl_store
+from rag_app.utils.html_text import PageExtractor
+from rag_app.config.settings_loader import (
+    CRAWL_HTML_BACKEND,
+    CRAWL_CHUNK_BYTES,
+    CRAWL_MAX_BYTES,
+    CRAWL_MAX_WORKERS,
+    CRAWL_POOL_SIZE,
+    CRAWL_PER_HOST_CONCURRENCY,
+    CRAWL_HOST_DELAY_SECONDS,
+    CRAWL_ROBOTS_TTL_SECONDS,
+    CRAWL_REQUEST_TIMEOUT,
+    CRAWL_DEADLINE_SECONDS,
+)
 
-# Ensure crawled data directory exists
-os.makedirs(CRAWLED_DATA_PATH, exist_ok=True)
+USER_AGENT = "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36"
+# <meta charset="..."> and <meta http-equiv="Content-Type" content="...; charset=...">
+META_CHARSET_RE = re.compile(
+    rb"<meta[^>]*?charset\s*=\s*[\"']?\s*([a-z0-9_.:-]+)", re.IGNORECASE
+)
+BOMS = (
+    (codecs.BOM_UTF8, "utf-8-sig"),
+    (codecs.BOM_UTF16_LE, "utf-16"),
+    (codecs.BOM_UTF16_BE, "utf-16"),
+)
+
+
+def _known_encoding(name):
+    try:
+        return codecs.lookup(name).name
+    except (LookupError, TypeError):
+        return None
+
+
+def sniff_encoding(head):
+    """
+    Encoding of an HTML page without a charset in its Content-Type, from its
+    first bytes: a BOM, then a <meta> charset, then UTF-8 if they decode as
+    such, then charset detection (what requests' apparent_encoding does, but
+    on the first chunk only so the page is still streamed)
+    """
+    for bom, encoding in BOMS:
+        if head.startswith(bom):
+            return encoding
+    match = META_CHARSET_RE.search(head)
+    if match:
+        encoding = _known_encoding(match.group(1).decode("ascii"))
+        if encoding:
+            return encoding
+    try:
+        # A chunk may end inside a multi-byte character
+        codecs.getincrementaldecoder("utf-8")().decode(head)
+        return "utf-8"
+    except UnicodeDecodeError:
+        pass
+    return _known_encoding(chardet.detect(head).get("encoding")) or "utf-8"
+
+
+class HostLimiter:
+    """
+    Per-host limits: at most `concurrency` requests in flight, started at
+    least `delay` seconds apart. Also holds the host's robots.txt rules.
+    """
+
+    def __init__(self, concurrency, delay):
+        self.semaphore = threading.Semaphore(concurrency)
+        self.delay = delay
+        self.next_start = 0.0
+        self._lock = threading.Lock()
+        # robots.txt for the host, filled in by WebCrawler.allowed
+        self.robots = None
+        self.robots_expires = 0.0
+        self.robots_lock = threading.Lock()
+
+    def __enter__(self):
+        self.semaphore.acquire()
+        with self._lock:
+            now = time.monotonic()
+            start = max(now, self.next_start)
+            self.next_start = start + self.delay
+        time.sleep(start - now)
+        return self
+
+    def __exit__(self, *exc):
+        self.semaphore.release()
 
 
 class WebCrawler:
-    """Handle web crawling operations"""
+    """
+    Handle web crawling operations. Meant to be shared by the whole process
+    (see get_crawler): one pooled session and one worker pool, per-host
+    concurrency and politeness limits, and cached robots.txt decisions.
+    """
 
-    def __init__(self):
+    def __init__(
+        self,
+        store=None,
+        max_workers=CRAWL_MAX_WORKERS,
+        pool_size=CRAWL_POOL_SIZE,
+        per_host_concurrency=CRAWL_PER_HOST_CONCURRENCY,
+        host_delay=CRAWL_HOST_DELAY_SECONDS,
+        robots_ttl=CRAWL_ROBOTS_TTL_SECONDS,
+        respect_robots=True,
+    ):
+        self.store = store or get_crawl_store()
+        self.max_workers = max_workers
+        self.pool_size = pool_size
+        self.per_host_concurrency = per_host_concurrency
+        self.host_delay = host_delay
+        self.robots_ttl = robots_ttl
+        self.respect_robots = respect_robots
+        self._hosts = {}
+        self._lock = threading.Lock()
+        self._pid = None
+        self._start()
+
+    def _start(self):
+        """(Re)create the session and worker pool; called again in forked children"""
+        self._pid = os.getpid()
         self.session = requests.Session()
-        self.session.headers.update(
-            {
-                "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36"
-            }
+        adapter = HTTPAdapter(pool_connections=self.pool_size, pool_maxsize=self.pool_size)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        self.session.headers.update({"User-Agent": USER_AGENT})
+        self.executor = ThreadPoolExecutor(
+            max_workers=self.max_workers, thread_name_prefix="crawler"
         )
 
+    def _ensure_started(self):
+        if self._pid != os.getpid():
+            with self._lock:
+                if self._pid != os.getpid():
+                    self._hosts = {}
+                    self._start()
+
+    def close(self):
+        self.executor.shutdown(wait=False, cancel_futures=True)
+        self.session.close()
+
+    def _host_limiter(self, host):
+        with self._lock:
+            limiter = self._hosts.get(host)
+            if limiter is None:
+                if len(self._hosts) >= 1024:
+                    # Forget idle hosts rather than grow forever; requests in
+                    # flight keep their limiter
+                    self._hosts = {}
+                limiter = self._hosts[host] = HostLimiter(
+                    self.per_host_concurrency, self.host_delay
+                )
+            return limiter
+
+    def _fetch_robots(self, scheme, host):
+        """Parsed robots.txt for a host and how long to trust it"""
+        parser = RobotFileParser()
+        try:
+            response = self.session.get(
+                f"{scheme}://{host}/robots.txt", timeout=CRAWL_REQUEST_TIMEOUT
+            )
+        except requests.RequestException:
+            response = None
+        if response is None or response.status_code >= 500:
+            # Server trouble: stay away for a short while, then ask again
+            parser.disallow_all = True
+            return parser, min(self.robots_ttl, 300)
+        if response.status_code in (401, 403):
+            parser.disallow_all = True  # robots.txt itself is off limits
+        elif response.status_code >= 400:
+            parser.allow_all = True  # no robots.txt
+        else:
+            parser.parse(response.text.splitlines())
+        return parser, self.robots_ttl
+
+    def allowed(self, url):
+        """robots.txt decision for `url`, cached per host"""
+        if not self.respect_robots:
+            return True
+        parsed = urlparse(url)
+        limiter = self._host_limiter(parsed.netloc)
+        # One robots.txt fetch per host, even with several pages in flight
+        with limiter.robots_lock:
+            if limiter.robots is None or limiter.robots_expires < time.monotonic():
+                parser, ttl = self._fetch_robots(parsed.scheme, parsed.netloc)
+                limiter.robots, limiter.robots_expires = parser, time.monotonic() + ttl
+            return limiter.robots.can_fetch(USER_AGENT, url)
+
     def _is_valid_url(self, url):
         """Check if URL is valid and crawlable"""
         try:
@@ -31,86 +206,144 @@ class WebCrawler:
         except:
             return False
 
-    def _extract_text_from_html(self, html_content):
-        """Extract clean text from HTML"""
+    def _read_page(self, response, max_length):
+        """
+        Title and text of a streamed HTML response, read in chunks and parsed
+        as they arrive; stops downloading once `max_length` characters of text
+        (or CRAWL_MAX_BYTES of HTML) have been seen.
+        """
+        chunks = response.iter_content(chunk_size=CRAWL_CHUNK_BYTES)
+        head = next(chunks, b"")
+        content_type = response.headers.get("content-type", "").lower()
+        encoding = None
+        if "charset=" in content_type:
+            encoding = _known_encoding(response.encoding)
+        decoder = codecs.getincrementaldecoder(encoding or sniff_encoding(head))(
+            errors="replace"
+        )
+        extractor = PageExtractor(max_length, backend=CRAWL_HTML_BACKEND)
+        read = 0
+        for chunk in chain([head], chunks):
+            extractor.feed(decoder.decode(chunk))
+            read += len(chunk)
+            if extractor.done or read >= CRAWL_MAX_BYTES:
+                break
+        else:
+            extractor.feed(decoder.decode(b"", final=True))
         try:
-            soup = BeautifulSoup(html_content, "html.parser")
+            extractor.close()
+        except Exception as e:
+            print(f"Error closing HTML parser: {e}")
+        return {
+            "title": extractor.title,
+            "content": extractor.text(),
+            "truncated": extractor.done or read >= CRAWL_MAX_BYTES,
+        }
 
-            # Remove script and style elements
-            for script in soup(["script", "style", "nav", "footer", "header"]):
-                script.decompose()
+    def _page(self, url, stored, fetched_at, max_length):
+        text_content = stored["content"]
 
-            # Get text and clean it
-            text = soup.get_text()
-            lines = (line.strip() for line in text.splitlines())
-            chunks = (phrase.strip() for line in lines for phrase in line.split("  "))
-            text = "\n".join(chunk for chunk in chunks if chunk)
+        # Truncate if too long
+        if len(text_content) > max_length:
+            text_content = text_content[:max_length] + "..."
 
-            return text
-        except Exception as e:
-            print(f"Error extracting text: {e}")
-            return ""
+        return {
+            "url": url,
+            "title": stored["title"],
+            "content": text_content,
+            "timestamp": datetime.fromtimestamp(fetched_at).isoformat(),
+            "content_length": len(text_content),
+        }
 
     def crawl(self, url, max_length=5000):
-        """Crawl a single URL and extract text content"""
+        """
+        Text content of a single URL. Fresh pages come from the crawl store;
+        stale ones are revalidated with If-None-Match / If-Modified-Since.
+        """
         if not self._is_valid_url(url):
             return None
+        self._ensure_started()
 
-        try:
-            response = self.session.get(url, timeout=10)
-            response.raise_for_status()
+        entry = self.store.lookup(url)
+        stored = self.store.load(entry) if entry else None
+        if stored and stored.get("truncated") and len(stored["content"]) <= max_length:
+            stored = None  # cut short for a smaller max_length; fetch it again
+        if stored and self.store.is_fresh(entry):
+            return self._page(url, stored, entry["fetched_at"], max_length)
 
-            content_type = response.headers.get("content-type", "").lower()
-            if "html" not in content_type:
-                return None
+        if not self.allowed(url):
+            print(f"Skipping {url}: disallowed by robots.txt")
+            return None
 
-            text_content = self._extract_text_from_html(response.content)
+        headers = {}
+        if stored:
+            if entry["etag"]:
+                headers["If-None-Match"] = entry["etag"]
+            if entry["last_modified"]:
+                headers["If-Modified-Since"] = entry["last_modified"]
 
-            # Truncate if too long
-            if len(text_content) > max_length:
-                text_content = text_content[:max_length] + "..."
+        # The host's slot is held until the body is read, not just the headers
+        with self._host_limiter(urlparse(url).netloc):
+            try:
+                response = self.session.get(
+                    url, headers=headers, timeout=CRAWL_REQUEST_TIMEOUT, stream=True
+                )
+            except Exception as e:
+                print(f"Error crawling {url}: {e}")
+                return None
 
-            return {
-                "url": url,
-                "title": self._extract_title(response.content),
-                "content": text_content,
-                "timestamp": datetime.now().isoformat(),
-                "content_length": len(text_content),
-            }
-        except Exception as e:
-            print(f"Error crawling {url}: {e}")
-            return None
+            try:
+                etag = response.headers.get("ETag")
+                last_modified = response.headers.get("Last-Modified")
+                if response.status_code == 304 and stored:
+                    self.store.touch(url, etag, last_modified)
+                    return self._page(url, stored, datetime.now().timestamp(), max_length)
+                response.raise_for_status()
 
-    def _extract_title(self, html_content):
-        """Extract page title from HTML"""
-        try:
-            soup = BeautifulSoup(html_content, "html.parser")
-            title_tag = soup.find("title")
-            return title_tag.get_text().strip() if title_tag else "No title"
-        except:
-            return "No title"
+                content_type = response.headers.get("content-type", "").lower()
+                if "html" not in content_type:
+                    return None
 
-    def crawl_multiple_urls(self, urls, max_workers=5):
-        """Crawl multiple URLs concurrently"""
-        crawled_data = []
+                stored = self._read_page(response, max_length)
+            except Exception as e:
+                print(f"Error crawling {url}: {e}")
+                return None
+            finally:
+                response.close()
 
-        with ThreadPoolExecutor(max_workers=max_workers) as executor:
-            future_to_url = {executor.submit(self.crawl, url): url for url in urls}
+        try:
+            self.store.put(url, stored, etag, last_modified)
+        except Exception as e:
+            print(f"Error storing {url}: {e}")
+        return self._page(url, stored, datetime.now().timestamp(), max_length)
 
-            for future in as_completed(future_to_url):
-                result = future.result()
-                if result:
-                    crawled_data.append(result)
+    def crawl_multiple_urls(self, urls, deadline=CRAWL_DEADLINE_SECONDS):
+        """
+        Crawl multiple URLs concurrently on the shared pool. Returns the pages
+        that finished within `deadline` seconds; slower ones keep running and
+        land in the crawl store for the next request.
+        """
+        self._ensure_started()
+        futures = [self.executor.submit(self.crawl, url) for url in urls]
+        done, not_done = wait(futures, timeout=deadline)
+        if not_done:
+            print(f"Crawl deadline hit: {len(not_done)} of {len(urls)} pages still pending")
 
+        crawled_data = []
+        for future in futures:
+            if future in done and future.result():
+                crawled_data.append(future.result())
         return crawled_data
 
-    def save_crawled_data(self, crawled_data):
-        """Save crawled data and update knowledge base"""
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        filename = f"crawled_{timestamp}.json"
-        filepath = os.path.join(CRAWLED_DATA_PATH, filename)
 
-        with open(filepath, "w") as f:
-            json.dump(crawled_data, f, indent=2)
+_crawler = None
+_crawler_lock = threading.Lock()
+
 
-        return filepath
+def get_crawler():
+    """Process-wide crawler"""
+    global _crawler
+    with _crawler_lock:
+        if _crawler is None:
+            _crawler = WebCrawler()
+        return _crawler
@@ -0,0 +1,361 @@
+"""
+Structured aggregates of uploaded CSVs. Reading a handful of retrieved rows
+cannot answer "median salary for data engineers in NSW"; the whole file can.
+At ingestion the CSV is loaded column-wise with pandas, its dimension columns
+(job title, region, other categories), period column (a date or year) and
+measure columns (salary and other numbers) are inferred from a sample, and
+for every dimension and pair of dimensions we precompute row counts, medians
+and means, overall and per period with growth over the previous period.
+
+Each CSV gets one compressed .npz in AGGREGATES_DIR: dimension values are
+stored once and tables hold int32 codes, so a file with millions of rows
+aggregates to a few MB. At question time AggregateStore matches the
+question's words against the dimension values (a dict lookup per n-gram) and
+returns the matching rows as exact figures for the prompt.
+"""
+
+import os
+import re
+import json
+import threading
+from itertools import combinations, product
+
+import numpy as np
+
+from rag_app.services.lexical_index import STOPWORDS
+from rag_app.config.settings_loader import (
+    AGGREGATES_DIR,
+    AGGREGATE_MAX_DIMENSIONS,
+    AGGREGATE_MAX_MEASURES,
+    AGGREGATE_PERIOD,
+    AGGREGATE_MAX_FACTS,
+)
+
+SAMPLE_ROWS = 10000
+TITLE_HINTS = {"title", "role", "occupation", "position", "job", "profession"}
+REGION_HINTS = {"region", "state", "location", "city", "country", "area", "territory"}
+PERIOD_HINTS = {"date", "posted", "period", "month", "quarter", "year", "time", "week"}
+MEASURE_HINTS = {"salary", "pay", "wage", "compensation", "income", "earnings", "rate"}
+SKIP_HINTS = {"id", "url", "link", "description", "summary", "text", "body", "details"}
+# Questions that ask for a figure; others get no aggregates in the prompt
+QUANTITATIVE_RE = re.compile(
+    r"\b(median|average|mean|typical|salar|pay|paid|wage|earn|how many|number of|count|"
+    r"growth|grow|trend|increas|decreas|declin|demand|posting|opening|vacanc|hiring|"
+    r"change|rate|percent|share)",
+    re.IGNORECASE,
+)
+WORD_RE = re.compile(r"[a-z0-9+#]+")
+MAX_PHRASE_WORDS = 6
+
+
+def _words(text):
+    """Lowercase words with a plural 's' dropped, so 'Engineers' matches 'Engineer'"""
+    words = WORD_RE.findall(str(text).lower())
+    return [
+        w[:-1] if len(w) > 3 and w.endswith("s") and not w.endswith("ss") else w
+        for w in words
+    ]
+
+
+def _hinted(column, hints):
+    return bool(set(re.findall(r"[a-z]+", column.lower())) & hints)
+
+
+def _to_number(series):
+    """Numeric values of a column ('$120,000' -> 120000.0); NaN where not a number"""
+    import pandas as pd
+
+    if pd.api.types.is_numeric_dtype(series):
+        return series.astype("float64")
+    cleaned = series.astype("string").str.replace(r"[$£€,\s]", "", regex=True)
+    return pd.to_numeric(cleaned, errors="coerce")
+
+
+def _to_period(series):
+    """Period labels ('2024Q3', or the year itself for year columns); None where unparseable"""
+    import pandas as pd
+
+    numbers = _to_number(series)
+    if numbers.notna().mean() > 0.9 and numbers.dropna().between(1900, 2100).all():
+        return numbers.map(lambda y: None if pd.isna(y) else str(int(y)))
+    dates = pd.to_datetime(series, errors="coerce", format="mixed")
+    return dates.dt.to_period(AGGREGATE_PERIOD).astype("string").astype(object).where(
+        dates.notna(), None
+    )
+
+
+def infer_schema(sample):
+    """
+    Column roles of a CSV from a sample DataFrame (read as strings):
+    {"dimensions": [...], "period": column or None, "measures": [...]}
+    """
+    n = len(sample)
+    period = None
+    for column in sample.columns:
+        values = sample[column].dropna()
+        if _hinted(column, PERIOD_HINTS) and len(values):
+            if _to_period(values).notna().mean() >= 0.9:
+                period = column
+                break
+
+    measures, dimensions = [], []
+    for column in sample.columns:
+        values = sample[column].dropna()
+        if column == period or not len(values) or _hinted(column, SKIP_HINTS):
+            continue
+        numbers = _to_number(values)
+        if numbers.notna().mean() >= 0.8:
+            if numbers.nunique() > 1:
+                measures.append(column)
+            continue
+        distinct = values.nunique()
+        hinted = _hinted(column, TITLE_HINTS | REGION_HINTS)
+        if values.str.len().mean() > 60 or distinct < 2:
+            continue
+        if distinct <= (0.9 if hinted else 0.2) * n:
+            dimensions.append((not _hinted(column, TITLE_HINTS), not hinted, distinct, column))
+
+    measures.sort(key=lambda c: not _hinted(c, MEASURE_HINTS))
+    return {
+        "dimensions": [c for *_, c in sorted(dimensions)][:AGGREGATE_MAX_DIMENSIONS],
+        "period": period,
+        "measures": measures[:AGGREGATE_MAX_MEASURES],
+    }
+
+
+def _group(df, keys, measures):
+    """Count, median and mean of each measure per group of `keys`, as arrays"""
+    grouped = df.groupby(keys, observed=True, sort=True)
+    table = {"count": grouped.size().to_numpy("int64")}
+    for i, measure in enumerate(measures):
+        table[f"median/{i}"] = grouped[measure].median().to_numpy("float32")
+        table[f"mean/{i}"] = grouped[measure].mean().to_numpy("float32")
+    index = grouped.size().index.to_frame(index=False)
+    return table, index
+
+
+def build_aggregates(csv_path, out_dir=AGGREGATES_DIR):
+    """
+    Aggregate `csv_path` into out_dir/<file name>.npz; returns the path, or None
+    if the file has no dimension columns to aggregate by
+    """
+    import pandas as pd
+
+    sample = pd.read_csv(csv_path, nrows=SAMPLE_ROWS, dtype=str)
+    schema = infer_schema(sample)
+    dimensions, period, measures = schema["dimensions"], schema["period"], schema["measures"]
+    if not dimensions:
+        print(f"No category columns to aggregate in {csv_path}")
+        return None
+
+    # Only the columns we aggregate, categories dictionary-encoded
+    usecols = dimensions + measures + ([period] if period else [])
+    df = pd.read_csv(csv_path, usecols=usecols, dtype={d: "category" for d in dimensions})
+    for measure in measures:
+        df[measure] = _to_number(df[measure])
+    codes = {}
+    for i, dimension in enumerate(dimensions):
+        df[f"d{i}"] = df[dimension].cat.codes.astype("int32")
+        codes[i] = np.array(df[dimension].cat.categories.astype(str).tolist(), dtype=str)
+    periods = np.zeros(0, dtype=str)
+    if period:
+        labels = _to_period(df[period])
+        periods = np.array(sorted(labels.dropna().unique()), dtype=str)
+        df["period"] = labels.map({p: i for i, p in enumerate(periods)}).fillna(-1).astype("int32")
+
+    arrays = {"periods": periods}
+    for i, values in codes.items():
+        arrays[f"values/{i}"] = values
+    tables = []
+    for size in (1, 2):
+        for combo in combinations(range(len(dimensions)), size):
+            keys = [f"d{i}" for i in combo]
+            rows = df[(df[keys] >= 0).all(axis=1)]
+            for by_period in (False, True) if period else (False,):
+                name = "+".join(map(str, combo)) + ("@period" if by_period else "")
+                group_keys = keys + ["period"] if by_period else keys
+                if by_period:
+                    rows = rows[rows["period"] >= 0]
+                table, index = _group(rows, group_keys, measures)
+                for key in group_keys:
+                    table[key] = index[key].to_numpy("int32")
+                if by_period:
+                    # Growth in row count over the group's previous period
+                    counts = pd.Series(table["count"], dtype="float64")
+                    previous = counts.groupby([index[k] for k in keys]).shift(1)
+                    table["growth"] = ((counts - previous) / previous).to_numpy("float32")
+                for column, values in table.items():
+                    arrays[f"{name}/{column}"] = values
+                tables.append(name)
+
+    schema.update({"source": os.path.basename(csv_path), "rows": len(df), "tables": tables})
+    os.makedirs(out_dir, exist_ok=True)
+    path = os.path.join(out_dir, f"{os.path.basename(csv_path)}.npz")
+    tmp_path = path + ".tmp.npz"
+    np.savez_compressed(tmp_path, schema=np.array(json.dumps(schema)), **arrays)
+    os.replace(tmp_path, path)
+    print(
+        f"Aggregated {len(df)} rows of {schema['source']} by {dimensions}"
+        f"{f' per {period}' if period else ''} over {measures}"
+    )
+    return path
+
+
+def _number(value):
+    if abs(value) >= 100:
+        return f"{value:,.0f}"
+    return f"{value:,.2f}"
+
+
+class CsvAggregates:
+    """The aggregate tables of one CSV, with a row index per table"""
+
+    def __init__(self, path):
+        with np.load(path, allow_pickle=False) as data:
+            self.schema = json.loads(str(data["schema"]))
+            self.periods = data["periods"]
+            self.values = [data[f"values/{i}"] for i in range(len(self.schema["dimensions"]))]
+            self.tables = {}
+            for name in self.schema["tables"]:
+                prefix = f"{name}/"
+                self.tables[name] = {
+                    key[len(prefix) :]: data[key] for key in data.files if key.startswith(prefix)
+                }
+        # (table, dimension codes) -> row range; period tables hold one row per period
+        self.rows = {}
+        for name, table in self.tables.items():
+            dims = name.split("@")[0].split("+")
+            keys = zip(*(table[f"d{d}"].tolist() for d in dims))
+            for row, key in enumerate(keys):
+                start, _ = self.rows.get((name, key), (row, row))
+                self.rows[(name, key)] = (start, row + 1)
+
+    def fact(self, matched):
+        """The figures for {dimension index: code}, or None if that group has no rows"""
+        name = "+".join(str(d) for d in sorted(matched))
+        key = tuple(matched[d] for d in sorted(matched))
+        if (name, key) not in self.rows:
+            return None
+        table = self.tables[name]
+        row = self.rows[(name, key)][0]
+        labels = ", ".join(
+            f"{self.schema['dimensions'][d]} = {self.values[d][matched[d]]}"
+            for d in sorted(matched)
+        )
+        figures = [f"{int(table['count'][row]):,} rows"]
+        for i, measure in enumerate(self.schema["measures"]):
+            median = float(table[f"median/{i}"][row])
+            if not np.isnan(median):
+                mean = float(table[f"mean/{i}"][row])
+                figures.append(f"median {measure} {_number(median)} (mean {_number(mean)})")
+
+        by_period = self.rows.get((f"{name}@period", key))
+        if by_period:
+            table = self.tables[f"{name}@period"]
+            start, stop = by_period
+            last = stop - 1
+            latest = f"{self.periods[table['period'][last]]}: {int(table['count'][last]):,} rows"
+            growth = float(table["growth"][last])
+            if last > start and not np.isnan(growth):
+                latest += f" ({growth:+.1%} vs {self.periods[table['period'][last - 1]]})"
+            figures.append(latest)
+        source = f"{self.schema['source']} ({self.schema['rows']:,} rows)"
+        return f"{source} where {labels}: " + "; ".join(figures)
+
+
+class AggregateStore:
+    """
+    The aggregates of every CSV in `directory`, reloaded when a file there
+    changes (uploads are processed by whichever worker received them)
+    """
+
+    def __init__(self, directory=AGGREGATES_DIR, max_facts=AGGREGATE_MAX_FACTS):
+        self.directory = directory
+        self.max_facts = max_facts
+        self.sources = []
+        # phrase -> [(source index, dimension index, code)]
+        self.phrases = {}
+        self._signature = None
+        self._lock = threading.Lock()
+
+    def _current_signature(self):
+        try:
+            entries = os.scandir(self.directory)
+        except FileNotFoundError:
+            return ()
+        with entries:
+            return tuple(
+                sorted(
+                    (e.name, e.stat().st_mtime_ns)
+                    for e in entries
+                    if e.name.endswith(".npz") and not e.name.endswith(".tmp.npz")
+                )
+            )
+
+    def _reload(self, signature):
+        sources, phrases = [], {}
+        for name, _ in signature:
+            try:
+                aggregates = CsvAggregates(os.path.join(self.directory, name))
+            except Exception as e:
+                print(f"Ignoring unreadable aggregates {name}: {e}")
+                continue
+            for d, values in enumerate(aggregates.values):
+                for code, value in enumerate(values.tolist()):
+                    words = _words(value)
+                    if len(words) > MAX_PHRASE_WORDS or all(w in STOPWORDS for w in words):
+                        continue
+                    phrases.setdefault(" ".join(words), []).append((len(sources), d, code))
+            sources.append(aggregates)
+        self.sources, self.phrases = sources, phrases
+        self._signature = signature
+
+    def lookup(self, question):
+        """Exact figures (strings) for the dimension values `question` names"""
+        if not QUANTITATIVE_RE.search(question):
+            return []
+        signature = self._current_signature()
+        with self._lock:
+            if signature != self._signature:
+                self._reload(signature)
+            sources, phrases = self.sources, self.phrases
+        if not phrases:
+            return []
+
+        # Longest phrases first, each word used by one match at most
+        words = _words(question)
+        used = [False] * len(words)
+        matches = {}  # source -> dimension -> [codes]
+        for n in range(min(MAX_PHRASE_WORDS, len(words)), 0, -1):
+            for i in range(len(words) - n + 1):
+                if any(used[i : i + n]):
+                    continue
+                found = phrases.get(" ".join(words[i : i + n]))
+                if not found:
+                    continue
+                used[i : i + n] = [True] * n
+                for source, d, code in found:
+                    matches.setdefault(source, {}).setdefault(d, []).append(code)
+
+        facts = []
+        for source, by_dimension in matches.items():
+            dims = sorted(by_dimension)[:2]
+            for codes in product(*(by_dimension[d] for d in dims)):
+                fact = sources[source].fact(dict(zip(dims, codes)))
+                if fact:
+                    facts.append(fact)
+                if len(facts) >= self.max_facts:
+                    return facts
+        return facts
+
+
+_stores = {}
+_stores_lock = threading.Lock()
+
+
+def get_aggregate_store(directory=AGGREGATES_DIR):
+    """Process-wide aggregate store for `directory`"""
+    with _stores_lock:
+        if directory not in _stores:
+            _stores[directory] = AggregateStore(directory)
+        return _stores[directory]
@@ -0,0 +1,189 @@
+import os
+import json
+import mmap
+import struct
+import numpy as np
+
+# File layout (little endian):
+#   header   | magic, version, n_chunks, n_sources, reserved, blob_offset, sources_offset
+#   records  | n_chunks x (text_offset u64, text_len u32, source_id u32, page_no i32)
+#   blob     | utf-8 chunk texts back to back
+#   sources  | utf-8 JSON list of source file names
+MAGIC = b"RAGCHNK1"
+VERSION = 1
+HEADER = struct.Struct("<8sIIIIQQ")
+RECORD_DTYPE = np.dtype(
+    [("offset", "<u8"), ("length", "<u4"), ("source", "<u4"), ("page_no", "<i4")]
+)
+NO_SOURCE = 0xFFFFFFFF
+
+
+class DocStoreWriter:
+    """
+    Writes a store of `n_chunks` chunks ({'text', 'file_name', 'page_no'} dicts,
+    id = position) handed over in batches, so their texts are never all in
+    memory; close() makes it appear at `path` atomically.
+    """
+
+    def __init__(self, path, n_chunks):
+        self.path = path
+        self.n_chunks = n_chunks
+        self._records = np.zeros(n_chunks, dtype=RECORD_DTYPE)
+        self._sources = []
+        self._source_ids = {}
+        self._blob_offset = HEADER.size + self._records.nbytes
+        self._offset = 0
+        self._count = 0
+        self._tmp_path = f"{path}.{os.getpid()}.tmp"
+        self._file = open(self._tmp_path, "wb")
+        self._file.seek(self._blob_offset)
+
+    def add(self, chunks):
+        for chunk in chunks:
+            if self._count >= self.n_chunks:
+                raise ValueError(f"More than {self.n_chunks} chunks for {self.path}")
+            data = chunk["text"].encode("utf-8")
+            self._file.write(data)
+
+            file_name = chunk.get("file_name")
+            if file_name is None:
+                source = NO_SOURCE
+            else:
+                source = self._source_ids.setdefault(file_name, len(self._sources))
+                if source == len(self._sources):
+                    self._sources.append(file_name)
+
+            page_no = chunk.get("page_no")
+            self._records[self._count] = (
+                self._offset,
+                len(data),
+                source,
+                -1 if page_no is None else page_no,
+            )
+            self._offset += len(data)
+            self._count += 1
+
+    def close(self):
+        f = self._file
+        try:
+            if self._count != self.n_chunks:
+                raise ValueError(
+                    f"Expected {self.n_chunks} chunks for {self.path}, got {self._count}"
+                )
+            sources_offset = self._blob_offset + self._offset
+            f.write(json.dumps(self._sources).encode("utf-8"))
+
+            f.seek(0)
+            f.write(
+                HEADER.pack(
+                    MAGIC,
+                    VERSION,
+                    self.n_chunks,
+                    len(self._sources),
+                    0,
+                    self._blob_offset,
+                    sources_offset,
+                )
+            )
+            f.write(self._records.tobytes())
+            f.flush()
+            os.fsync(f.fileno())
+        except Exception:
+            f.close()
+            os.remove(self._tmp_path)
+            raise
+        f.close()
+        os.replace(self._tmp_path, self.path)
+
+
+def write_doc_store(path, chunks):
+    """
+    Write chunks (a sequence of {'text', 'file_name', 'page_no'} dicts, id = position)
+    to `path` atomically.
+    """
+    writer = DocStoreWriter(path, len(chunks))
+    writer.add(chunks)
+    writer.close()
+
+
+def convert_doc_mapping(mapping_path, path):
+    """Convert a legacy doc_mapping.json ({"id": str | {text, file_name, page_no}})"""
+    with open(mapping_path, "r") as f:
+        mapping = json.load(f)
+    chunks = [None] * (max(map(int, mapping), default=-1) + 1)
+    for key, entry in mapping.items():
+        if not isinstance(entry, dict):
+            entry = {"text": entry}
+        chunks[int(key)] = entry
+    # Holes keep ids aligned with the Annoy index
+    chunks = [chunk or {"text": ""} for chunk in chunks]
+    write_doc_store(path, chunks)
+
+
+def open_doc_store(path, mapping_path=None):
+    """Open `path`, (re)building it from a legacy JSON mapping if that is newer"""
+    if mapping_path and os.path.exists(mapping_path):
+        if not os.path.exists(path) or os.path.getmtime(path) < os.path.getmtime(
+            mapping_path
+        ):
+            print(f"Converting {mapping_path} to document store {path}")
+            convert_doc_mapping(mapping_path, path)
+    return DocStore(path)
+
+
+class DocStore:
+    """
+    Read-only, memory-mapped chunk store. The record table and texts stay in the
+    page cache and are shared by every worker that maps the same file; only the
+    chunks actually requested are decoded.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        with open(path, "rb") as f:
+            self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, n_chunks, _, _, blob_offset, sources_offset = (
+            HEADER.unpack_from(self._mm, 0)
+        )
+        if magic != MAGIC or version != VERSION:
+            self._mm.close()
+            raise ValueError(f"{path} is not a version {VERSION} document store")
+
+        self._records = np.frombuffer(
+            self._mm, dtype=RECORD_DTYPE, count=n_chunks, offset=HEADER.size
+        )
+        self._blob = memoryview(self._mm)[blob_offset:sources_offset]
+        self._sources = json.loads(bytes(self._mm[sources_offset:]).decode("utf-8"))
+
+    def __len__(self):
+        return len(self._records)
+
+    def get_text(self, chunk_id):
+        offset, length, _, _ = self._records[chunk_id]
+        return str(self._blob[offset : offset + length], "utf-8")
+
+    def get(self, chunk_id):
+        if not 0 <= chunk_id < len(self._records):
+            return None
+        offset, length, source, page_no = self._records[chunk_id].tolist()
+        return {
+            "id": chunk_id,
+            "text": str(self._blob[offset : offset + length], "utf-8"),
+            "file_name": None if source == NO_SOURCE else self._sources[source],
+            "page_no": None if page_no < 0 else page_no,
+        }
+
+    def get_many(self, ids):
+        """Chunks with metadata for the given ids, in order; unknown ids are skipped"""
+        chunks = []
+        for chunk_id in ids:
+            chunk = self.get(int(chunk_id))
+            if chunk is not None:
+                chunks.append(chunk)
+        return chunks
+
+    def close(self):
+        # Views into the map have to go before the map itself can be closed
+        self._records = None
+        self._blob.release()
+        self._mm.close()
@@ -0,0 +1,63 @@
+"""
+Ways of running the sentence-transformers embedding model on CPU. All of them
+take and return the same things (`encode(texts, batch_size=...)` -> unit
+vectors), so the rest of the app does not care which one is configured:
+
+    torch       the fp32 PyTorch model (the reference)
+    torch-int8  PyTorch with the Linear layers dynamically quantized to int8
+    onnx        the exported ONNX graph on ONNX Runtime
+    onnx-int8   the quantized ONNX graph published with the model
+
+The ONNX backends need `optimum[onnxruntime]`.
+"""
+
+import warnings
+
+from rag_app.config.settings_loader import EMBEDDING_BACKEND, EMBEDDING_ONNX_INT8_FILE
+
+EMBEDDING_BACKENDS = ("torch", "torch-int8", "onnx", "onnx-int8")
+
+
+def quantize_int8(model):
+    """Int8 weights for every Linear layer; activations are quantized per batch at run time"""
+    import torch
+
+    with warnings.catch_warnings():
+        # The eager-mode quantization API still works but warns about its successor
+        warnings.simplefilter("ignore")
+        return torch.ao.quantization.quantize_dynamic(
+            model, {torch.nn.Linear}, dtype=torch.qint8, inplace=True
+        )
+
+
+def load_encoder(model_name, backend=EMBEDDING_BACKEND):
+    """A SentenceTransformer for `model_name` running on `backend`"""
+    if backend not in EMBEDDING_BACKENDS:
+        raise ValueError(
+            f"Unknown embedding backend {backend!r}; choose one of {EMBEDDING_BACKENDS}"
+        )
+    # Imported here: torch and transformers take seconds to import and most
+    # of the worker's memory
+    from sentence_transformers import SentenceTransformer
+
+    if backend == "torch":
+        return SentenceTransformer(model_name)
+    if backend == "torch-int8":
+        return quantize_int8(SentenceTransformer(model_name, device="cpu"))
+    if backend == "onnx":
+        return SentenceTransformer(model_name, device="cpu", backend="onnx")
+    return SentenceTransformer(
+        model_name,
+        device="cpu",
+        backend="onnx",
+        model_kwargs={"file_name": EMBEDDING_ONNX_INT8_FILE},
+    )
+
+
+def encoder_id(model_name, backend=EMBEDDING_BACKEND):
+    """
+    Names what produced a vector, for embedding caches: vectors from different
+    backends differ slightly and are not mixed. fp32 torch keeps the bare model
+    name, so existing caches stay valid.
+    """
+    return model_name if backend == "torch" else f"{model_name}@{backend}"
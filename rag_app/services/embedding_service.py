@@ -0,0 +1,225 @@
+import os
+import time
+import queue
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future
+import numpy as np
+
+from rag_app.services.embedding_backends import load_encoder, encoder_id
+from rag_app.services.metrics import registry, span
+from rag_app.config.settings_loader import (
+    EMBEDDING_MODEL_NAME,
+    EMBEDDING_BACKEND,
+    QUERY_EMBEDDING_CACHE_SIZE,
+    EMBEDDING_MICRO_BATCHING,
+    EMBEDDING_BATCH_WINDOW_MS,
+    EMBEDDING_MAX_BATCH,
+)
+
+BATCH_SIZE = registry.histogram(
+    "rag_embedding_batch_size",
+    "Queries per micro-batched encode call",
+    buckets=(1, 2, 4, 8, 16, 32, 64, 128),
+)
+QUEUE_SECONDS = registry.histogram(
+    "rag_embedding_queue_seconds",
+    "Time a query waited for its micro-batch to start",
+    buckets=(0.0005, 0.001, 0.002, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 1),
+)
+
+
+def normalize_query(text):
+    """Cache key text: the model is uncased, so case and spacing don't change the vector"""
+    return " ".join(text.lower().split())
+
+
+class EmbeddingBatcher:
+    """
+    Collects the texts that concurrent requests want encoded for up to
+    `window_seconds` (or until `max_batch` are waiting) and runs them through
+    `encode` as one batch on a background thread; each caller gets a future.
+    """
+
+    def __init__(
+        self,
+        encode,
+        max_batch=EMBEDDING_MAX_BATCH,
+        window_seconds=EMBEDDING_BATCH_WINDOW_MS / 1000,
+    ):
+        self.encode = encode
+        self.max_batch = max_batch
+        self.window_seconds = window_seconds
+        self._queue = queue.Queue()
+        self._thread = None
+        self._pid = None
+        self._lock = threading.Lock()
+
+    def _ensure_worker(self):
+        # Threads don't survive fork(), so (re)start lazily in each worker process
+        if self._thread is not None and self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._thread is None or self._pid != os.getpid():
+                self._pid = os.getpid()
+                self._queue = queue.Queue()
+                self._thread = threading.Thread(
+                    target=self._run, name="embedding-batcher", daemon=True
+                )
+                self._thread.start()
+
+    def submit(self, texts):
+        """One future per text, resolving to its vector"""
+        self._ensure_worker()
+        queued = time.perf_counter()
+        futures = []
+        for text in texts:
+            future = Future()
+            self._queue.put((text, future, queued))
+            futures.append(future)
+        return futures
+
+    def _next_batch(self):
+        batch = [self._queue.get()]
+        deadline = time.perf_counter() + self.window_seconds
+        while len(batch) < self.max_batch:
+            remaining = deadline - time.perf_counter()
+            try:
+                if remaining > 0:
+                    batch.append(self._queue.get(timeout=remaining))
+                else:
+                    batch.append(self._queue.get_nowait())  # whatever is already waiting
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._next_batch()
+            started = time.perf_counter()
+            for _, _, queued in batch:
+                QUEUE_SECONDS.observe(started - queued)
+            BATCH_SIZE.observe(len(batch))
+            try:
+                with span("embedding_batch"):
+                    vectors = self.encode([text for text, _, _ in batch])
+            except Exception as e:
+                for _, future, _ in batch:
+                    future.set_exception(e)
+                continue
+            for (_, future, _), vector in zip(batch, vectors):
+                future.set_result(vector)
+
+
+class EmbeddingService:
+    """Embed queries at most once per process, with a bounded LRU in front of the model"""
+
+    def __init__(
+        self,
+        model_name=EMBEDDING_MODEL_NAME,
+        max_entries=QUERY_EMBEDDING_CACHE_SIZE,
+        backend=EMBEDDING_BACKEND,
+        micro_batching=EMBEDDING_MICRO_BATCHING,
+    ):
+        self.model_name = model_name
+        self.backend = backend
+        # Embedding caches key on this, so vectors of different backends never mix
+        self.encoder_id = encoder_id(model_name, backend)
+        self.max_entries = max_entries
+        self._model = None
+        self._model_lock = threading.Lock()
+        self._cache = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.batcher = EmbeddingBatcher(self._encode) if micro_batching else None
+
+    @property
+    def model(self):
+        """The underlying SentenceTransformer on the configured backend, loaded on first use"""
+        if self._model is None:
+            with self._model_lock:
+                if self._model is None:
+                    self._model = load_encoder(self.model_name, self.backend)
+        return self._model
+
+    def _get(self, key):
+        with self._lock:
+            vector = self._cache.get(key)
+            if vector is None:
+                self.misses += 1
+            else:
+                self._cache.move_to_end(key)
+                self.hits += 1
+            return vector
+
+    def _put(self, key, vector):
+        vector = np.array(vector)  # don't pin the whole batch array
+        vector.setflags(write=False)  # shared between callers
+        with self._lock:
+            self._cache[key] = vector
+            self._cache.move_to_end(key)
+            while len(self._cache) > self.max_entries:
+                self._cache.popitem(last=False)
+
+    def _encode(self, texts, batch_size=32):
+        return self.model.encode(texts, batch_size=batch_size, convert_to_numpy=True)
+
+    def encode(self, text):
+        """Embedding for a single query"""
+        return self.encode_many([text])[0]
+
+    def encode_many(self, texts, batch_size=32, cache=True):
+        """
+        Embeddings for several queries; cache misses go to the model in batches.
+        Bulk callers pass cache=False so their texts neither read nor evict the
+        LRU of live query embeddings.
+        """
+        keys = [(self.model_name, normalize_query(text)) for text in texts]
+        vectors = [self._get(key) for key in keys] if cache else [None] * len(keys)
+
+        missing = {}
+        for key, text, vector in zip(keys, texts, vectors):
+            if vector is None and key not in missing:
+                missing[key] = text
+        if missing:
+            texts = list(missing.values())
+            if self.batcher is not None and len(texts) < self.batcher.max_batch:
+                # Share a batch with concurrent requests
+                encoded = [future.result() for future in self.batcher.submit(texts)]
+            else:
+                encoded = self._encode(texts, batch_size)
+            if cache:
+                for key, vector in zip(missing, encoded):
+                    self._put(key, vector)
+            fresh = dict(zip(missing, encoded))
+            vectors = [fresh[key] if v is None else v for key, v in zip(keys, vectors)]
+        return np.stack(vectors) if vectors else np.zeros((0, 0), dtype="float32")
+
+    def stats(self):
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "model": self.model_name,
+                "backend": self.backend,
+                "entries": len(self._cache),
+                "max_entries": self.max_entries,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / total if total else 0.0,
+            }
+
+
+_services = {}
+_services_lock = threading.Lock()
+
+
+def get_embedding_service(model_name=EMBEDDING_MODEL_NAME, create=True):
+    """
+    Process-wide embedding service for `model_name` (None if not created yet
+    and `create` is False)
+    """
+    with _services_lock:
+        if model_name not in _services and create:
+            _services[model_name] = EmbeddingService(model_name)
+        return _services.get(model_name)
@@ -1,14 +1,18 @@
-from sentence_transformers import SentenceTransformer
-from sklearn.metrics.pairwise import cosine_similarity
-import mlflow
-import json
-from nltk.translate.bleu_score import sentence_bleu
-from rouge_score import rouge_scorer
+import uuid
+import time
+import queue
+import threading
 import os
-
-# Load embedding model
-embedding_model = SentenceTransformer("all-MiniLM-L6-v2")
-FEEDBACK_LOG_PATH = "data/rlhf_feedback_log.jsonl"
+from rag_app.services.embedding_service import get_embedding_service
+from rag_app.services.feedback_index import get_feedback_index
+from rag_app.services.metrics import span
+from rag_app.config.settings_loader import (
+    FEEDBACK_LOG_PATH,
+    FEEDBACK_SIMILARITY_THRESHOLD,
+    EVAL_QUEUE_MAX_SIZE,
+    EVAL_BATCH_SIZE,
+    EVAL_FLUSH_SECONDS,
+)
 
 
 class FeedbackLogger:
@@ -19,88 +23,194 @@ class FeedbackLogger:
         os.makedirs(os.path.dirname(log_path), exist_ok=True)
 
     def check_similarity_and_log(self, new_query, retrieved_docs, generated_response):
-        """Check similarity of new query to previous queries and log metrics if similar"""
-        try:
-            new_emb = embedding_model.encode(new_query).reshape(1, -1)
-            with open(FEEDBACK_LOG_PATH, "r") as f:
-                for line in f:
-                    data = json.loads(line)
-                    prev_emb = embedding_model.encode(data["query"]).reshape(1, -1)
-                    similarity = cosine_similarity(new_emb, prev_emb)[0][0]
-                    if similarity > 0.8:
-                        print(f"⚠️ Found similar query: {similarity:.2f}")
-                        return self._evaluate_and_log_metrics(
-                            original_query=new_query,
-                            original_retrieved=retrieved_docs,
-                            original_response=generated_response,
-                            previous=data,
+        """Find the most similar previous query and log metrics against it if close enough"""
+        results = self.evaluate_batch([(new_query, retrieved_docs, generated_response)])
+        return results[0] if results else None
+
+    def evaluate_batch(self, items):
+        """
+        Evaluate (query, retrieved_docs, response) items against their most similar
+        previous queries and log every match into a single MLflow run.
+        """
+        evaluations = []
+        for new_query, retrieved_docs, generated_response in items:
+            try:
+                new_emb = get_embedding_service().encode(new_query)
+                match = get_feedback_index(self.log_path).best_match(new_emb)
+                if match and match[0] > FEEDBACK_SIMILARITY_THRESHOLD:
+                    similarity, previous = match
+                    print(f"⚠️ Found similar query: {similarity:.2f}")
+                    metrics = self._compute_metrics(
+                        retrieved_docs, generated_response, previous
+                    )
+                    evaluations.append(
+                        (
+                            new_query,
+                            retrieved_docs,
+                            generated_response,
+                            previous,
+                            similarity,
+                            metrics,
                         )
-        except Exception as e:
-            print("Similarity check error:", e)
-        return None
+                    )
+            except Exception as e:
+                print("Similarity check error:", e)
 
-    def _evaluate_and_log_metrics(
-        self, original_query, original_retrieved, original_response, previous
-    ):
-        """Evaluate metrics against previous similar query and log to MLflow"""
-        try:
-            # Compute Retrieval MRR (simplified for 5 retrieved docs)
-            gold_doc = (
-                previous["retrieved_docs"][0] if previous["retrieved_docs"] else ""
-            )
-            mrr = 0.0
-            for i, doc in enumerate(original_retrieved):
-                if gold_doc.strip() in str(doc).strip():
-                    mrr = 1.0 / (i + 1)
-                    break
-
-            # BLEU score (simplified single reference)
-            bleu = sentence_bleu(
-                [previous["generated_response"].split()], original_response.split()
-            )
-
-            # ROUGE score
-            scorer = rouge_scorer.RougeScorer(["rougeL"], use_stemmer=True)
-            rouge = scorer.score(previous["generated_response"], original_response)
-            rouge_l = rouge["rougeL"].fmeasure
-
-            print(f"📊 MRR: {mrr:.2f} | BLEU: {bleu:.2f} | ROUGE-L: {rouge_l:.2f}")
-
-            # 🏃 Start MLflow run
-            with mlflow.start_run(run_name="SimilarityEval"):
-                # ✅ Log metrics
-                mlflow.log_metric("MRR", mrr)
-                mlflow.log_metric("BLEU", bleu)  # type: ignore
-                mlflow.log_metric("ROUGE-L", rouge_l)
-
-                # ✅ Log inputs as params
-                mlflow.log_param("query", original_query[:100])
-                mlflow.log_param("previous_query", previous["query"][:100])
-                mlflow.log_param(
-                    "similarity_to_previous",
-                    cosine_similarity(
-                        embedding_model.encode(original_query).reshape(1, -1),
-                        embedding_model.encode(previous["query"]).reshape(1, -1),
-                    )[0][0],
+        if evaluations:
+            try:
+                self._log_to_mlflow(evaluations)
+            except Exception as e:
+                print("Evaluation logging error:", e)
+        return [
+            dict({"similarity": True}, **evaluation[-1]) for evaluation in evaluations
+        ]
+
+    def _compute_metrics(self, original_retrieved, original_response, previous):
+        """Retrieval MRR, BLEU and ROUGE-L against a previous similar query"""
+        # Imported on first evaluation, off the request path and after fork
+        from nltk.translate.bleu_score import sentence_bleu
+        from rouge_score import rouge_scorer
+
+        # Compute Retrieval MRR (simplified for 5 retrieved docs)
+        gold_doc = previous["retrieved_docs"][0] if previous["retrieved_docs"] else ""
+        mrr = 0.0
+        for i, doc in enumerate(original_retrieved):
+            if gold_doc.strip() in str(doc).strip():
+                mrr = 1.0 / (i + 1)
+                break
+
+        # BLEU score (simplified single reference)
+        bleu = sentence_bleu(
+            [previous["generated_response"].split()], original_response.split()
+        )
+
+        # ROUGE score
+        scorer = rouge_scorer.RougeScorer(["rougeL"], use_stemmer=True)
+        rouge = scorer.score(previous["generated_response"], original_response)
+        rouge_l = rouge["rougeL"].fmeasure
+
+        print(f"📊 MRR: {mrr:.2f} | BLEU: {bleu:.2f} | ROUGE-L: {rouge_l:.2f}")
+        return {"MRR": mrr, "BLEU": float(bleu), "ROUGE-L": rouge_l}
+
+    def _log_to_mlflow(self, evaluations):
+        """One MLflow run per batch; each evaluation is a metric step plus its own trace artifact"""
+        import mlflow
+
+        with mlflow.start_run(run_name="SimilarityEval"):
+            mlflow.log_param("batch_size", len(evaluations))
+            for step, evaluation in enumerate(evaluations):
+                query, retrieved, response, previous, similarity, metrics = evaluation
+                mlflow.log_metrics(
+                    dict(metrics, similarity_to_previous=similarity), step=step
                 )
 
-                # ✅ Save and log full trace as artifact
+                # Unique artifact path per trace, nothing shared on local disk
                 trace_data = {
-                    "current_query": original_query,
+                    "step": step,
+                    "current_query": query,
                     "previous_query": previous["query"],
-                    "current_response": original_response,
+                    "similarity_to_previous": similarity,
+                    "current_response": response,
                     "previous_response": previous["generated_response"],
-                    "current_retrieved_docs": original_retrieved,
+                    "current_retrieved_docs": retrieved,
                     "previous_retrieved_docs": previous["retrieved_docs"],
-                    "metrics": {"MRR": mrr, "BLEU": bleu, "ROUGE-L": rouge_l},
+                    "metrics": metrics,
                 }
-                os.makedirs("mlruns/tmp", exist_ok=True)
-                trace_path = "mlruns/tmp/trace.json"
-                with open(trace_path, "w") as f:
-                    json.dump(trace_data, f, indent=2)
-                mlflow.log_artifact(trace_path)
-
-            return {"similarity": True, "MRR": mrr, "BLEU": bleu, "ROUGE-L": rouge_l}
-        except Exception as e:
-            print("Evaluation error:", e)
-        return None
+                mlflow.log_dict(
+                    trace_data, f"traces/{step:03d}-{uuid.uuid4().hex}.json"
+                )
+
+
+class EvaluationQueue:
+    """
+    Bounded queue of evaluations drained by a background thread, so chat
+    responses never wait on scoring or MLflow. When the queue is full new work
+    is dropped rather than blocking the request.
+    """
+
+    def __init__(
+        self,
+        logger=None,
+        max_size=EVAL_QUEUE_MAX_SIZE,
+        batch_size=EVAL_BATCH_SIZE,
+        flush_seconds=EVAL_FLUSH_SECONDS,
+    ):
+        self.logger = logger or FeedbackLogger()
+        self.batch_size = batch_size
+        self.flush_seconds = flush_seconds
+        self._queue = queue.Queue(maxsize=max_size)
+        self._thread = None
+        self._pid = None
+        self._lock = threading.Lock()
+        self.submitted = 0
+        self.dropped = 0
+        self.processed = 0
+
+    def _ensure_worker(self):
+        # Threads don't survive fork(), so (re)start lazily in each worker process
+        if self._thread is not None and self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._thread is None or self._pid != os.getpid():
+                self._pid = os.getpid()
+                self._thread = threading.Thread(
+                    target=self._run, name="evaluation-worker", daemon=True
+                )
+                self._thread.start()
+
+    def submit(self, query, retrieved_docs, response):
+        """Queue an evaluation; returns False if it was dropped under backpressure"""
+        self._ensure_worker()
+        try:
+            self._queue.put_nowait((query, retrieved_docs, response))
+        except queue.Full:
+            self.dropped += 1
+            print("Evaluation queue full, dropping evaluation")
+            return False
+        self.submitted += 1
+        return True
+
+    def _next_batch(self):
+        batch = [self._queue.get()]
+        deadline = time.monotonic() + self.flush_seconds
+        while len(batch) < self.batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._next_batch()
+            try:
+                with span("evaluation"):
+                    self.logger.evaluate_batch(batch)
+            except Exception as e:
+                print("Evaluation worker error:", e)
+            finally:
+                self.processed += len(batch)
+
+    def stats(self):
+        return {
+            "queued": self._queue.qsize(),
+            "submitted": self.submitted,
+            "dropped": self.dropped,
+            "processed": self.processed,
+        }
+
+
+_evaluation_queue = None
+_evaluation_queue_lock = threading.Lock()
+
+
+def get_evaluation_queue(create=True):
+    """Process-wide evaluation queue (None if not created yet and `create` is False)"""
+    global _evaluation_queue
+    with _evaluation_queue_lock:
+        if _evaluation_queue is None and create:
+            _evaluation_queue = EvaluationQueue()
+        return _evaluation_queue
@@ -0,0 +1,242 @@
+import os
+import json
+import fcntl
+import threading
+import numpy as np
+from annoy import AnnoyIndex
+
+from rag_app.services.embedding_service import get_embedding_service
+from rag_app.services.embedding_backends import encoder_id
+from rag_app.config.settings_loader import (
+    VECTOR_DIM,
+    EMBEDDING_MODEL_NAME,
+    FEEDBACK_LOG_PATH,
+    FEEDBACK_ANN_MIN_ROWS,
+)
+
+
+class FeedbackIndex:
+    """
+    Normalized embedding matrix over the queries in the feedback log, persisted
+    next to it and extended incrementally as lines are appended. Row i holds the
+    query of the log line starting at byte offsets[i].
+
+    Rows are only ever appended to the raw vector and offset files; a small JSON
+    file records how many of them are valid and how much of the log they cover,
+    and is replaced atomically after each append. Readers map the valid rows.
+    """
+
+    def __init__(
+        self,
+        log_path=FEEDBACK_LOG_PATH,
+        index_path=None,
+        model_name=EMBEDDING_MODEL_NAME,
+        ann_min_rows=FEEDBACK_ANN_MIN_ROWS,
+    ):
+        self.log_path = log_path
+        # data/rlhf_feedback_log.jsonl -> data/rlhf_feedback_log_index.{json,vectors,offsets}
+        self.index_path = index_path or os.path.splitext(log_path)[0] + "_index"
+        self.vectors_path = self.index_path + ".vectors"
+        self.offsets_path = self.index_path + ".offsets"
+        self.meta_path = self.index_path + ".json"
+        self.model_name = model_name
+        self.encoder_id = encoder_id(model_name)  # persisted vectors must match it
+        self.ann_min_rows = ann_min_rows
+        self.vectors = np.zeros((0, VECTOR_DIM), dtype="float32")
+        self.offsets = np.zeros(0, dtype="int64")
+        self.covered = 0  # bytes of the log already embedded
+        self._loaded = False
+        self._lock = threading.Lock()
+        self._ann = None
+        self._ann_rows = 0
+
+    def _log_size(self):
+        try:
+            return os.path.getsize(self.log_path)
+        except FileNotFoundError:
+            return 0
+
+    def _read_meta(self, log_size):
+        """The persisted meta, or None if missing or not valid for this log"""
+        try:
+            with open(self.meta_path) as f:
+                meta = json.load(f)
+        except FileNotFoundError:
+            return None
+        except ValueError as e:
+            print(f"Ignoring unreadable feedback index {self.meta_path}: {e}")
+            return None
+        if meta.get("encoder") != self.encoder_id or meta["covered"] > log_size:
+            return None
+        return meta
+
+    def _map(self, meta):
+        """Point vectors/offsets at the first meta["rows"] persisted rows"""
+        rows, dim = meta["rows"], meta["dim"]
+        if rows:
+            self.vectors = np.memmap(
+                self.vectors_path, dtype="float32", mode="r", shape=(rows, dim)
+            )
+            self.offsets = np.memmap(
+                self.offsets_path, dtype="int64", mode="r", shape=(rows,)
+            )
+        else:
+            self.vectors = np.zeros((0, dim), dtype="float32")
+            self.offsets = np.zeros(0, dtype="int64")
+        self.covered = meta["covered"]
+
+    def _load_persisted(self, log_size):
+        meta = self._read_meta(log_size)
+        if meta is not None and meta["covered"] > self.covered:
+            try:
+                self._map(meta)
+            except (OSError, ValueError) as e:
+                print(f"Ignoring unreadable feedback index {self.index_path}: {e}")
+
+    def _append(self, meta, vectors, offsets, covered):
+        """Append rows after the valid ones (dropping any a crash left behind)"""
+        rows = meta["rows"] if meta else 0
+        if meta is None:
+            # New or invalid index: start fresh files rather than truncating
+            # ones that other workers may still have mapped
+            for path in (self.vectors_path, self.offsets_path):
+                tmp_path = f"{path}.{os.getpid()}.tmp"
+                open(tmp_path, "wb").close()
+                os.replace(tmp_path, path)
+        dim = vectors.shape[1] if len(vectors) else (meta or {}).get("dim", VECTOR_DIM)
+
+        for path, array, itemsize in (
+            (self.vectors_path, vectors, 4 * dim),
+            (self.offsets_path, offsets, 8),
+        ):
+            with open(path, "r+b") as f:
+                f.truncate(rows * itemsize)
+                f.seek(rows * itemsize)
+                f.write(array.tobytes())
+                f.flush()
+                os.fsync(f.fileno())
+
+        meta = {
+            "encoder": self.encoder_id,
+            "dim": dim,
+            "rows": rows + len(vectors),
+            "covered": covered,
+        }
+        tmp_path = f"{self.meta_path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(meta, f)
+        os.replace(tmp_path, self.meta_path)
+        self._map(meta)
+
+    def _read_new_lines(self):
+        """(offsets, queries) of complete log lines past `covered`, and the new end"""
+        offsets, queries = [], []
+        position = self.covered
+        with open(self.log_path, "rb") as f:
+            f.seek(position)
+            for line in f:
+                if not line.endswith(b"\n"):
+                    break  # a writer is mid-append; pick it up next time
+                try:
+                    query = json.loads(line).get("query")
+                except ValueError:
+                    query = None
+                if query:
+                    offsets.append(position)
+                    queries.append(query)
+                position += len(line)
+        return offsets, queries, position
+
+    def sync(self):
+        """Embed log lines appended since the last sync (by any process)"""
+        log_size = self._log_size()
+        if self._loaded and log_size == self.covered:
+            return
+
+        with self._lock:
+            if log_size < self.covered:
+                # Log was truncated or rewritten: start over
+                self.vectors = np.zeros((0, VECTOR_DIM), dtype="float32")
+                self.offsets = np.zeros(0, dtype="int64")
+                self.covered = 0
+                self._ann = None
+            self._load_persisted(log_size)
+            self._loaded = True
+            if log_size == self.covered:
+                return
+
+            with open(self.index_path + ".lock", "w") as lock_file:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+                # Append to what is on disk, which another worker may have
+                # extended while we waited
+                meta = self._read_meta(log_size)
+                if meta is None:
+                    self.covered = 0
+                    self._ann = None
+                else:
+                    self._map(meta)
+                offsets, queries, position = self._read_new_lines()
+                if position == self.covered:
+                    return
+                if queries:
+                    vectors = get_embedding_service(self.model_name).encode_many(queries, cache=False)
+                    vectors = vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+                    vectors = vectors.astype("float32")
+                else:
+                    vectors = np.zeros((0, self.vectors.shape[1]), dtype="float32")
+                self._append(meta, vectors, np.array(offsets, dtype="int64"), position)
+
+    def _candidates(self, query, n_rows):
+        """Row ids worth scoring exactly: ANN neighbours plus rows added since the ANN build"""
+        if self._ann is None or n_rows > self._ann_rows * 1.1:
+            index = AnnoyIndex(self.vectors.shape[1], "angular")
+            for i, vector in enumerate(self.vectors[:n_rows]):
+                index.add_item(i, vector)
+            index.build(10)
+            self._ann, self._ann_rows = index, n_rows
+        ids = self._ann.get_nns_by_vector(query, 20)
+        ids.extend(range(self._ann_rows, n_rows))
+        return np.array(ids, dtype="int64")
+
+    def _read_record(self, offset):
+        with open(self.log_path, "rb") as f:
+            f.seek(offset)
+            return json.loads(f.readline())
+
+    def best_match(self, query_embedding):
+        """(cosine similarity, log record) of the most similar previous query, or None"""
+        self.sync()
+        query = np.asarray(query_embedding, dtype="float32")
+        query = query / np.linalg.norm(query)
+
+        with self._lock:
+            vectors, offsets = self.vectors, self.offsets
+            if len(vectors) == 0:
+                return None
+            candidates = (
+                self._candidates(query, len(vectors))
+                if len(vectors) >= self.ann_min_rows
+                else None
+            )
+
+        if candidates is None:
+            scores = vectors @ query
+            best = int(np.argmax(scores))
+            similarity = scores[best]
+        else:
+            scores = vectors[candidates] @ query
+            best = int(candidates[np.argmax(scores)])
+            similarity = scores.max()
+        return float(similarity), self._read_record(int(offsets[best]))
+
+
+_indexes = {}
+_indexes_lock = threading.Lock()
+
+
+def get_feedback_index(log_path=FEEDBACK_LOG_PATH):
+    """Process-wide feedback index for `log_path`"""
+    with _indexes_lock:
+        if log_path not in _indexes:
+            _indexes[log_path] = FeedbackIndex(log_path)
+        return _indexes[log_path]
@@ -0,0 +1,269 @@
+import os
+import json
+import time
+import uuid
+import shutil
+import fcntl
+import threading
+from contextlib import contextmanager
+
+from rag_app.services.doc_store import open_doc_store
+from rag_app.services.lexical_index import BM25Index, BM25Builder
+from rag_app.services.vector_store import open_vector_store
+
+from rag_app.config.settings_loader import (
+    VECTOR_DIM,
+    ANNOY_INDEX_PATH,
+    DOC_MAPPING_PATH,
+    DOC_STORE_PATH,
+    INDEX_GENERATIONS_DIR,
+    INDEX_CURRENT_PATH,
+    INDEX_GENERATIONS_TO_KEEP,
+)
+
+INDEX_FILE = "index.ann"  # generations whose meta.json predates "index_file"
+CHUNKS_FILE = "chunks.bin"
+MAPPING_FILE = "doc_mapping.json"  # generations built before the chunk store
+LEXICAL_FILE = "lexical"  # prefix of the BM25 .npy files
+META_FILE = "meta.json"
+TMP_PREFIX = ".tmp-"
+
+
+# ---------------------------------------------------------------------------
+# Build side: write a generation into a private directory, then swap the
+# CURRENT pointer with an atomic rename. Readers never see a partial build.
+# ---------------------------------------------------------------------------
+
+
+@contextmanager
+def build_lock(generations_dir=INDEX_GENERATIONS_DIR):
+    """Serialize index builds across threads and processes"""
+    os.makedirs(generations_dir, exist_ok=True)
+    with open(os.path.join(generations_dir, ".build.lock"), "w") as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+def new_generation_dir(generations_dir=INDEX_GENERATIONS_DIR):
+    """Create an empty staging directory for a build (call under build_lock)"""
+    os.makedirs(generations_dir, exist_ok=True)
+    # Anything still staged is left over from a crashed build
+    for name in os.listdir(generations_dir):
+        if name.startswith(TMP_PREFIX):
+            shutil.rmtree(os.path.join(generations_dir, name), ignore_errors=True)
+
+    # Names sort by build time, down to the microsecond, which pruning relies on
+    now = time.time()
+    stamp = time.strftime("%Y%m%d-%H%M%S", time.localtime(now))
+    name = f"{stamp}.{int(now * 1e6) % 1000000:06d}-{uuid.uuid4().hex[:8]}"
+    staging_dir = os.path.join(generations_dir, TMP_PREFIX + name)
+    os.makedirs(staging_dir)
+    return staging_dir
+
+
+def publish_generation(
+    staging_dir,
+    meta,
+    generations_dir=INDEX_GENERATIONS_DIR,
+    current_path=INDEX_CURRENT_PATH,
+    keep=INDEX_GENERATIONS_TO_KEEP,
+):
+    """Finalize a staged build and atomically point CURRENT at it"""
+    name = os.path.basename(staging_dir)[len(TMP_PREFIX) :]
+    meta = dict(meta, generation=name, created=time.time())
+    with open(os.path.join(staging_dir, META_FILE), "w") as f:
+        json.dump(meta, f, indent=2)
+
+    for file_name in os.listdir(staging_dir):
+        with open(os.path.join(staging_dir, file_name), "rb") as f:
+            os.fsync(f.fileno())
+
+    final_dir = os.path.join(generations_dir, name)
+    os.rename(staging_dir, final_dir)
+
+    tmp_pointer = f"{current_path}.{os.getpid()}.tmp"
+    with open(tmp_pointer, "w") as f:
+        f.write(name)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_pointer, current_path)
+    print(f"Published index generation {name}")
+
+    _prune_generations(generations_dir, current=name, keep=keep)
+    return final_dir
+
+
+def _prune_generations(generations_dir, current, keep):
+    """
+    Delete all but the newest `keep` generations. Workers that still have an old
+    generation mmapped keep their mapping; the files go away once they let go.
+    """
+    generations = sorted(
+        name
+        for name in os.listdir(generations_dir)
+        if not name.startswith(".") and name != current
+    )
+    for name in generations[: max(0, len(generations) - (keep - 1))]:
+        shutil.rmtree(os.path.join(generations_dir, name), ignore_errors=True)
+
+
+def read_current_generation(current_path=INDEX_CURRENT_PATH):
+    try:
+        with open(current_path) as f:
+            return f.read().strip() or None
+    except FileNotFoundError:
+        return None
+
+
+# ---------------------------------------------------------------------------
+# Serving side
+# ---------------------------------------------------------------------------
+
+
+def load_lexical_index(path, doc_store):
+    """The generation's BM25 index, or one built in memory for builds that predate it"""
+    if path and BM25Index.exists(path):
+        return BM25Index.load(path)
+    print("No BM25 index on disk, building one from the chunk store")
+    builder = BM25Builder()
+    for start in range(0, len(doc_store), 1000):
+        end = min(start + 1000, len(doc_store))
+        builder.add([doc_store.get_text(i) for i in range(start, end)])
+    return builder.finish()
+
+
+class IndexGeneration:
+    """One immutable, loaded index generation plus its document store and BM25 index"""
+
+    def __init__(
+        self,
+        name,
+        index_path,
+        doc_store,
+        dim=VECTOR_DIM,
+        backend="annoy",
+        params=None,
+        lexical_path=None,
+    ):
+        self.name = name
+        self.index = open_vector_store(index_path, dim, backend, params)
+        self.doc_store = doc_store
+        self.lexical = load_lexical_index(lexical_path, doc_store)
+        self.refs = 0
+        self.retired = False
+
+    @classmethod
+    def from_dir(cls, name, path):
+        with open(os.path.join(path, META_FILE)) as f:
+            meta = json.load(f)
+        return cls(
+            name,
+            os.path.join(path, meta.get("index_file", INDEX_FILE)),
+            open_doc_store(
+                os.path.join(path, CHUNKS_FILE), os.path.join(path, MAPPING_FILE)
+            ),
+            dim=meta.get("dim", VECTOR_DIM),
+            backend=meta.get("backend", "annoy"),
+            params=meta.get("params"),
+            lexical_path=os.path.join(path, LEXICAL_FILE),
+        )
+
+    def close(self):
+        self.index.unload()
+        self.doc_store.close()
+
+
+class IndexManager:
+    """
+    Hands out the current index generation to requests and hot-swaps to a newly
+    published one. Each request pays one os.stat() on the CURRENT pointer; the
+    new generation is loaded by a single thread while the others keep serving
+    the old one, which is released once its last in-flight request finishes.
+    """
+
+    def __init__(
+        self,
+        generations_dir=INDEX_GENERATIONS_DIR,
+        current_path=INDEX_CURRENT_PATH,
+        legacy_index_path=ANNOY_INDEX_PATH,
+        legacy_mapping_path=DOC_MAPPING_PATH,
+        legacy_store_path=DOC_STORE_PATH,
+    ):
+        self.generations_dir = generations_dir
+        self.current_path = current_path
+        self.legacy_index_path = legacy_index_path
+        self.legacy_mapping_path = legacy_mapping_path
+        self.legacy_store_path = legacy_store_path
+        self._current = None
+        self._pointer_stat = None
+        self._lock = threading.Lock()
+        self._reload_lock = threading.Lock()
+
+    def _stat_pointer(self):
+        try:
+            st = os.stat(self.current_path)
+            return (st.st_ino, st.st_mtime_ns, st.st_size)
+        except FileNotFoundError:
+            return None
+
+    def _load(self):
+        name = read_current_generation(self.current_path)
+        if name is None:
+            # Nothing published yet: serve the index shipped with the repo
+            return IndexGeneration(
+                "legacy",
+                self.legacy_index_path,
+                open_doc_store(self.legacy_store_path, self.legacy_mapping_path),
+            )
+        return IndexGeneration.from_dir(name, os.path.join(self.generations_dir, name))
+
+    def _maybe_refresh(self):
+        pointer_stat = self._stat_pointer()
+        if self._current is not None and pointer_stat == self._pointer_stat:
+            return
+
+        # Only one thread loads; if a load is already running and we have
+        # something to serve, keep serving it instead of waiting.
+        blocking = self._current is None
+        if not self._reload_lock.acquire(blocking=blocking):
+            return
+        try:
+            if self._current is not None and pointer_stat == self._pointer_stat:
+                return
+            try:
+                generation = self._load()
+            except Exception as e:
+                if self._current is None:
+                    raise
+                print(f"Failed to load new index generation, keeping current: {e}")
+                self._pointer_stat = pointer_stat  # don't retry until it changes again
+                return
+
+            with self._lock:
+                old, self._current = self._current, generation
+                self._pointer_stat = pointer_stat
+                if old is not None:
+                    old.retired = True
+                    if old.refs == 0:
+                        old.close()
+            print(f"Serving index generation {generation.name}")
+        finally:
+            self._reload_lock.release()
+
+    @contextmanager
+    def acquire(self):
+        """Pin the current generation for the duration of a request"""
+        self._maybe_refresh()
+        with self._lock:
+            generation = self._current
+            generation.refs += 1
+        try:
+            yield generation
+        finally:
+            with self._lock:
+                generation.refs -= 1
+                if generation.retired and generation.refs == 0:
+                    generation.close()
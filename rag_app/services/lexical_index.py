@@ -0,0 +1,175 @@
+import os
+import re
+import numpy as np
+
+# Keeps job codes and skill names whole: "15-1252", "2511", "c++", "node.js"
+TOKEN_RE = re.compile(r"[a-z0-9][a-z0-9+#]*(?:[-./][a-z0-9+#]+)*")
+STOPWORDS = frozenset(
+    "a an and are as at be by for from has have how in is it its of on or that "
+    "the this to was were what when which who why will with".split()
+)
+
+
+def tokenize(text):
+    return [t for t in TOKEN_RE.findall(text.lower()) if t not in STOPWORDS]
+
+
+class BM25Index:
+    """
+    Okapi BM25 over the chunk texts of one index generation. The vocabulary is a
+    sorted array of utf-8 terms and the postings are three flat arrays (per-term
+    offsets, chunk ids, precomputed BM25 weights), each saved as its own .npy
+    file and memory-mapped, so every worker shares one copy in the page cache.
+    """
+
+    ARRAYS = ("terms", "offsets", "doc_ids", "weights")
+
+    def __init__(self, terms, offsets, doc_ids, weights, n_docs):
+        self.terms = terms
+        self.offsets = offsets
+        self.doc_ids = doc_ids
+        self.weights = weights
+        self.n_docs = n_docs
+
+    @classmethod
+    def build(cls, texts, k1=1.2, b=0.75):
+        builder = BM25Builder(k1, b)
+        builder.add(texts)
+        return builder.finish()
+
+    @staticmethod
+    def files(path):
+        """The .npy file of each array of the index saved under `path`"""
+        return {name: f"{path}.{name}.npy" for name in BM25Index.ARRAYS}
+
+    def save(self, path):
+        # n_docs rides along as the trailing entry of the offsets file
+        arrays = dict(
+            terms=self.terms,
+            offsets=np.append(self.offsets, self.n_docs),
+            doc_ids=self.doc_ids,
+            weights=self.weights,
+        )
+        for name, file_path in self.files(path).items():
+            tmp_path = f"{file_path}.{os.getpid()}.tmp"
+            with open(tmp_path, "wb") as f:
+                np.save(f, arrays[name])
+            os.replace(tmp_path, file_path)
+
+    @classmethod
+    def exists(cls, path):
+        return all(os.path.exists(p) for p in cls.files(path).values())
+
+    @classmethod
+    def load(cls, path):
+        arrays = {
+            name: np.load(file_path, mmap_mode="r")
+            for name, file_path in cls.files(path).items()
+        }
+        offsets = arrays["offsets"]
+        return cls(
+            arrays["terms"],
+            offsets[:-1],
+            arrays["doc_ids"],
+            arrays["weights"],
+            int(offsets[-1]),
+        )
+
+    def _term_slices(self, tokens):
+        width = self.terms.dtype.itemsize
+        # Longer tokens cannot be in the vocabulary and would be truncated
+        keys = [t.encode("utf-8") for t in tokens]
+        keys = np.array([k for k in keys if len(k) <= width], dtype=self.terms.dtype)
+        if not len(keys) or not len(self.terms):
+            return []
+        positions = np.searchsorted(self.terms, keys)
+        found = positions < len(self.terms)
+        positions, keys = positions[found], keys[found]
+        positions = positions[self.terms[positions] == keys]
+        return [slice(self.offsets[i], self.offsets[i + 1]) for i in positions]
+
+    def search(self, query, top_k):
+        """Chunk ids of the `top_k` best BM25 matches, best first"""
+        slices = self._term_slices(set(tokenize(query)))
+        if not slices:
+            return []
+        doc_ids = np.concatenate([self.doc_ids[s] for s in slices])
+        weights = np.concatenate([self.weights[s] for s in slices])
+        # Sum weights per matched chunk only, not over an array of every chunk
+        order = np.argsort(doc_ids, kind="stable")
+        candidates, starts = np.unique(doc_ids[order], return_index=True)
+        scores = np.add.reduceat(weights[order], starts)
+        if len(candidates) > top_k:
+            best = np.argpartition(-scores, top_k)[:top_k]
+            candidates, scores = candidates[best], scores[best]
+            best = np.argsort(candidates)
+            candidates, scores = candidates[best], scores[best]
+        return candidates[np.argsort(-scores, kind="stable")].tolist()
+
+
+class BM25Builder:
+    """
+    Builds a BM25Index from texts added in batches: each batch is tokenized
+    into (term, chunk id, term frequency) arrays and the texts are dropped, so
+    a rebuild never holds the corpus itself
+    """
+
+    def __init__(self, k1=1.2, b=0.75):
+        self.k1 = k1
+        self.b = b
+        self.n_docs = 0
+        self._vocabulary = {}
+        self._term_ids, self._doc_ids, self._tfs, self._lengths = [], [], [], []
+
+    def add(self, texts):
+        term_ids, doc_ids, tfs = [], [], []
+        lengths = np.zeros(len(texts), dtype="float32")
+        for i, text in enumerate(texts):
+            tokens = tokenize(text)
+            lengths[i] = len(tokens)
+            counts = {}
+            for token in tokens:
+                counts[token] = counts.get(token, 0) + 1
+            for token, tf in counts.items():
+                term_ids.append(self._vocabulary.setdefault(token, len(self._vocabulary)))
+                doc_ids.append(self.n_docs + i)
+                tfs.append(tf)
+        self._term_ids.append(np.array(term_ids, dtype="int32"))
+        self._doc_ids.append(np.array(doc_ids, dtype="int32"))
+        self._tfs.append(np.array(tfs, dtype="float32"))
+        self._lengths.append(lengths)
+        self.n_docs += len(texts)
+
+    def finish(self):
+        k1, b, n_docs = self.k1, self.b, self.n_docs
+        terms = sorted(self._vocabulary)
+        # Renumber terms alphabetically; a stable sort keeps chunk order per term
+        rank = np.zeros(len(terms), dtype="int32")
+        for i, term in enumerate(terms):
+            rank[self._vocabulary[term]] = i
+        term_ids = rank[np.concatenate(self._term_ids)] if terms else np.zeros(0, "int32")
+        order = np.argsort(term_ids, kind="stable")
+        term_ids = term_ids[order]
+        doc_ids = np.concatenate(self._doc_ids)[order] if terms else np.zeros(0, "int32")
+        tf = np.concatenate(self._tfs)[order] if terms else np.zeros(0, "float32")
+        lengths = np.concatenate(self._lengths) if self._lengths else np.zeros(0, "float32")
+
+        df = np.bincount(term_ids, minlength=len(terms))
+        offsets = np.zeros(len(terms) + 1, dtype="int64")
+        np.cumsum(df, out=offsets[1:])
+        idf = np.log(1 + (n_docs - df + 0.5) / (df + 0.5)).astype("float32")
+        avg_length = float(lengths.mean()) if n_docs else 0.0
+        norm = k1 * (1 - b + b * lengths[doc_ids] / (avg_length or 1.0))
+        weights = (idf[term_ids] * tf * (k1 + 1) / (tf + norm)).astype("float32")
+        # Sorted utf-8 bytes keep the str order, so lookups can searchsorted
+        vocabulary = np.array([t.encode("utf-8") for t in terms], dtype="S")
+        return BM25Index(vocabulary, offsets, doc_ids, weights, n_docs)
+
+
+def reciprocal_rank_fusion(rankings, top_k, k=60):
+    """Merge ranked id lists: each id scores sum(1 / (k + rank))"""
+    scores = {}
+    for ranking in rankings:
+        for rank, doc_id in enumerate(ranking):
+            scores[doc_id] = scores.get(doc_id, 0.0) + 1.0 / (k + rank + 1)
+    return sorted(scores, key=lambda doc_id: -scores[doc_id])[:top_k]
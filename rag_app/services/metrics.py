@@ -0,0 +1,228 @@
+"""
+In-process metrics: timing spans around pipeline stages, aggregated into
+histograms and rendered in the Prometheus text format on /metrics. A span is
+two perf_counter calls and a few counter increments under a lock, cheap
+enough to leave on. Each worker process keeps its own numbers.
+"""
+
+import time
+import bisect
+from abc import ABC, abstractmethod
+import threading
+import contextvars
+from contextlib import contextmanager
+
+# Seconds; spans range from sub-millisecond index lookups to LLM calls
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+
+
+def _label_key(labels):
+    return tuple(sorted(labels.items()))
+
+
+def _format_labels(key, extra=()):
+    pairs = list(key) + list(extra)
+    if not pairs:
+        return ""
+    escaped = (
+        (k, str(v).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n"))
+        for k, v in pairs
+    )
+    return "{" + ",".join(f'{k}="{v}"' for k, v in escaped) + "}"
+
+
+def _format_value(value):
+    return repr(float(value)) if value != float("inf") else "+Inf"
+
+
+class Metric(ABC):
+    type = None
+
+    def __init__(self, name, help):
+        self.name = name
+        self.help = help
+        self._series = {}
+        self._lock = threading.Lock()
+
+    @abstractmethod
+    def samples(self):
+        """(suffix, label key, extra labels, value) for every series"""
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.type}"]
+        for suffix, key, extra, value in self.samples():
+            lines.append(
+                f"{self.name}{suffix}{_format_labels(key, extra)} {_format_value(value)}"
+            )
+        return lines
+
+
+class Counter(Metric):
+    type = "counter"
+
+    def inc(self, amount=1, **labels):
+        key = _label_key(labels)
+        with self._lock:
+            self._series[key] = self._series.get(key, 0) + amount
+
+    def samples(self):
+        with self._lock:
+            return [("_total", key, (), value) for key, value in self._series.items()]
+
+
+class Gauge(Metric):
+    type = "gauge"
+
+    def inc(self, amount=1, **labels):
+        key = _label_key(labels)
+        with self._lock:
+            self._series[key] = self._series.get(key, 0) + amount
+
+    def dec(self, amount=1, **labels):
+        self.inc(-amount, **labels)
+
+    def set(self, value, **labels):
+        with self._lock:
+            self._series[_label_key(labels)] = value
+
+    def samples(self):
+        with self._lock:
+            return [("", key, (), value) for key, value in self._series.items()]
+
+
+class Histogram(Metric):
+    type = "histogram"
+
+    def __init__(self, name, help, buckets=DEFAULT_BUCKETS):
+        super().__init__(name, help)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value, **labels):
+        key = _label_key(labels)
+        i = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                # Per-bucket counts (not cumulative), then sum and count
+                series = self._series[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][i] += 1
+            series[1] += value
+            series[2] += 1
+
+    def samples(self):
+        with self._lock:
+            snapshot = [
+                (key, list(counts), total, n)
+                for key, (counts, total, n) in self._series.items()
+            ]
+        samples = []
+        for key, counts, total, n in snapshot:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += count
+                samples.append(("_bucket", key, (("le", _format_value(bound)),), cumulative))
+            samples.append(("_sum", key, (), total))
+            samples.append(("_count", key, (), n))
+        return samples
+
+
+class MetricsRegistry:
+    """Named metrics plus collectors that report other components' stats at scrape time"""
+
+    def __init__(self):
+        self._metrics = {}
+        self._collectors = []
+        self._lock = threading.Lock()
+
+    def _get(self, cls, name, help, **kwargs):
+        with self._lock:
+            metric = self._metrics.get(name)
+            if metric is None:
+                metric = self._metrics[name] = cls(name, help, **kwargs)
+            return metric
+
+    def counter(self, name, help):
+        return self._get(Counter, name, help)
+
+    def gauge(self, name, help):
+        return self._get(Gauge, name, help)
+
+    def histogram(self, name, help, buckets=DEFAULT_BUCKETS):
+        return self._get(Histogram, name, help, buckets=buckets)
+
+    def register_collector(self, collect):
+        """`collect()` returns Metric objects built fresh on every scrape"""
+        with self._lock:
+            self._collectors.append(collect)
+
+    def render(self):
+        with self._lock:
+            metrics = list(self._metrics.values())
+            collectors = list(self._collectors)
+        for collect in collectors:
+            try:
+                metrics.extend(collect())
+            except Exception as e:
+                print(f"Metrics collector error: {e}")
+        lines = []
+        for metric in metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+registry = MetricsRegistry()
+
+STAGE_SECONDS = registry.histogram(
+    "rag_stage_seconds", "Time spent in each pipeline stage"
+)
+STAGE_IN_FLIGHT = registry.gauge(
+    "rag_stage_in_flight", "Pipeline stages currently running, e.g. LLM calls"
+)
+REQUEST_SECONDS = registry.histogram(
+    "rag_request_seconds", "Time to produce the response, by route"
+)
+REQUESTS = registry.counter("rag_requests", "Responses by route and status code")
+
+
+class RequestTimings:
+    """The spans of one request, for its Server-Timing header"""
+
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.durations = {}
+        self._lock = threading.Lock()  # stages may run on executor threads
+
+    def add(self, stage, seconds):
+        with self._lock:
+            self.durations[stage] = self.durations.get(stage, 0.0) + seconds
+
+    def header(self, total):
+        with self._lock:
+            durations = list(self.durations.items())
+        entries = [f"{stage};dur={seconds * 1000:.1f}" for stage, seconds in durations]
+        entries.append(f"total;dur={total * 1000:.1f}")
+        return ", ".join(entries)
+
+
+# Set by ServerTimingMiddleware; copied into executor threads with the context
+current_timings = contextvars.ContextVar("current_timings", default=None)
+
+
+@contextmanager
+def span(stage):
+    """Time a pipeline stage into the histograms and the current request's timings"""
+    STAGE_IN_FLIGHT.inc(stage=stage)
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        STAGE_IN_FLIGHT.dec(stage=stage)
+        record(stage, time.perf_counter() - start)
+
+
+def record(stage, seconds):
+    """Add an already measured duration, e.g. time to first token"""
+    STAGE_SECONDS.observe(seconds, stage=stage)
+    timings = current_timings.get()
+    if timings is not None:
+        timings.add(stage, seconds)
@@ -0,0 +1,81 @@
+"""
+The process-wide heavy resources in one place: the embedding model, the
+serving index generation, the feedback index and the Gemini client. Each is
+loaded lazily, once per process, on first use. warmup() loads them all up
+front: run it in the gunicorn master with preload_app (see gunicorn.conf.py)
+and forked workers share the model weights and mmapped indexes copy-on-write
+instead of each loading its own copy.
+"""
+
+import time
+import threading
+from google.generativeai.client import configure
+from google.generativeai.generative_models import GenerativeModel
+
+from rag_app.config import GOOGLE_API_KEY
+from rag_app.services.index_store import IndexManager
+from rag_app.services.embedding_service import get_embedding_service
+from rag_app.services.feedback_index import get_feedback_index
+from rag_app.config.settings_loader import GEMINI_MODEL_NAME
+
+_gemini_models = {}
+_index_manager = None
+_lock = threading.Lock()
+
+
+def get_gemini_model(model_name=GEMINI_MODEL_NAME):
+    """Process-wide Gemini client for `model_name`"""
+    with _lock:
+        if not _gemini_models:
+            configure(api_key=GOOGLE_API_KEY)
+        if model_name not in _gemini_models:
+            _gemini_models[model_name] = GenerativeModel(model_name)
+        return _gemini_models[model_name]
+
+
+def get_index_manager():
+    """Process-wide manager of the serving index generation"""
+    global _index_manager
+    with _lock:
+        if _index_manager is None:
+            _index_manager = IndexManager()
+        return _index_manager
+
+
+def _load_index():
+    with get_index_manager().acquire() as generation:
+        return generation.name
+
+
+def _import_evaluation_libraries():
+    # Imported lazily by the evaluation worker; importing them here shares them too
+    import mlflow
+    import nltk.translate.bleu_score
+    import rouge_score.rouge_scorer
+
+
+RESOURCES = {
+    "embedding_model": lambda: get_embedding_service().model,
+    "index": _load_index,
+    "feedback_index": lambda: get_feedback_index().sync(),
+    "gemini": get_gemini_model,
+    "evaluation": _import_evaluation_libraries,
+}
+
+
+def warmup(resources=None):
+    """Load `resources` (default: all of RESOURCES) now; returns seconds per resource"""
+    timings = {}
+    for name in resources or RESOURCES:
+        start = time.perf_counter()
+        try:
+            RESOURCES[name]()
+        except Exception as e:
+            # A missing resource fails the first request that needs it, as before
+            print(f"Warmup of {name} failed: {e}")
+        timings[name] = time.perf_counter() - start
+    print(
+        "🔥 Warmed up "
+        + ", ".join(f"{name} in {seconds:.2f}s" for name, seconds in timings.items())
+    )
+    return timings
@@ -0,0 +1,138 @@
+import os
+import json
+import time
+import random
+import hashlib
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from tqdm import tqdm
+
+from rag_app.config.settings_loader import (
+    SUMMARY_MAX_WORKERS,
+    SUMMARY_RATE_PER_SECOND,
+    SUMMARY_BURST,
+    SUMMARY_MAX_RETRIES,
+    SUMMARY_BACKOFF_SECONDS,
+)
+
+SUMMARY_PROMPT = "Summarise the image in more than 1000 words."
+
+
+class TokenBucket:
+    """Thread-safe token bucket: `rate` calls per second, bursts of up to `capacity`"""
+
+    def __init__(self, rate, capacity=1):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        """Block until a token is available, then take it"""
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self.tokens = min(
+                    self.capacity, self.tokens + (now - self.updated) * self.rate
+                )
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+
+
+def is_rate_limit_error(error):
+    """Gemini surfaces quota errors as ResourceExhausted (HTTP 429)"""
+    if type(error).__name__ in ("ResourceExhausted", "TooManyRequests"):
+        return True
+    message = str(error).lower()
+    return "429" in message or "quota" in message or "rate limit" in message
+
+
+def file_hash(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+class PageSummarizer:
+    """
+    Summarize page images with any LLM exposing `generate_content([prompt, image])`,
+    several pages at a time. Calls share a token-bucket rate limit, rate-limit
+    errors are retried with jittered exponential backoff, and finished pages are
+    checkpointed so an interrupted ingest resumes where it stopped.
+    """
+
+    def __init__(
+        self,
+        llm,
+        prompt=SUMMARY_PROMPT,
+        max_workers=SUMMARY_MAX_WORKERS,
+        rate_per_second=SUMMARY_RATE_PER_SECOND,
+        burst=SUMMARY_BURST,
+        max_retries=SUMMARY_MAX_RETRIES,
+        backoff_seconds=SUMMARY_BACKOFF_SECONDS,
+    ):
+        self.llm = llm
+        self.prompt = prompt
+        self.max_workers = max_workers
+        self.bucket = TokenBucket(rate_per_second, burst)
+        self.max_retries = max_retries
+        self.backoff_seconds = backoff_seconds
+
+    def _summarize_page(self, image):
+        for attempt in range(self.max_retries + 1):
+            self.bucket.acquire()
+            try:
+                return self.llm.generate_content([self.prompt, image]).text
+            except Exception as e:
+                if not is_rate_limit_error(e) or attempt == self.max_retries:
+                    raise
+                delay = self.backoff_seconds * 2**attempt * (0.5 + random.random())
+                print(f"Rate limited, retrying page in {delay:.1f}s")
+                time.sleep(delay)
+
+    def _load_checkpoint(self, checkpoint_path, source_hash):
+        if not checkpoint_path or not os.path.exists(checkpoint_path):
+            return {}
+        try:
+            with open(checkpoint_path) as f:
+                checkpoint = json.load(f)
+        except ValueError:
+            return {}
+        if checkpoint.get("source_hash") != source_hash:
+            return {}  # the file changed since the interrupted run
+        return checkpoint.get("pages", {})
+
+    def _save_checkpoint(self, checkpoint_path, source_hash, done):
+        tmp_path = checkpoint_path + ".tmp"
+        with open(tmp_path, "w") as f:
+            json.dump({"source_hash": source_hash, "pages": done}, f)
+        os.replace(tmp_path, checkpoint_path)
+
+    def summarize(self, images, checkpoint_path=None, source_hash=None):
+        """Summaries for `images` in page order"""
+        done = self._load_checkpoint(checkpoint_path, source_hash)
+        todo = [i for i in range(len(images)) if str(i) not in done]
+        if done:
+            print(f"Resuming: {len(done)} of {len(images)} pages already summarized")
+
+        pool = ThreadPoolExecutor(max_workers=self.max_workers)
+        try:
+            futures = {pool.submit(self._summarize_page, images[i]): i for i in todo}
+            for future in tqdm(
+                as_completed(futures), total=len(futures), desc="Summarizing pages"
+            ):
+                done[str(futures[future])] = future.result()
+                if checkpoint_path:
+                    self._save_checkpoint(checkpoint_path, source_hash, done)
+        finally:
+            # On failure don't start pages that are still queued
+            pool.shutdown(wait=True, cancel_futures=True)
+
+        return [done[str(i)] for i in range(len(images))]
@@ -1,14 +1,32 @@
 import os
-import pickle
-import time
 from PIL import Image
-from sentence_transformers import SentenceTransformer
-from annoy import AnnoyIndex
-import json
 from tqdm import tqdm
 import shutil
-from rag_app.utils.chunking import split_text_file, split_csv_data
+import numpy as np
+from rag_app.utils.chunking import iter_text_chunks, iter_csv_chunks, csv_columns
 from rag_app.utils.pdf_to_image import pdf_to_images
+from rag_app.services.doc_store import DocStoreWriter
+from rag_app.services.chunk_store import get_chunk_store
+from rag_app.services.lexical_index import BM25Builder
+from rag_app.services.vector_store import create_vector_store
+from rag_app.services.csv_aggregates import build_aggregates
+from rag_app.services.summarizer import PageSummarizer, file_hash
+from rag_app.services.embedding_service import get_embedding_service
+from rag_app.services.index_store import (
+    CHUNKS_FILE,
+    LEXICAL_FILE,
+    build_lock,
+    new_generation_dir,
+    publish_generation,
+)
+from rag_app.config.settings_loader import (
+    AGGREGATES_DIR,
+    CHUNK_STORE_DB_PATH,
+    EMBEDDING_MODEL_NAME,
+    INDEX_GENERATIONS_DIR,
+    INDEX_CURRENT_PATH,
+    VECTOR_BACKEND,
+)
 from google.generativeai.generative_models import GenerativeModel
 
 
@@ -17,13 +35,26 @@ def process_and_update_index(
     llm: GenerativeModel,
     knowledge_dir="data/knowledge_source",
     pickle_dir="data/PickleFiles",
-    annoy_index_path="vector_store/annoy_st_index.ann",
-    doc_mapping_path="data/doc_mapping.json",
-    model_name="all-MiniLM-L6-v2",
-    n_trees=10,
+    generations_dir=INDEX_GENERATIONS_DIR,
+    current_path=INDEX_CURRENT_PATH,
+    model_name=EMBEDDING_MODEL_NAME,
+    backend=VECTOR_BACKEND,
+    backend_params=None,
+    model=None,
+    aggregates_dir=AGGREGATES_DIR,
+    chunk_db_path=CHUNK_STORE_DB_PATH,
 ):
     """
-    Add a new file to knowledge source, process it, save pickle, then update Annoy index and doc mapping.
+    Add a new file to knowledge source, process it, append its chunks to the chunk
+    store, then publish a new index generation (vector index + chunk store) that
+    serving workers pick up live.
+    `backend`/`backend_params` pick the vector index (see vector_store.py).
+    CSVs are also aggregated into `aggregates_dir` (see csv_aggregates.py).
+    `pickle_dir` holds summarization checkpoints, and the pickles of files processed
+    before the chunk store existed, which are imported once.
+    `model` overrides the SentenceTransformer loaded from `model_name` (any object with `encode`);
+    its vectors are stored under their own encoder id, apart from the real model's.
+    `llm` is anything with `generate_content([prompt, image])`, e.g. a local fake for tests.
     """
     print(f"Processing new file: {new_file_path}")
 
@@ -35,21 +66,41 @@ def process_and_update_index(
         print(f"File already in destination: {dest_path}")
     print(f"Copied file {basename} to knowledge source folder.")
 
+    store = get_chunk_store(chunk_db_path)
+    with build_lock(generations_dir):
+        # Before this file is appended, so its old pickle cannot replace it
+        store.migrate_pickles(pickle_dir)
+
+    # Per-page progress of an interrupted summarization, if any
+    checkpoint_path = os.path.join(pickle_dir, f"{basename}.progress.json")
+
     # Process file based on extension
-    file_data = {}
     ext = basename.split(".")[-1].lower()
-    file_data["type"] = ext
-    file_data["pages"] = []
-
-    if ext == "txt":
-        print(f"Processing text file: {basename}")
-        chunks = split_text_file(dest_path)
-        file_data["pages"] = chunks
+    load_model, encoder = _encoder(model_name, model)
+
+    if ext in ("txt", "csv"):
+        print(f"Processing {ext.upper()} file: {basename}")
+        # Streamed: chunks are stored and embedded batch by batch while the
+        # file is read, so memory does not grow with the file
+        if ext == "txt":
+            chunks, columns = iter_text_chunks(dest_path), None
+        else:
+            chunks, columns = iter_csv_chunks(dest_path), csv_columns(dest_path)
+        n_chunks = store.append_source(
+            basename,
+            ext,
+            chunks,
+            columns=columns,
+            on_batch=lambda texts: store.encode(texts, encoder, load_model),
+        )
+        print(f"Chunked {basename}: {n_chunks} chunks")
 
-    elif ext == "csv":
-        print(f"Processing CSV file: {basename}")
-        chunks = split_csv_data(dest_path)
-        file_data["pages"] = chunks
+        if ext == "csv":
+            # Counts, medians and growth over the whole file, for exact figures
+            try:
+                build_aggregates(dest_path, aggregates_dir)
+            except Exception as e:
+                print(f"Could not aggregate {basename}: {e}")
 
     elif ext == "png":
         print(f"Processing PNG image file: {basename}")
@@ -57,90 +108,127 @@ def process_and_update_index(
             raise ValueError("LLM must be provided to summarize images.")
 
         image = Image.open(dest_path)
-
-        summary = llm.generate_content(
-            ["Summarise the image in more than 1000 words.", image]
-        )
-        file_data["pages"].append(summary.text)
+        store.append_source(basename, ext, PageSummarizer(llm).summarize([image]))
 
     elif ext == "pdf":
         print(f"Processing PDF file: {basename}")
         if llm is None:
             raise ValueError("LLM must be provided to summarize PDF images.")
 
+        # Pages are summarized concurrently under the configured rate limit;
+        # finished pages are checkpointed so a failed ingest resumes
         images = pdf_to_images(dest_path)
-        for image in tqdm(images, desc="Summarizing PDF pages"):
-            summary = llm.generate_content(
-                ["Summarise the image in more than 1000 words.", image]
-            )
-            file_data["pages"].append(summary.text)
-            time.sleep(1)
-        time.sleep(10)
+        pages = PageSummarizer(llm).summarize(
+            images,
+            checkpoint_path=checkpoint_path,
+            source_hash=file_hash(dest_path),
+        )
+        store.append_source(basename, ext, pages)
 
     else:
         print(f"Unsupported file type: {basename}, skipping.")
         return
 
-    # Save pickle for this new file
-    pickle_file_path = os.path.join(pickle_dir, f"{basename}.pkl")
-    with open(pickle_file_path, "wb") as f:
-        pickle.dump(file_data, f)
-    print(f"Saved processed data to pickle: {pickle_file_path}")
-
-    # Now reload ALL pickle files to rebuild index and doc mapping (to keep it simple and consistent)
-    print("Rebuilding index and document mapping with all pickle files...")
-    model = SentenceTransformer(model_name)
-
-    all_pages = []
-    page_file_mapping = (
-        []
-    )  # To keep track of which page belongs to which file and page no
-
-    pickle_files = [
-        f for f in os.listdir(pickle_dir) if f.endswith(".pkl") or f.endswith(".pickle")
-    ]
-    for pf in tqdm(pickle_files, desc="Loading pickles for index"):
-        with open(os.path.join(pickle_dir, pf), "rb") as f:
-            content = pickle.load(f)
-            pages = content.get("pages", [])
-            all_pages.extend(pages)
-            # Keep track of file name and page index for mapping
-            for i in range(len(pages)):
-                page_file_mapping.append(
-                    {
-                        "file_name": pf.replace(".pkl", ""),
-                        "page_no": i,
-                        "text": pages[i],
-                    }
-                )
-
-    print(f"Total pages for embedding: {len(all_pages)}")
-
-    # Embed all pages
-    embeddings = model.encode(
-        all_pages,
-        batch_size=32,
-        show_progress_bar=True,
-        convert_to_numpy=True,
-        normalize_embeddings=True,
-    ).astype("float32")
-
-    dimension = embeddings.shape[1]
-
-    # Build Annoy index
-    index = AnnoyIndex(dimension, "angular")
-    for i, vector in enumerate(tqdm(embeddings, desc="Adding vectors to Annoy index")):
-        index.add_item(i, vector)
-
-    index.build(n_trees)
-    index.save(annoy_index_path)
-    print(f"Annoy index saved to {annoy_index_path}")
-
-    # Create and save doc mapping
-    # Use a dict with string keys (index) and values as page info dict
-    doc_mapping = {str(i): page_file_mapping[i] for i in range(len(page_file_mapping))}
-    with open(doc_mapping_path, "w") as f:
-        json.dump(doc_mapping, f)
-
-    print(f"Document mapping saved to {doc_mapping_path}")
+    print(f"Saved processed data to chunk store: {chunk_db_path}")
+    if os.path.exists(checkpoint_path):
+        os.remove(checkpoint_path)
+
+    # Rebuild index and doc mapping from the live chunks in the store.
+    # Embeddings are stored per content hash, so only chunks that were never
+    # embedded hit the model. The lock makes concurrent uploads build one
+    # after another, each including the files of the ones before it.
+    with build_lock(generations_dir):
+        _rebuild_index(
+            store,
+            generations_dir,
+            current_path,
+            model_name,
+            model,
+            backend,
+            backend_params,
+        )
+
+
+def _encoder(model_name, model):
+    """(load_model, encoder id) for embedding chunks, loading nothing yet"""
+    if model is None:
+        # Share the serving process's model instead of loading another copy
+        service = get_embedding_service(model_name)
+        return lambda: service.model, service.encoder_id
+    # Vectors from an override (e.g. a fake encoder in tests) must never be
+    # stored or served as the real model's
+    return lambda: model, f"{model_name}@custom:{type(model).__name__}"
+
+
+def _rebuild_index(
+    chunk_store,
+    generations_dir,
+    current_path,
+    model_name,
+    model,
+    backend=VECTOR_BACKEND,
+    backend_params=None,
+):
+    print("Rebuilding index and document mapping from the chunk store...")
+    load_model, encoder = _encoder(model_name, model)
+
+    # One snapshot of the live sources, so the count matches what is scanned
+    sources = chunk_store.sources()
+    n_items = sum(source["n_chunks"] for source in sources)
+    print(f"Total pages for index: {n_items}")
+    if not n_items:
+        print("No pages to index, skipping rebuild.")
+        return
+
+    staging_dir = new_generation_dir(generations_dir)
+
+    # Each batch goes straight into the vector index, the document store
+    # (vector id -> text, file name and page number) and the BM25 postings, so
+    # neither the texts nor a matrix of all vectors is ever held at once
+    doc_store = DocStoreWriter(os.path.join(staging_dir, CHUNKS_FILE), n_items)
+    lexical = BM25Builder()
+    vector_store = None
+    n_encoded = 0
+
+    for chunks in tqdm(
+        chunk_store.scan(encoder=encoder, sources=sources), desc="Scanning chunks for index"
+    ):
+        if any(chunk["vector"] is None for chunk in chunks):
+            vectors, encoded = chunk_store.encode(
+                [c["text"] for c in chunks], encoder, load_model
+            )
+            n_encoded += encoded
+        else:
+            vectors = np.stack([chunk["vector"] for chunk in chunks])
+
+        if vector_store is None:
+            dimension = vectors.shape[1]
+            print(f"Building {backend} index over {n_items} vectors...")
+            vector_store = create_vector_store(backend, dimension, backend_params)
+            vector_store.start(n_items)
+        vector_store.add(vectors)
+        doc_store.add(chunks)
+        lexical.add([chunk["text"] for chunk in chunks])
+
+    print(f"{n_encoded} pages newly embedded")
+
+    # The backend and its parameters go into meta.json
+    vector_store.finish()
+    vector_store.save(os.path.join(staging_dir, vector_store.file_name))
+    vector_store.unload()
+    doc_store.close()
+    lexical.finish().save(os.path.join(staging_dir, LEXICAL_FILE))
+
+    publish_generation(
+        staging_dir,
+        {
+            "dim": dimension,
+            "n_items": n_items,
+            "model_name": model_name,
+            "encoder": encoder,
+            **vector_store.meta(),
+        },
+        generations_dir=generations_dir,
+        current_path=current_path,
+    )
     print("Index and document mapping update complete.")
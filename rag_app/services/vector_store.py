@@ -0,0 +1,261 @@
+"""
+Vector index backends behind one small interface: build from (unit-length)
+embeddings, either a whole matrix or batch by batch (start / add / finish), so
+a rebuild never has to hold every vector at once; save to / load from a file,
+and search for the nearest chunk ids. The backend and its parameters are recorded in each
+generation's meta.json, so a generation is always served the way it was built.
+"""
+
+from abc import ABC, abstractmethod
+
+import numpy as np
+from annoy import AnnoyIndex
+
+from rag_app.config.settings_loader import VECTOR_BACKEND_PARAMS
+
+
+def _unit(vectors):
+    vectors = np.ascontiguousarray(vectors, dtype="float32")
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    return vectors / np.where(norms == 0, 1, norms)
+
+
+class VectorStore(ABC):
+    """Base class; `params` are merged over the backend's defaults"""
+
+    backend = None
+    file_name = None
+    metric = None
+
+    def __init__(self, dim, params=None):
+        self.dim = dim
+        self.params = {**VECTOR_BACKEND_PARAMS.get(self.backend, {}), **(params or {})}
+
+    def meta(self):
+        return {
+            "backend": self.backend,
+            "metric": self.metric,
+            "params": self.params,
+            "index_file": self.file_name,
+        }
+
+    def build(self, vectors):
+        """Build from a whole matrix at once"""
+        self.start(len(vectors))
+        self.add(vectors)
+        self.finish()
+
+    @abstractmethod
+    def start(self, n_items):
+        """Begin a build of `n_items` vectors, which add() then receives in order"""
+
+    @abstractmethod
+    def add(self, vectors):
+        """Next batch of vectors; ids continue from the previous batch"""
+
+    @abstractmethod
+    def finish(self):
+        """Complete the build once every vector has been added"""
+
+    @abstractmethod
+    def save(self, path):
+        pass
+
+    @abstractmethod
+    def load(self, path):
+        pass
+
+    @abstractmethod
+    def search(self, vector, top_k):
+        pass
+
+    def unload(self):
+        pass
+
+
+class AnnoyStore(VectorStore):
+    """Annoy random-projection forest, memory-mapped (the original index)"""
+
+    backend = "annoy"
+    file_name = "index.ann"
+    metric = "angular"
+
+    def __init__(self, dim, params=None):
+        super().__init__(dim, params)
+        self.index = AnnoyIndex(dim, "angular")
+
+    def start(self, n_items):
+        self._n_added = 0
+
+    def add(self, vectors):
+        for vector in vectors:
+            self.index.add_item(self._n_added, vector)
+            self._n_added += 1
+
+    def finish(self):
+        self.index.build(self.params["n_trees"])
+
+    def save(self, path):
+        self.index.save(path)
+
+    def load(self, path):
+        self.index.load(path)  # mmap, shared between processes
+
+    def search(self, vector, top_k):
+        return self.index.get_nns_by_vector(
+            vector, top_k, search_k=self.params.get("search_k", -1)
+        )
+
+    def unload(self):
+        self.index.unload()
+
+
+class FaissStore(VectorStore):
+    """Shared FAISS plumbing: inner product over unit vectors (= cosine)"""
+
+    file_name = "index.faiss"
+    metric = "inner_product"
+
+    def __init__(self, dim, params=None):
+        super().__init__(dim, params)
+        import faiss
+
+        self.faiss = faiss
+        self.index = None
+
+    @abstractmethod
+    def _new_index(self, n_items):
+        pass
+
+    def _train_size(self, n_items):
+        """Vectors to train an untrained index on: the first ones added"""
+        return n_items
+
+    def _configure(self):
+        """Apply search-time parameters after build or load"""
+
+    def start(self, n_items):
+        self.index = self._new_index(n_items)
+        # Held back until there are enough to train on (indexes that need it)
+        self._pending = []
+        self._pending_rows = 0
+        self._train_rows = 0 if self.index.is_trained else self._train_size(n_items)
+
+    def add(self, vectors):
+        vectors = _unit(vectors)
+        if self.index.is_trained:
+            self.index.add(vectors)
+            return
+        self._pending.append(vectors)
+        self._pending_rows += len(vectors)
+        if self._pending_rows >= self._train_rows:
+            self._train()
+
+    def _train(self):
+        sample = np.vstack(self._pending)
+        self._pending = []
+        self.index.train(sample)
+        self.index.add(sample)
+
+    def finish(self):
+        if not self.index.is_trained and self._pending:
+            self._train()  # fewer vectors than start() was told
+        self._configure()
+
+    def save(self, path):
+        self.faiss.write_index(self.index, path)
+
+    def load(self, path):
+        try:
+            # Map the file instead of copying it into every worker's heap
+            self.index = self.faiss.read_index(path, self.faiss.IO_FLAG_MMAP)
+        except RuntimeError:
+            self.index = self.faiss.read_index(path)
+        self._configure()
+
+    def search(self, vector, top_k):
+        _, ids = self.index.search(_unit(vector).reshape(1, -1), top_k)
+        return [int(i) for i in ids[0] if i >= 0]
+
+    def unload(self):
+        self.index = None
+
+
+class FaissFlatStore(FaissStore):
+    """Exact search; the reference the approximate backends are measured against"""
+
+    backend = "faiss-flat"
+
+    def _new_index(self, n_items):
+        return self.faiss.IndexFlatIP(self.dim)
+
+
+class FaissHNSWStore(FaissStore):
+    """HNSW graph over full vectors: fastest queries, slightly more memory than flat"""
+
+    backend = "faiss-hnsw"
+
+    def _new_index(self, n_items):
+        index = self.faiss.IndexHNSWFlat(
+            self.dim, self.params["M"], self.faiss.METRIC_INNER_PRODUCT
+        )
+        index.hnsw.efConstruction = self.params["ef_construction"]
+        return index
+
+    def _configure(self):
+        self.index.hnsw.efSearch = self.params["ef_search"]
+
+
+class FaissIVFPQStore(FaissStore):
+    """
+    Inverted lists with product-quantized codes: `m` bytes per vector instead
+    of 4 * dim, for corpora that no longer fit comfortably in memory
+    """
+
+    backend = "faiss-ivfpq"
+
+    def _new_index(self, n_items):
+        # k-means wants ~39 training points per centroid, for the coarse
+        # quantizer and for each of the 2**nbits PQ codebook entries
+        nlist = max(1, min(self.params["nlist"], n_items // 39))
+        nbits = self.params["nbits"]
+        while nbits > 1 and n_items < 39 * 2**nbits:
+            nbits -= 1
+        self.params = {**self.params, "nlist": nlist, "nbits": nbits}
+        quantizer = self.faiss.IndexFlatIP(self.dim)
+        return self.faiss.IndexIVFPQ(
+            quantizer,
+            self.dim,
+            nlist,
+            self.params["m"],
+            nbits,
+            self.faiss.METRIC_INNER_PRODUCT,
+        )
+
+    def _train_size(self, n_items):
+        # FAISS k-means subsamples to 256 points per centroid anyway
+        return min(n_items, 256 * max(self.params["nlist"], 2 ** self.params["nbits"]))
+
+    def _configure(self):
+        self.index.nprobe = min(self.params["nprobe"], self.index.nlist)
+
+
+VECTOR_BACKENDS = {
+    store.backend: store
+    for store in (AnnoyStore, FaissFlatStore, FaissHNSWStore, FaissIVFPQStore)
+}
+
+
+def create_vector_store(backend, dim, params=None):
+    if backend not in VECTOR_BACKENDS:
+        raise ValueError(
+            f"Unknown vector backend {backend!r}; choose one of {sorted(VECTOR_BACKENDS)}"
+        )
+    return VECTOR_BACKENDS[backend](dim, params)
+
+
+def open_vector_store(path, dim, backend="annoy", params=None):
+    """Load a saved index; generations without a backend in meta.json are Annoy"""
+    store = create_vector_store(backend, dim, params)
+    store.load(path)
+    return store
@@ -0,0 +1,258 @@
+import os
+import json
+import time
+import uuid
+import sqlite3
+import threading
+from concurrent.futures import Future
+from datetime import datetime
+
+from rag_app.config.settings_loader import (
+    WEB_CACHE_DB_PATH,
+    WEB_CACHE_LEGACY_PATH,
+    WEB_CACHE_TTL_SECONDS,
+    WEB_CACHE_MAX_ENTRIES,
+)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS entries (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL,
+    created REAL NOT NULL,
+    accessed REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS entries_accessed ON entries (accessed);
+CREATE TABLE IF NOT EXISTS inflight (
+    key TEXT PRIMARY KEY,
+    owner TEXT NOT NULL,
+    expires REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT);
+"""
+
+
+class WebSearchCache:
+    """
+    Search-result cache in SQLite (WAL mode) shared by every worker process.
+    Entries expire after `ttl_seconds`; past `max_entries` the least recently
+    used are evicted. Concurrent misses for the same key are coalesced: within a
+    process through a shared future, across processes through a lease row.
+    """
+
+    def __init__(
+        self,
+        path=WEB_CACHE_DB_PATH,
+        ttl_seconds=WEB_CACHE_TTL_SECONDS,
+        max_entries=WEB_CACHE_MAX_ENTRIES,
+        legacy_json_path=WEB_CACHE_LEGACY_PATH,
+        lease_seconds=30,
+    ):
+        self.path = path
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.lease_seconds = lease_seconds
+        self._local = threading.local()
+        self._inflight = {}
+        self._inflight_lock = threading.Lock()
+        self._writes = 0
+        self.hits = 0
+        self.misses = 0
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._migrate_legacy(legacy_json_path)
+        # Kept up to date by writes and evictions so stats() never counts rows
+        (self.entries,) = self._conn().execute("SELECT COUNT(*) FROM entries").fetchone()
+
+    def _conn(self):
+        # One connection per thread, never reused across a fork
+        conn = getattr(self._local, "conn", None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.executescript(SCHEMA)
+            self._local.conn, self._local.pid = conn, os.getpid()
+        return conn
+
+    def _migrate_legacy(self, legacy_json_path):
+        """One-time import of the old data/web_search_cache.json"""
+        if not legacy_json_path or not os.path.exists(legacy_json_path):
+            return
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            if conn.execute("SELECT 1 FROM meta WHERE key = 'legacy_imported'").fetchone():
+                conn.execute("COMMIT")
+                return
+            with open(legacy_json_path) as f:
+                legacy = json.load(f)
+            for key, entry in legacy.items():
+                created = datetime.fromisoformat(entry["timestamp"]).timestamp()
+                conn.execute(
+                    "INSERT OR IGNORE INTO entries VALUES (?, ?, ?, ?)",
+                    (key, json.dumps(entry["results"]), created, created),
+                )
+            conn.execute("INSERT INTO meta VALUES ('legacy_imported', ?)", (str(time.time()),))
+            conn.execute("COMMIT")
+            print(f"Imported {len(legacy)} entries from {legacy_json_path}")
+        except Exception as e:
+            conn.execute("ROLLBACK")
+            print(f"Error importing legacy web cache: {e}")
+
+    def get(self, key):
+        conn = self._conn()
+        row = conn.execute(
+            "SELECT value, created FROM entries WHERE key = ?", (key,)
+        ).fetchone()
+        if row is None:
+            return None
+        now = time.time()
+        if now - row[1] > self.ttl_seconds:
+            deleted = conn.execute("DELETE FROM entries WHERE key = ?", (key,)).rowcount
+            with self._inflight_lock:
+                self.entries -= deleted
+            return None
+        conn.execute("UPDATE entries SET accessed = ? WHERE key = ?", (now, key))
+        return json.loads(row[0])
+
+    def set(self, key, value):
+        conn = self._conn()
+        now = time.time()
+        value = json.dumps(value)
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            # Only a new key adds an entry; an existing one is overwritten
+            inserted = conn.execute(
+                "INSERT OR IGNORE INTO entries VALUES (?, ?, ?, ?)", (key, value, now, now)
+            ).rowcount
+            if not inserted:
+                conn.execute(
+                    "UPDATE entries SET value = ?, created = ?, accessed = ? WHERE key = ?",
+                    (value, now, now, key),
+                )
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        with self._inflight_lock:
+            self.entries += inserted
+            self._writes += 1
+            evict = self._writes % 100 == 0
+        if evict:
+            self.evict()
+
+    def evict(self):
+        """Drop expired entries, then least recently used ones beyond max_entries"""
+        conn = self._conn()
+        conn.execute(
+            "DELETE FROM entries WHERE created < ?", (time.time() - self.ttl_seconds,)
+        )
+        (count,) = conn.execute("SELECT COUNT(*) FROM entries").fetchone()
+        if count > self.max_entries:
+            conn.execute(
+                "DELETE FROM entries WHERE key IN "
+                "(SELECT key FROM entries ORDER BY accessed LIMIT ?)",
+                (count - self.max_entries,),
+            )
+            count = self.max_entries
+        with self._inflight_lock:
+            self.entries = count
+
+    def _acquire_lease(self, key, owner):
+        conn = self._conn()
+        now = time.time()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = conn.execute(
+                "SELECT expires FROM inflight WHERE key = ?", (key,)
+            ).fetchone()
+            if row is not None and row[0] > now:
+                conn.execute("COMMIT")
+                return False
+            conn.execute(
+                "INSERT OR REPLACE INTO inflight VALUES (?, ?, ?)",
+                (key, owner, now + self.lease_seconds),
+            )
+            conn.execute("COMMIT")
+            return True
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
+    def _release_lease(self, key, owner):
+        self._conn().execute(
+            "DELETE FROM inflight WHERE key = ? AND owner = ?", (key, owner)
+        )
+
+    def _compute_once(self, key, compute):
+        """Compute across processes: one lease holder calls `compute`, others wait for its result"""
+        owner = uuid.uuid4().hex
+        deadline = time.time() + self.lease_seconds
+        while not self._acquire_lease(key, owner):
+            time.sleep(0.1)
+            value = self.get(key)
+            if value is not None:
+                return value
+            if time.time() > deadline:
+                break  # the other process is stuck; do it ourselves
+        try:
+            value = self.get(key)
+            if value is None:
+                value = compute()
+                self.set(key, value)
+            return value
+        finally:
+            self._release_lease(key, owner)
+
+    def get_or_compute(self, key, compute):
+        """Cached value for `key`, calling `compute` at most once for concurrent misses"""
+        value = self.get(key)
+        if value is not None:
+            with self._inflight_lock:
+                self.hits += 1
+            return value
+
+        with self._inflight_lock:
+            self.misses += 1
+            future = self._inflight.get(key)
+            leader = future is None
+            if leader:
+                future = self._inflight[key] = Future()
+        if not leader:
+            return future.result()
+
+        try:
+            value = self._compute_once(key, compute)
+            future.set_result(value)
+            return value
+        except Exception as e:
+            future.set_exception(e)
+            raise
+        finally:
+            with self._inflight_lock:
+                del self._inflight[key]
+
+    def stats(self):
+        """
+        Hits and misses of this process. Entries are shared by all of them: the
+        count at this process's last eviction pass plus the keys it added since
+        """
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "entries": self.entries,
+        }
+
+
+_web_cache = None
+_web_cache_lock = threading.Lock()
+
+
+def get_web_cache(create=True):
+    """Process-wide web search cache (None if not created yet and `create` is False)"""
+    global _web_cache
+    with _web_cache_lock:
+        if _web_cache is None and create:
+            _web_cache = WebSearchCache()
+        return _web_cache
@@ -1,17 +1,7 @@
-import json
 import requests
-from datetime import datetime
 import hashlib
 from rag_app.config import SERPAPI_KEY
-
-WEB_CACHE_PATH = "data/web_search_cache.json"
-
-# Load web search cache
-try:
-    with open(WEB_CACHE_PATH, "r") as f:
-        web_cache = json.load(f)
-except FileNotFoundError:
-    web_cache = {}
+from rag_app.services.web_cache import get_web_cache
 
 
 class WebSearcher:
@@ -52,32 +42,8 @@ class WebSearcher:
             return []
 
     def search(self, query, num_results=5):
-        """Primary search method - tries SerpAPI first, then DuckDuckGo"""
-        # Check cache first
+        """Primary search method - cached SerpAPI results, one API call per distinct query"""
         cache_key = hashlib.md5(f"{query}_{num_results}".encode()).hexdigest()
-        if cache_key in web_cache:
-            cached_result = web_cache[cache_key]
-            if (
-                datetime.now() - datetime.fromisoformat(cached_result["timestamp"])
-            ).days < 1:
-                return cached_result["results"]
-
-        # Try SerpAPI first
-        results = self.search_serpapi(query, num_results)
-
-        # Cache results
-        web_cache[cache_key] = {
-            "results": results,
-            "timestamp": datetime.now().isoformat(),
-        }
-        self._save_cache()
-
-        return results
-
-    def _save_cache(self):
-        """Save web search cache to file"""
-        try:
-            with open(WEB_CACHE_PATH, "w") as f:
-                json.dump(web_cache, f, indent=2)
-        except Exception as e:
-            print(f"Error saving web cache: {e}")
+        return get_web_cache().get_or_compute(
+            cache_key, lambda: self.search_serpapi(query, num_results)
+        )
@@ -78,17 +78,7 @@ function sendMessage() {
   if (file) formData.append("file", file);
   if (text) formData.append("text", text);
 
-  fetch("/process_request/", {
-    method: "POST",
-    headers: {
-      "X-CSRFToken": getCookie("csrftoken")
-    },
-    body: formData
-  })
-    .then(response => response.json())
-    .then(data => {
-      displayBotMessage(data.response, data.context_docs || [], text);  // pass user query here!
-    })
+  streamRequest(formData, text)
     .catch(error => {
       console.error("Error:", error);
       displayBotResponse("Sorry, I encountered an error. Please try again.");
@@ -104,6 +94,77 @@ function sendMessage() {
       resetCameraIcon();
     });
 }
+
+// Post to the streaming endpoint and show the answer as tokens arrive
+async function streamRequest(formData, userQuery) {
+  const response = await fetch("/process_request/stream/", {
+    method: "POST",
+    headers: {
+      "X-CSRFToken": getCookie("csrftoken")
+    },
+    body: formData
+  });
+
+  // No text input: the endpoint answers with plain JSON
+  if (!(response.headers.get("Content-Type") || "").startsWith("text/event-stream")) {
+    const data = await response.json();
+    displayBotMessage(data.response, data.context_docs || [], userQuery);
+    return;
+  }
+
+  // Placeholder message filled with raw text until the final event
+  const draft = document.createElement("div");
+  draft.className = "message bot-message";
+  draft.style.whiteSpace = "pre-wrap";
+  document.getElementById("chatBox").appendChild(draft);
+
+  const reader = response.body.getReader();
+  const decoder = new TextDecoder();
+  let buffer = "";
+  let finished = false;
+
+  while (!finished) {
+    const { value, done } = await reader.read();
+    if (done) break;
+    buffer += decoder.decode(value, { stream: true });
+
+    // Events are separated by a blank line
+    let boundary;
+    while (!finished && (boundary = buffer.indexOf("\n\n")) !== -1) {
+      const event = parseServerSentEvent(buffer.slice(0, boundary));
+      buffer = buffer.slice(boundary + 2);
+
+      if (event.type === "token") {
+        draft.textContent += event.data.text;
+        scrollChatToBottom();
+      } else if (event.type === "done") {
+        draft.remove();
+        displayBotMessage(event.data.response, event.data.context_docs || [], userQuery);
+        finished = true;
+      } else if (event.type === "error") {
+        draft.remove();
+        throw new Error(event.data.message);
+      }
+    }
+  }
+
+  if (!finished) {
+    draft.remove();
+    throw new Error("Stream ended early");
+  }
+}
+
+// Parse one server-sent event block into {type, data}
+function parseServerSentEvent(block) {
+  let type = "message";
+  const dataLines = [];
+  block.split("\n").forEach(line => {
+    if (line.startsWith("event:")) type = line.slice(6).trim();
+    else if (line.startsWith("data:")) dataLines.push(line.slice(5).trim());
+  });
+  return { type: type, data: dataLines.length ? JSON.parse(dataLines.join("\n")) : {} };
+}
+
 // Display user message
 function displayUserMessage(text) {
   const div = document.createElement("div");
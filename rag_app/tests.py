@@ -1,3 +1,313 @@
-from django.test import TestCase
+import os
+import time
+import pickle
+import random
+import shutil
+import tempfile
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
 
-# Create your tests here.
+import numpy as np
+from django.test import SimpleTestCase
+
+from rag_app.services.chunk_store import ChunkStore, content_hash
+from rag_app.services.crawl_store import CrawlStore
+from rag_app.services.crawler import WebCrawler
+from rag_app.services.doc_store import write_doc_store
+from rag_app.services.lexical_index import BM25Index
+from rag_app.services.vector_store import create_vector_store
+from rag_app.utils.chunking import _merge_pieces
+from rag_app.services.index_store import (
+    CHUNKS_FILE,
+    LEXICAL_FILE,
+    IndexManager,
+    build_lock,
+    new_generation_dir,
+    publish_generation,
+    read_current_generation,
+)
+
+
+class _Handler(BaseHTTPRequestHandler):
+    """Local stand-in site: robots.txt, pages whose body arrives slowly, a hanging page"""
+
+    def log_message(self, *args):
+        pass
+
+    def do_GET(self):
+        server = self.server
+        if self.path == "/robots.txt":
+            with server.lock:
+                server.robots_fetches += 1
+            self.send_response(server.robots_status)
+            self.send_header("Content-Type", "text/plain")
+            self.end_headers()
+            self.wfile.write(b"User-agent: *\nDisallow: /private\n")
+            return
+        if self.path == "/hang":
+            time.sleep(3)
+        if self.path == "/legacy":
+            # No charset in the header, only in the page
+            self.send_response(200)
+            self.send_header("Content-Type", "text/html")
+            self.end_headers()
+            self.wfile.write(
+                '<html><head><meta http-equiv="Content-Type" content="text/html; '
+                'charset=windows-1252"><title>Café</title></head>'
+                "<body><p>Naïve résumé – €5</p></body></html>"
+                .encode("cp1252")
+            )
+            return
+        with server.lock:
+            server.in_flight += 1
+            server.max_in_flight = max(server.max_in_flight, server.in_flight)
+        try:
+            self.send_response(200)
+            self.send_header("Content-Type", "text/html; charset=utf-8")
+            self.end_headers()
+            self.wfile.write(b"<html><head><title>Page</title></head><body><p>")
+            self.wfile.flush()
+            # The body is still downloading after the headers have arrived
+            time.sleep(0.2)
+            self.wfile.write(f"Content of {self.path}</p></body></html>".encode())
+        finally:
+            with server.lock:
+                server.in_flight -= 1
+
+
+class WebCrawlerTests(SimpleTestCase):
+    def setUp(self):
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), _Handler)
+        self.server.lock = threading.Lock()
+        self.server.robots_status = 200
+        self.server.robots_fetches = 0
+        self.server.in_flight = 0
+        self.server.max_in_flight = 0
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.base = f"http://127.0.0.1:{self.server.server_address[1]}"
+
+        self.tmp = tempfile.mkdtemp()
+        store = CrawlStore(root=self.tmp, db_path=f"{self.tmp}/pages.sqlite3")
+        self.crawler = WebCrawler(store=store, per_host_concurrency=2, host_delay=0)
+
+    def tearDown(self):
+        self.crawler.close()
+        self.server.shutdown()
+        self.server.server_close()
+        shutil.rmtree(self.tmp, ignore_errors=True)
+
+    def test_per_host_limit_covers_body_download(self):
+        urls = [f"{self.base}/page/{i}" for i in range(6)]
+        pages = self.crawler.crawl_multiple_urls(urls, deadline=None)
+        self.assertEqual(len(pages), 6)
+        self.assertIn("Content of /page/0", pages[0]["content"])
+        self.assertEqual(self.server.max_in_flight, 2)
+
+    def test_deadline_returns_finished_pages(self):
+        start = time.monotonic()
+        pages = self.crawler.crawl_multiple_urls(
+            [f"{self.base}/page/fast", f"{self.base}/hang"], deadline=1.0
+        )
+        self.assertLess(time.monotonic() - start, 2.0)
+        self.assertEqual([page["url"] for page in pages], [f"{self.base}/page/fast"])
+
+    def test_robots_fetched_once_per_host(self):
+        self.assertIsNotNone(self.crawler.crawl(f"{self.base}/page/1"))
+        self.assertIsNotNone(self.crawler.crawl(f"{self.base}/page/2"))
+        self.assertIsNone(self.crawler.crawl(f"{self.base}/private/1"))
+        self.assertEqual(self.server.robots_fetches, 1)
+
+    def test_meta_charset_used_without_header_charset(self):
+        page = self.crawler.crawl(f"{self.base}/legacy")
+        self.assertEqual(page["title"], "Café")
+        self.assertIn("Naïve résumé – €5", page["content"])
+
+    def test_forbidden_robots_disallows_all(self):
+        self.server.robots_status = 403
+        self.assertIsNone(self.crawler.crawl(f"{self.base}/page/1"))
+
+    def test_missing_robots_allows_all(self):
+        self.server.robots_status = 404
+        self.assertIsNotNone(self.crawler.crawl(f"{self.base}/private/1"))
+
+
+class IndexStoreTests(SimpleTestCase):
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.generations_dir = f"{self.tmp}/generations"
+        self.current_path = f"{self.tmp}/CURRENT"
+        self.manager = IndexManager(self.generations_dir, self.current_path)
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp, ignore_errors=True)
+
+    def publish(self, texts, keep=3):
+        """Build and publish a small generation over `texts`; returns its name"""
+        with build_lock(self.generations_dir):
+            staging_dir = new_generation_dir(self.generations_dir)
+            vectors = np.random.default_rng(len(texts)).random((len(texts), 8), "float32")
+            vector_store = create_vector_store("annoy", 8)
+            vector_store.build(vectors)
+            vector_store.save(os.path.join(staging_dir, vector_store.file_name))
+            vector_store.unload()
+            write_doc_store(
+                os.path.join(staging_dir, CHUNKS_FILE),
+                [{"text": text, "file_name": "a.txt", "page_no": i} for i, text in enumerate(texts)],
+            )
+            BM25Index.build(texts).save(os.path.join(staging_dir, LEXICAL_FILE))
+            final_dir = publish_generation(
+                staging_dir,
+                {"dim": 8, "n_items": len(texts), **vector_store.meta()},
+                generations_dir=self.generations_dir,
+                current_path=self.current_path,
+                keep=keep,
+            )
+        return os.path.basename(final_dir)
+
+    def test_publish_then_reload(self):
+        first = self.publish(["nurse roster", "welder job"])
+        self.assertEqual(read_current_generation(self.current_path), first)
+        with self.manager.acquire() as generation:
+            self.assertEqual(generation.name, first)
+            self.assertEqual(generation.doc_store.get(1)["text"], "welder job")
+            self.assertEqual(generation.lexical.search("welder", 5), [1])
+            self.assertEqual(sorted(generation.index.search(np.ones(8, "float32"), 2)), [0, 1])
+
+        second = self.publish(["data analyst", "nurse roster", "welder job"])
+        with self.manager.acquire() as generation:
+            self.assertEqual(generation.name, second)
+            self.assertEqual(generation.lexical.search("welder", 5), [2])
+        self.assertFalse(any(name.startswith(".tmp-") for name in os.listdir(self.generations_dir)))
+
+    def test_reader_keeps_old_generation_during_swap(self):
+        first = self.publish(["nurse roster"])
+        with self.manager.acquire() as old:
+            second = self.publish(["welder job"])
+            with self.manager.acquire() as new:
+                self.assertEqual(new.name, second)
+            # The pinned generation is retired but still readable
+            self.assertTrue(old.retired)
+            self.assertEqual(old.name, first)
+            self.assertEqual(old.doc_store.get(0)["text"], "nurse roster")
+        self.assertEqual(old.refs, 0)
+        self.assertIsNone(old.doc_store._records)  # closed after the last reader left
+
+    def test_prune_keeps_newest_generations(self):
+        names = [self.publish([f"text {i}"], keep=2) for i in range(4)]
+        remaining = sorted(n for n in os.listdir(self.generations_dir) if not n.startswith("."))
+        self.assertEqual(remaining, names[-2:])
+        with self.manager.acquire() as generation:
+            self.assertEqual(generation.name, names[-1])
+
+
+class _Model:
+    """Stand-in sentence encoder that counts the texts it embeds"""
+
+    def __init__(self):
+        self.encoded = []
+
+    def encode(self, texts, **kwargs):
+        self.encoded.extend(texts)
+        return np.array([[len(text), 1.0] for text in texts], dtype="float32")
+
+
+class ChunkStoreTests(SimpleTestCase):
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.store = ChunkStore(f"{self.tmp}/chunks.sqlite3")
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp, ignore_errors=True)
+
+    def texts(self, **kwargs):
+        return [chunk["text"] for batch in self.store.scan(**kwargs) for chunk in batch]
+
+    def test_append_source_supersedes_previous_version(self):
+        self.assertEqual(self.store.append_source("a.txt", "txt", ["old 1", "old 2"]), 2)
+        self.assertEqual(self.store.append_source("a.txt", "txt", ["new 1"]), 1)
+        sources = self.store.sources()
+        self.assertEqual([(s["file_name"], s["n_chunks"]) for s in sources], [("a.txt", 1)])
+        self.assertEqual(self.texts(), ["new 1"])
+        self.assertEqual(self.store.stats()["chunks"], 1)
+
+        # A version still being written is not live yet
+        def check_old_version_live(texts):
+            self.assertEqual(self.texts(), ["new 1"])
+
+        self.store.append_source("a.txt", "txt", ["newer"], on_batch=check_old_version_live)
+        self.assertEqual(self.texts(), ["newer"])
+
+    def test_scan_orders_by_file_name_then_position(self):
+        self.store.append_source("b.txt", "txt", [f"b{i}" for i in range(5)])
+        self.store.append_source("a.txt", "txt", [{"text": "a0", "start": 1, "end": 2}, "a1"])
+        batches = list(self.store.scan(batch_size=2))
+        self.assertEqual([len(batch) for batch in batches], [2, 2, 2, 1])
+        chunks = [chunk for batch in batches for chunk in batch]
+        self.assertEqual(
+            [(c["file_name"], c["page_no"], c["text"]) for c in chunks[:3]],
+            [("a.txt", 0, "a0"), ("a.txt", 1, "a1"), ("b.txt", 0, "b0")],
+        )
+        self.assertEqual((chunks[0]["start"], chunks[0]["end"]), (1, 2))
+        self.assertEqual(self.texts(batch_size=2), [c["text"] for c in chunks])
+
+    def test_embeddings_reused_by_content_hash(self):
+        model = _Model()
+        vectors, encoded = self.store.encode(["same", "other", "same"], "enc", lambda: model)
+        self.assertEqual((encoded, model.encoded), (2, ["same", "other"]))
+        self.assertEqual(vectors.shape, (3, 2))
+
+        # Another file (or version) with the same text needs no new embedding
+        self.store.append_source("c.txt", "txt", ["same"])
+        chunk = next(self.store.scan(encoder="enc"))[0]
+        self.assertEqual(chunk["content_hash"], content_hash("same"))
+        np.testing.assert_array_equal(chunk["vector"], vectors[0])
+        _, encoded = self.store.encode(["same", "other"], "enc", lambda: self.fail("loaded"))
+        self.assertEqual(encoded, 0)
+
+        # Vectors are per encoder
+        self.assertIsNone(next(self.store.scan(encoder="other-enc"))[0]["vector"])
+
+    def test_migrate_pickles_is_idempotent(self):
+        pickle_dir = f"{self.tmp}/PickleFiles"
+        os.makedirs(pickle_dir)
+        for name, pages in (("a.pdf", ["p1", "p2"]), ("b.csv", ["row"])):
+            with open(f"{pickle_dir}/{name}.pkl", "wb") as f:
+                pickle.dump({"type": name.split(".")[-1], "pages": pages}, f)
+        self.store.append_source("b.csv", "csv", ["newer row"])
+
+        self.assertEqual(self.store.migrate_pickles(pickle_dir), 1)
+        self.assertEqual(self.store.migrate_pickles(pickle_dir), 0)
+        self.assertEqual(self.texts(), ["p1", "p2", "newer row"])
+        self.assertEqual(self.store.stats()["sources"], 2)
+
+
+class MergePiecesTests(SimpleTestCase):
+    def check(self, lengths, chunk_size, chunk_overlap):
+        pieces = [(n, "x" * length) for n, length in enumerate(lengths, start=1)]
+        chunks = list(_merge_pieces(pieces, chunk_size, chunk_overlap))
+
+        def joined(first, last):
+            # Empty pieces (blank lines) are skipped
+            return "\n".join(text for _, text in pieces[first - 1 : last] if text)
+
+        covered = set()
+        for i, (text, first, last) in enumerate(chunks):
+            self.assertEqual(text, joined(first, last))
+            if first != last:
+                self.assertLessEqual(len(text), chunk_size)
+            covered.update(range(first, last + 1))
+            if i:
+                previous_last = chunks[i - 1][2]
+                if first <= previous_last:
+                    self.assertLessEqual(len(joined(first, previous_last)), chunk_overlap)
+        self.assertTrue({n for n, text in pieces if text} <= covered)
+
+    def test_chunks_fit_overlap_and_cover_every_piece(self):
+        rng = random.Random(0)
+        for _ in range(200):
+            lengths = [rng.choice([0, 1, 5, 40, 120, 300]) for _ in range(rng.randint(0, 60))]
+            self.check(lengths, chunk_size=rng.choice([100, 250, 1000]), chunk_overlap=rng.choice([0, 50, 200]))
+
+    def test_long_piece_is_its_own_chunk(self):
+        chunks = list(_merge_pieces([(1, "a"), (2, "b" * 50), (3, "c")], 10, 5))
+        self.assertEqual([(first, last) for _, first, last in chunks], [(1, 1), (2, 2), (3, 3)])
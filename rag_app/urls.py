@@ -3,6 +3,10 @@ from .views.chat_page import chat_page
 from .views.upload_file import upload_file
 from .views.log_feedback import log_feedback
 from .views.get_response import get_response
+from .views.get_response_async import get_response_async
+from .views.get_response_stream import get_response_stream
+from .views.process_batch import process_batch
+from .views.metrics import metrics
 
 
 urlpatterns = [
@@ -10,4 +14,8 @@ urlpatterns = [
     path("upload/", upload_file, name="upload_file"),
     path("log_feedback/", log_feedback, name="log_feedback"),
     path("process_request/", get_response),
+    path("process_request_async/", get_response_async),
+    path("process_request/stream/", get_response_stream),
+    path("process_batch/", process_batch),
+    path("metrics", metrics),
 ]
@@ -1,32 +1,80 @@
-from langchain.text_splitter import CharacterTextSplitter
+"""
+Chunkers for text and CSV sources. They stream the file a line / row at a
+time and yield chunks as they fill up, so memory stays flat however large the
+file is. Chunks end on line / row boundaries and overlap the previous chunk by
+up to `chunk_overlap` characters of whole lines / rows, as CharacterTextSplitter
+did with separator="\n".
 
+Each chunk is a dict: {"text", "source", "start", "end"} where start and end
+are the (1-based, inclusive) first and last line or data row in it; CSV chunks
+also carry the header "columns".
+"""
 
-def split_text_file(file_path, chunk_size=1000):
-    with open(file_path, "r", encoding="utf-8") as file:
-        text = file.read()
-    text_splitter = CharacterTextSplitter(
-        separator="\n", chunk_size=chunk_size, chunk_overlap=200
-    )
-    return text_splitter.split_text(text)
+import csv
+import os
+from collections import deque
+
+from rag_app.config.settings_loader import CHUNK_SIZE, CHUNK_OVERLAP
+
+
+def _merge_pieces(pieces, chunk_size, chunk_overlap, separator="\n"):
+    """
+    Merge (number, text) pieces into chunks of at most `chunk_size` characters
+    (a single longer piece becomes its own chunk). Yields (text, first, last).
+    """
+    sep_len = len(separator)
+    current = deque()
+    total = 0
+    for number, text in pieces:
+        if not text:
+            continue
+        extra = len(text) + (sep_len if current else 0)
+        if current and total + extra > chunk_size:
+            yield from _joined(current, separator)
+            # Keep trailing pieces as overlap while they fit next to the new one
+            while current and (
+                total > chunk_overlap or total + len(text) + sep_len > chunk_size
+            ):
+                total -= len(current[0][1]) + (sep_len if len(current) > 1 else 0)
+                current.popleft()
+        current.append((number, text))
+        total += len(text) + (sep_len if len(current) > 1 else 0)
+    yield from _joined(current, separator)
 
 
-def split_csv_data(file_path, chunk_size=1000):
-    rows_as_text = read_csv_as_text(file_path)
-    text_splitter = CharacterTextSplitter(
-        separator="\n", chunk_size=chunk_size, chunk_overlap=200
-    )
-    full_text = "\n".join(rows_as_text)
-    return text_splitter.split_text(full_text)
+def _joined(pieces, separator):
+    text = separator.join(t for _, t in pieces).strip()
+    if text:
+        yield text, pieces[0][0], pieces[-1][0]
 
 
-def read_csv_as_text(file_path):
-    import csv
+def iter_text_chunks(file_path, chunk_size=CHUNK_SIZE, chunk_overlap=CHUNK_OVERLAP):
+    """Line-aligned chunks of a text file"""
+    source = os.path.basename(file_path)
+    with open(file_path, "r", encoding="utf-8") as file:
+        lines = ((n, line.rstrip("\r\n")) for n, line in enumerate(file, start=1))
+        for text, start, end in _merge_pieces(lines, chunk_size, chunk_overlap):
+            yield {"text": text, "source": source, "start": start, "end": end}
+
 
-    rows_as_text = []
-    with open(file_path, mode="r", encoding="utf-8") as file:
+def iter_csv_chunks(file_path, chunk_size=CHUNK_SIZE, chunk_overlap=CHUNK_OVERLAP):
+    """Row-aligned chunks of a CSV file, one row per line as 'a | b | c'"""
+    source = os.path.basename(file_path)
+    with open(file_path, mode="r", encoding="utf-8", newline="") as file:
         csv_reader = csv.reader(file)
-        headers = next(csv_reader)  #
-        for row in csv_reader:
-            row_text = " | ".join(row)
-            rows_as_text.append(row_text)
-    return rows_as_text
+        columns = next(csv_reader, [])
+        rows = ((n, " | ".join(row)) for n, row in enumerate(csv_reader, start=1))
+        for text, start, end in _merge_pieces(rows, chunk_size, chunk_overlap):
+            yield {
+                "text": text,
+                "source": source,
+                "start": start,
+                "end": end,
+                "columns": columns,
+            }
+
+
+def csv_columns(file_path):
+    """The header row of a CSV file"""
+    with open(file_path, mode="r", encoding="utf-8", newline="") as file:
+        return next(csv.reader(file), [])
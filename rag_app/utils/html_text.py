@@ -0,0 +1,135 @@
+from html.parser import HTMLParser
+
+try:
+    from lxml import etree
+except ImportError:
+    etree = None
+
+# Same elements WebCrawler always dropped before taking the page text
+SKIP_TAGS = {"script", "style", "nav", "footer", "header"}
+
+
+def clean_text(text):
+    """Strip each line, split on double spaces and drop empty pieces"""
+    lines = (line.strip() for line in text.splitlines())
+    chunks = (phrase.strip() for line in lines for phrase in line.split("  "))
+    return "\n".join(chunk for chunk in chunks if chunk)
+
+
+class TextCollector:
+    """
+    Parser target collecting the title and the visible text in one pass. Sets
+    `done` once more than `max_chars` characters of clean text have been seen,
+    so the caller can stop downloading.
+    """
+
+    def __init__(self, max_chars=None):
+        self.max_chars = max_chars
+        self.done = False
+        self._pieces = []
+        self._raw_chars = 0
+        self._checked_at = 0
+        self._skip_depth = 0
+        self._in_title = False
+        self._title = []
+
+    def start(self, tag, attrs=None):
+        if tag in SKIP_TAGS:
+            self._skip_depth += 1
+        elif tag == "title":
+            self._in_title = True
+
+    def end(self, tag):
+        if tag in SKIP_TAGS and self._skip_depth:
+            self._skip_depth -= 1
+        elif tag == "title":
+            self._in_title = False
+
+    def data(self, data):
+        if self._in_title:
+            self._title.append(data)
+        if self._skip_depth or self.done:
+            return
+        self._pieces.append(data)
+        self._raw_chars += len(data)
+        # Clean text is never longer than raw text, so only check once the raw
+        # text could be long enough, and then at most every 1k new characters
+        if (
+            self.max_chars is not None
+            and self._raw_chars > self.max_chars
+            and self._raw_chars - self._checked_at > 1024
+        ):
+            self._checked_at = self._raw_chars
+            self.done = len(self.text()) > self.max_chars
+
+    def close(self):
+        if self.max_chars is not None:
+            self.done = len(self.text()) > self.max_chars
+
+    @property
+    def title(self):
+        return "".join(self._title).strip() or "No title"
+
+    def text(self):
+        return clean_text("".join(self._pieces))
+
+
+class _StdlibParser(HTMLParser):
+    def __init__(self, target):
+        super().__init__(convert_charrefs=True)
+        self.target = target
+
+    def handle_starttag(self, tag, attrs):
+        self.target.start(tag, attrs)
+
+    def handle_endtag(self, tag):
+        self.target.end(tag)
+
+    def handle_data(self, data):
+        self.target.data(data)
+
+    def close(self):
+        super().close()
+        self.target.close()
+
+
+class PageExtractor:
+    """
+    Incremental title + text extraction: `feed()` decoded chunks as they
+    arrive and stop once `done`. backend="lxml" uses lxml's C parser when it
+    is installed, otherwise the stdlib html.parser.
+    """
+
+    def __init__(self, max_chars=None, backend="stdlib"):
+        self.collector = TextCollector(max_chars)
+        if backend == "lxml" and etree is not None:
+            self._parser = etree.HTMLParser(target=self.collector)
+        else:
+            if backend == "lxml":
+                print("lxml is not installed, falling back to html.parser")
+            self._parser = _StdlibParser(self.collector)
+
+    @property
+    def done(self):
+        return self.collector.done
+
+    @property
+    def title(self):
+        return self.collector.title
+
+    def text(self):
+        return self.collector.text()
+
+    def feed(self, chunk):
+        self._parser.feed(chunk)
+
+    def close(self):
+        self._parser.close()
+
+
+def extract_page(html, max_chars=None, backend="stdlib"):
+    """(title, text, truncated) for a whole document given as str"""
+    extractor = PageExtractor(max_chars, backend)
+    extractor.feed(html)
+    extractor.close()
+    return extractor.title, extractor.text(), extractor.done
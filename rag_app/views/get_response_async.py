@@ -0,0 +1,198 @@
+import time
+import weakref
+import asyncio
+import functools
+import threading
+import contextvars
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from django.http import JsonResponse
+from django.views.decorators.csrf import csrf_exempt
+
+# External libraries
+import google.ai.generativelanguage as glm
+
+# Local modules
+from rag_app.services.crawler import get_crawler
+from rag_app.services.web_searcher import WebSearcher
+from rag_app.services.evaluation import get_evaluation_queue
+from rag_app.services.answer_cache import get_answer_cache
+from rag_app.services.metrics import span
+from rag_app.services.chat_pipeline import (
+    gemini_model,
+    retrieve_local_context,
+    lookup_structured_facts,
+    answer_cache_key,
+    urls_to_crawl,
+    format_web_results,
+    build_history_prompt,
+    build_system_prompt,
+    build_response_data,
+)
+from rag_app.utils.is_web_search import should_use_web_search
+from rag_app.utils.handle_image import handle_image
+from rag_app.config.settings_loader import (
+    MAX_CONTEXT_HISTORY,
+    ASYNC_CPU_WORKERS,
+    ASYNC_IO_WORKERS,
+    ASYNC_LLM_CONCURRENCY,
+)
+
+# Bounded pools for the blocking libraries: model/index work is CPU-bound and
+# kept small, SerpAPI and crawling just wait on the network
+cpu_executor = ThreadPoolExecutor(
+    max_workers=ASYNC_CPU_WORKERS, thread_name_prefix="rag-cpu"
+)
+io_executor = ThreadPoolExecutor(max_workers=ASYNC_IO_WORKERS, thread_name_prefix="rag-io")
+_llm_semaphores = weakref.WeakKeyDictionary()
+_llm_semaphores_lock = threading.Lock()
+
+
+def llm_semaphore():
+    """
+    The running event loop's limit on concurrent Gemini calls, created on first
+    use: a semaphore is bound to the loop it is first awaited on, and the
+    server may run more than one loop
+    """
+    loop = asyncio.get_running_loop()
+    with _llm_semaphores_lock:
+        semaphore = _llm_semaphores.get(loop)
+        if semaphore is None:
+            semaphore = _llm_semaphores[loop] = asyncio.Semaphore(ASYNC_LLM_CONCURRENCY)
+        return semaphore
+
+
+async def run_in(executor, fn, *args, **kwargs):
+    # Carry the context over so stage spans reach the request's timings
+    context = contextvars.copy_context()
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(
+        executor, functools.partial(context.run, fn, *args, **kwargs)
+    )
+
+
+async def _search_and_crawl(searcher, crawler, text_data):
+    with span("web_search"):
+        search_results = await run_in(
+            io_executor, searcher.search, text_data, num_results=5
+        )
+    crawled_content = []
+    if search_results:
+        with span("crawl"):
+            crawled_content = await run_in(
+                io_executor, crawler.crawl_multiple_urls, urls_to_crawl(search_results)
+            )
+    return search_results, crawled_content
+
+
+@csrf_exempt
+async def get_response_async(request, *args, **kwargs):
+    """
+    Async /process_request/ for ASGI: local retrieval runs alongside the web
+    search, and the crawl alongside prompt assembly, so one worker can serve
+    many chats while they wait on the network.
+    """
+    text_data = request.POST.get("text")
+    file_data = request.FILES.get("file")
+    use_web_search = request.POST.get("web_search", "false").lower() == "true"
+    # Initialize searcher and crawler
+    searcher = WebSearcher()
+    crawler = get_crawler()
+
+    # Limit context buffer size
+    chat_history = deque(
+        await request.session.aget("chat_history", []), maxlen=MAX_CONTEXT_HISTORY
+    )
+
+    # 1. Optional image handling
+    with span("image"):
+        parts = handle_image(file_data)
+
+    # 2. Text input handling
+    if text_data:
+        parts.append(glm.Part(text=text_data))
+
+        # 3 + 4. Local retrieval and web search / crawl (if needed) concurrently
+        retrieval = asyncio.ensure_future(
+            run_in(cpu_executor, retrieve_local_context, text_data)
+        )
+        # Scans AGGREGATES_DIR and may load changed files: off the event loop
+        structured = asyncio.ensure_future(
+            run_in(cpu_executor, lookup_structured_facts, text_data)
+        )
+        web = None
+        if use_web_search or should_use_web_search(text_data):
+            print("🔍 Performing web search...")
+            web = asyncio.ensure_future(_search_and_crawl(searcher, crawler, text_data))
+
+        # 6. History is assembled while the network stages are in flight
+        history_prompt = build_history_prompt(chat_history)
+
+        generation, nearest_ids, context_docs = await retrieval
+        facts = await structured
+        search_results, crawled_content = await web if web else ([], [])
+        web_results = []
+        if search_results:
+            web_results = format_web_results(search_results, crawled_content)
+
+        # 5. Combine all context sources
+        all_context = context_docs + web_results
+
+        print(
+            f"📚 Retrieved {len(context_docs)} local docs, {len(web_results)} web results."
+        )
+
+        # 7. Construct system prompt with context
+        system_prompt = build_system_prompt(
+            history_prompt, context_docs, web_results, facts
+        )
+        parts.insert(0, glm.Part(text=system_prompt))
+
+        # 8. Generate response, unless a near-duplicate question with the same
+        # context was answered already
+        answer_cache = get_answer_cache()
+        # Embeds the question: CPU work, like retrieval
+        cache_key = await run_in(
+            cpu_executor,
+            answer_cache_key,
+            text_data,
+            generation,
+            nearest_ids,
+            web_results,
+            file_data,
+            facts,
+            history_prompt,
+        )
+        with span("answer_cache"):
+            reply_text = answer_cache.get(cache_key) if cache_key else None
+        if reply_text is None:
+            start = time.perf_counter()
+            semaphore = llm_semaphore()
+            with span("llm_wait"):
+                await semaphore.acquire()
+            try:
+                with span("llm"):
+                    response = await gemini_model.generate_content_async(
+                        glm.Content(parts=parts)
+                    )
+            finally:
+                semaphore.release()
+            reply_text = str(response.parts[0].text)
+            if cache_key:
+                answer_cache.put(cache_key, reply_text, time.perf_counter() - start)
+
+        # 9. Save this turn to session memory
+        chat_history.append({"user": text_data, "bot": reply_text})
+        await request.session.aset("chat_history", list(chat_history))
+
+        # Evaluate the turn in the background; never delays the response
+        get_evaluation_queue().submit(text_data, all_context, reply_text)
+
+        # 10. Return enhanced response
+        return JsonResponse(
+            build_response_data(
+                reply_text, context_docs, web_results, crawled_content, search_results
+            )
+        )
+
+    return JsonResponse({"response": "No input received."})
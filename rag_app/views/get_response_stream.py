@@ -0,0 +1,168 @@
+import json
+import time
+from collections import deque
+from django.http import JsonResponse, StreamingHttpResponse
+from django.views.decorators.csrf import csrf_exempt
+
+# External libraries
+import google.ai.generativelanguage as glm
+
+# Local modules
+from rag_app.services.crawler import get_crawler
+from rag_app.services.web_searcher import WebSearcher
+from rag_app.services.evaluation import get_evaluation_queue
+from rag_app.services.answer_cache import get_answer_cache
+from rag_app.services.metrics import span, record
+from rag_app.services.chat_pipeline import (
+    gemini_model,
+    retrieve_local_context,
+    lookup_structured_facts,
+    answer_cache_key,
+    urls_to_crawl,
+    format_web_results,
+    build_history_prompt,
+    build_system_prompt,
+    build_response_data,
+)
+from rag_app.utils.is_web_search import should_use_web_search
+from rag_app.utils.handle_image import handle_image
+from rag_app.config.settings_loader import MAX_CONTEXT_HISTORY
+
+
+def sse_event(event, data):
+    """One server-sent event with a JSON payload"""
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+@csrf_exempt
+def get_response_stream(request, *args, **kwargs):
+    """
+    /process_request/ as server-sent events: a `meta` event with the retrieved
+    context as soon as local retrieval is done, a `sources` event once any web
+    search and crawl finish, `token` events as Gemini produces the answer, then
+    a `done` event with the same payload the JSON endpoint returns. Failures at
+    any stage end the stream with an `error` event.
+    """
+    text_data = request.POST.get("text")
+    file_data = request.FILES.get("file")
+    use_web_search = request.POST.get("web_search", "false").lower() == "true"
+
+    if not text_data:
+        return JsonResponse({"response": "No input received."})
+
+    # Limit context buffer size
+    chat_history = deque(
+        request.session.get("chat_history", []), maxlen=MAX_CONTEXT_HISTORY
+    )
+    # The session middleware saves before the body is streamed, so make sure
+    # the session (and its cookie) exists now; the turn is saved at the end
+    request.session["chat_history"] = list(chat_history)
+
+    # 1. Optional image handling
+    with span("image"):
+        parts = handle_image(file_data)
+
+    # 2. Text input handling
+    parts.append(glm.Part(text=text_data))
+
+    def events():
+        # 3. Vector-based retrieval from existing knowledge base, sent before
+        # the web stages so the client hears back straight away
+        generation, nearest_ids, context_docs = retrieve_local_context(text_data)
+        facts = lookup_structured_facts(text_data)
+        yield sse_event("meta", {"context_docs": context_docs})
+
+        # 4. Web search and crawling (if needed)
+        search_results = []
+        web_results = []
+        crawled_content = []
+
+        if use_web_search or should_use_web_search(text_data):
+            print("🔍 Performing web search...")
+            with span("web_search"):
+                search_results = WebSearcher().search(text_data, num_results=5)
+            if search_results:
+                with span("crawl"):
+                    crawled_content = get_crawler().crawl_multiple_urls(
+                        urls_to_crawl(search_results)
+                    )
+                web_results = format_web_results(search_results, crawled_content)
+            yield sse_event(
+                "sources",
+                {
+                    "web_search_performed": bool(web_results),
+                    "web_results_count": len(web_results),
+                    "crawled_pages": len(crawled_content),
+                    "search_sources": [
+                        {"title": result.get("title", ""), "url": result.get("url", "")}
+                        for result in search_results[:3]
+                    ],
+                },
+            )
+
+        # 5. Combine all context sources
+        all_context = context_docs + web_results
+
+        # 6 + 7. History and system prompt with context
+        history_prompt = build_history_prompt(chat_history)
+        system_prompt = build_system_prompt(
+            history_prompt, context_docs, web_results, facts
+        )
+        parts.insert(0, glm.Part(text=system_prompt))
+
+        # 8. Generate response, forwarding tokens as they arrive; a cached
+        # answer to a near-duplicate question is sent as a single token
+        answer_cache = get_answer_cache()
+        cache_key = answer_cache_key(
+            text_data, generation, nearest_ids, web_results, file_data, facts, history_prompt
+        )
+        with span("answer_cache"):
+            reply_text = answer_cache.get(cache_key) if cache_key else None
+        if reply_text is not None:
+            yield sse_event("token", {"text": reply_text})
+        else:
+            start = time.perf_counter()
+            pieces = []
+            with span("llm"):
+                for chunk in gemini_model.generate_content(
+                    glm.Content(parts=parts), stream=True
+                ):
+                    text = chunk.text
+                    if text:
+                        if not pieces:
+                            record("llm_first_token", time.perf_counter() - start)
+                        pieces.append(text)
+                        yield sse_event("token", {"text": text})
+            reply_text = "".join(pieces)
+            if cache_key:
+                answer_cache.put(cache_key, reply_text, time.perf_counter() - start)
+
+        # 9. Save this turn to session memory once the answer is complete
+        chat_history.append({"user": text_data, "bot": reply_text})
+        request.session["chat_history"] = list(chat_history)
+        request.session.save()
+
+        # Evaluate the turn in the background; never delays the response
+        get_evaluation_queue().submit(text_data, all_context, reply_text)
+
+        # 10. Final event with the rendered answer and sources
+        yield sse_event(
+            "done",
+            build_response_data(
+                reply_text, context_docs, web_results, crawled_content, search_results
+            ),
+        )
+
+    def stream():
+        # The response has started, so any failure (retrieval, web search,
+        # crawling or the LLM) is reported as an event rather than a 500
+        try:
+            yield from events()
+        except Exception as e:
+            print(f"Error streaming response: {e}")
+            yield sse_event("error", {"message": "Generation failed."})
+
+    response = StreamingHttpResponse(stream(), content_type="text/event-stream")
+    response["Cache-Control"] = "no-cache"
+    response["X-Accel-Buffering"] = "no"  # don't let nginx buffer the stream
+    return response
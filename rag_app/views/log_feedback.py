@@ -2,8 +2,7 @@ import json
 from datetime import datetime
 from django.http import JsonResponse
 from django.views.decorators.csrf import csrf_exempt
-
-FEEDBACK_LOG_PATH = "data/rlhf_feedback_log.jsonl"
+from rag_app.config.settings_loader import FEEDBACK_LOG_PATH
 
 
 @csrf_exempt
@@ -32,6 +31,8 @@ def log_feedback(request):
             with open(FEEDBACK_LOG_PATH, "a") as f:
                 f.write(json.dumps(data) + "\n")
 
+            # Not embedded here: the feedback index catches up with the log
+            # on its next best_match(), in the background evaluator
             return JsonResponse({"status": "success"})
         except Exception as e:
             return JsonResponse({"error": str(e)}, status=500)
@@ -0,0 +1,56 @@
+from django.http import HttpResponse
+
+from rag_app.services.metrics import registry, Gauge, Counter
+from rag_app.services.answer_cache import get_answer_cache
+from rag_app.services.embedding_service import get_embedding_service
+from rag_app.services.web_cache import get_web_cache
+from rag_app.services.evaluation import get_evaluation_queue
+
+
+def collect_cache_stats():
+    """
+    Hit counts and rates of the caches, read at scrape time from in-memory
+    counters; services this process has not used yet are left out, not created
+    """
+    hits = Counter("rag_cache_hits", "Cache lookups answered from the cache")
+    misses = Counter("rag_cache_misses", "Cache lookups that had to compute")
+    hit_rate = Gauge("rag_cache_hit_ratio", "Hits over lookups since the process started")
+    entries = Gauge("rag_cache_entries", "Entries held by the cache")
+    saved = Counter("rag_answer_cache_saved_seconds", "LLM time saved by answer cache hits")
+    queued = Gauge("rag_evaluation_queued", "Evaluations waiting in the background queue")
+    dropped = Counter("rag_evaluation_dropped", "Evaluations dropped because the queue was full")
+
+    answer_cache = get_answer_cache(create=False)
+    embedding_service = get_embedding_service(create=False)
+    web_cache = get_web_cache(create=False)
+    caches = {
+        "answer": answer_cache.stats() if answer_cache else None,
+        "query_embedding": embedding_service.stats() if embedding_service else None,
+        "web_search": web_cache.stats() if web_cache else None,
+    }
+    for cache, stats in caches.items():
+        if stats is None:
+            continue
+        hits.inc(stats["hits"], cache=cache)
+        misses.inc(stats["misses"], cache=cache)
+        hit_rate.set(stats["hit_rate"], cache=cache)
+        entries.set(stats["entries"], cache=cache)
+    if caches["answer"]:
+        saved.inc(caches["answer"]["saved_seconds"])
+
+    evaluation_queue = get_evaluation_queue(create=False)
+    if evaluation_queue:
+        evaluation = evaluation_queue.stats()
+        queued.set(evaluation["queued"])
+        dropped.inc(evaluation["dropped"])
+    return [hits, misses, hit_rate, entries, saved, queued, dropped]
+
+
+registry.register_collector(collect_cache_stats)
+
+
+def metrics(request, *args, **kwargs):
+    """Prometheus text exposition of this worker process's metrics"""
+    return HttpResponse(
+        registry.render(), content_type="text/plain; version=0.0.4; charset=utf-8"
+    )
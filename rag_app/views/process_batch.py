@@ -0,0 +1,47 @@
+import json
+from django.http import HttpResponse, JsonResponse
+from django.views.decorators.csrf import csrf_exempt
+
+from rag_app.services.batch_qa import parse_question, answer_batch
+from rag_app.config.settings_loader import BATCH_MAX_QUESTIONS
+
+
+@csrf_exempt
+def process_batch(request, *args, **kwargs):
+    """
+    POST a JSONL body, one question per line; get JSONL answers back in the
+    same order. Run stats (throughput etc.) are in the X-Batch-Stats header.
+    """
+    if request.method != "POST":
+        return JsonResponse({"error": "POST a JSONL body"}, status=405)
+
+    try:
+        body = request.body.decode("utf-8")
+    except UnicodeDecodeError:
+        return JsonResponse({"error": "The body must be UTF-8 JSONL"}, status=400)
+    lines = [line for line in body.splitlines() if line.strip()]
+    if len(lines) > BATCH_MAX_QUESTIONS:
+        return JsonResponse(
+            {"error": f"At most {BATCH_MAX_QUESTIONS} questions per batch"}, status=400
+        )
+    try:
+        items = [parse_question(json.loads(line), i) for i, line in enumerate(lines)]
+    except ValueError as e:
+        return JsonResponse({"error": f"Invalid JSONL: {e}"}, status=400)
+
+    web_search = request.GET.get("web_search")
+    if web_search is not None:
+        web_search = web_search.lower() == "true"
+
+    results, stats = answer_batch(items, web_search=web_search)
+    print(
+        f"📦 Answered {stats['questions']} questions in {stats['seconds']:.1f}s "
+        f"({stats['questions_per_second']:.2f}/s)"
+    )
+
+    response = HttpResponse(
+        "".join(json.dumps(result) + "\n" for result in results),
+        content_type="application/x-ndjson",
+    )
+    response["X-Batch-Stats"] = json.dumps(stats)
+    return response
@@ -1,7 +1,7 @@
 import os
 from django.http import JsonResponse
 from django.views.decorators.csrf import csrf_exempt
-from google.generativeai.generative_models import GenerativeModel
+from rag_app.services.model_registry import get_gemini_model
 from rag_app.services.update_knowledge import process_and_update_index
 
 
@@ -15,9 +15,8 @@ def upload_file(request):
             for chunk in uploaded_file.chunks():
                 destination.write(chunk)
 
-        # Initialize Gemini LLM if needed (for PDFs/PNGs)
-        os.environ["GOOGLE_API_KEY"] = os.environ["GEMINI_API_KEY"]
-        llm = GenerativeModel("gemini-2.0-flash")
+        # Shared Gemini LLM (for PDFs/PNGs)
+        llm = get_gemini_model()
 
         # Trigger pipeline
         try: